@@ -1,13 +1,98 @@
-from django.contrib import admin
-from .models import Patient, Doctor, PatientDoctorMapping
+import json
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.http import HttpResponseRedirect
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import Patient, Doctor, PatientDoctorMapping, VersionConflict
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the row count from PostgreSQL's planner statistics
+    instead of running COUNT(*) when the table is large. Unfiltered lists use
+    pg_class.reltuples; filtered ones use the row estimate from EXPLAIN.
+    Small results, and other databases, still get an exact count.
+    """
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = self.estimate(queryset) if hasattr(queryset, 'query') else None
+        if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+    
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                # -1 means the table was never analyzed
+                return int(row[0]) if row and row[0] >= 0 else None
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for large tables: estimated counts, no second count
+    for the unfiltered total, and newest-first ordering on the primary key so
+    the "Older" link can page with ?id__lt=<pk> instead of a growing OFFSET.
+    Saves that lose a row-version race (VersionConflict) are rolled back and
+    the page reloads with an error message instead of a server error.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    list_per_page = 50
+    
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except VersionConflict:
+            return self.version_conflict(request)
+    
+    def changelist_view(self, request, extra_context=None):
+        try:
+            response = super().changelist_view(request, extra_context)
+        except VersionConflict:
+            return self.version_conflict(request)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None and len(changelist.result_list) >= changelist.list_per_page:
+            last = changelist.result_list[len(changelist.result_list) - 1]
+            response.context_data['cursor_next_url'] = changelist.get_query_string({'id__lt': last.pk}, remove=['p'])
+        return response
+    
+    def version_conflict(self, request):
+        self.message_user(
+            request, 'The record was changed by someone else while you were editing it; '
+            'nothing was saved. Review the current values and try again.', messages.ERROR
+        )
+        return HttpResponseRedirect(request.get_full_path())
 
 
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(ScalableModelAdmin):
     list_display = ('full_name', 'email', 'phone_number', 'gender', 'blood_group', 'created_by', 'created_at', 'is_active')
     list_filter = ('gender', 'blood_group', 'is_active', 'created_at')
     search_fields = ('first_name', 'last_name', 'email', 'phone_number')
     list_editable = ('is_active',)
+    list_select_related = ('created_by',)
+    autocomplete_fields = ('created_by',)
     readonly_fields = ('created_at', 'updated_at')
     
     fieldsets = (
@@ -31,11 +116,13 @@ class PatientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(ScalableModelAdmin):
     list_display = ('full_name', 'email', 'specialization', 'license_number', 'years_of_experience', 'consultation_fee', 'created_by', 'is_active')
     list_filter = ('specialization', 'is_active', 'created_at')
     search_fields = ('first_name', 'last_name', 'email', 'license_number', 'hospital_affiliation')
     list_editable = ('is_active',)
+    list_select_related = ('created_by',)
+    autocomplete_fields = ('created_by',)
     readonly_fields = ('created_at', 'updated_at')
     
     fieldsets = (
@@ -59,11 +146,14 @@ class DoctorAdmin(admin.ModelAdmin):
 
 
 @admin.register(PatientDoctorMapping)
-class PatientDoctorMappingAdmin(admin.ModelAdmin):
+class PatientDoctorMappingAdmin(ScalableModelAdmin):
     list_display = ('patient', 'doctor', 'status', 'assigned_date', 'created_by')
     list_filter = ('status', 'assigned_date', 'created_at')
     search_fields = ('patient__first_name', 'patient__last_name', 'doctor__first_name', 'doctor__last_name')
     list_editable = ('status',)
+    list_select_related = ('patient', 'doctor', 'created_by')
+    # Search widgets instead of <select>s listing every patient and doctor
+    autocomplete_fields = ('patient', 'doctor', 'created_by')
     readonly_fields = ('assigned_date', 'created_at', 'updated_at')
     
     fieldsets = (
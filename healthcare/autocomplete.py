@@ -0,0 +1,47 @@
+"""
+Type-ahead search over patient and doctor names.
+
+Matches are prefix queries on the normalized ``name_key`` ("first last") and
+``surname_key`` ("last first") columns, which are indexed for ``LIKE 'abc%'``,
+so a lookup reads a few index entries rather than the whole table. Only the id,
+display name and record type are returned.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Patient, Doctor, normalize_name
+
+TYPES = ('patient', 'doctor')
+
+
+def _querysets(user):
+    return {
+        'patient': Patient.active.filter(created_by=user),
+        'doctor': Doctor.active.all(),
+    }
+
+
+def suggest(user, term, types=TYPES, limit=None):
+    """
+    Return up to ``limit`` ``{'id', 'full_name', 'type'}`` dicts whose first or
+    last name starts with ``term``, ordered by name.
+    """
+    limit = limit or settings.AUTOCOMPLETE_LIMIT
+    key = normalize_name(term)
+    if not key:
+        return []
+    matches = []
+    querysets = _querysets(user)
+    for kind in types:
+        rows = (
+            querysets[kind]
+            .filter(Q(name_key__startswith=key) | Q(surname_key__startswith=key))
+            .only('first_name', 'last_name', 'name_key')
+            .order_by('name_key', 'pk')[:limit]
+        )
+        matches.extend((row.name_key, kind, row) for row in rows)
+    matches.sort(key=lambda match: (match[0], match[1], match[2].pk))
+    return [
+        {'id': row.pk, 'full_name': row.full_name, 'type': kind}
+        for _, kind, row in matches[:limit]
+    ]
@@ -0,0 +1,253 @@
+"""
+Cohort statistics for capacity planning.
+
+The endpoint (``cohort_stats``) computes them with grouped queries: one per
+cross-tab plus one count per birth date for the age summary, so at most a
+row per distinct birth date leaves the database whatever the table size.
+
+``patient_cohorts`` and ``doctor_cohorts`` compute the same results
+vectorized: the columns are loaded in chunks into NumPy arrays (dates as
+``datetime64[D]``, choice fields as small-int codes, free text as codes
+assigned while each chunk is loaded) and every count and cross-tab is a
+``bincount``. Moving every row into Python costs more than the database's
+GROUP BY, so they only serve as the comparison in ``manage.py
+bench_cohorts``. NumPy is an optional dependency, imported on first
+use; ``numpy_available()`` reports whether it is installed.
+"""
+from collections import Counter
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Count
+
+from .lazy import LazyModule, module_available
+from .models import Patient, Doctor
+from .stats import AGE_BANDS, age_band_expression
+
+# Optional dependency, too heavy to import in every worker
+np = LazyModule('numpy')
+
+
+def numpy_available():
+    return module_available('numpy')
+
+
+class ChoiceCodes:
+    """Maps a choice field's values to int8 codes and back."""
+
+    def __init__(self, field):
+        self.labels = [str(value) for value, _ in field.flatchoices]
+        if field.blank and '' not in self.labels:
+            self.labels.append('')
+        self.codes = {label: index for index, label in enumerate(self.labels)}
+
+    def encode(self, values):
+        return np.fromiter((self.codes.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+
+
+class TextCodes:
+    """
+    Assigns int32 codes to free-text values in order of first appearance, so
+    a column is factorized as it is loaded instead of sorted afterwards.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.codes = {}
+
+    def _code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+    def encode(self, values):
+        return np.fromiter(map(self._code, values), dtype=np.int32, count=len(values))
+
+
+def load_columns(queryset, columns, chunk_size=None):
+    """
+    Read ``columns`` from ``queryset`` into one NumPy array per column. Each
+    column is ``(name, kind)`` with kind ``'date'``, ``'choice'`` or
+    ``'text'``; choice and text columns become codes, whose encoders (with
+    their ``labels``) are returned alongside. Rows are converted a chunk at a
+    time so no list of model instances or tuples for the whole table is ever
+    held.
+    """
+    chunk_size = chunk_size or settings.COHORT_CHUNK_SIZE
+    model = queryset.model
+    encoders = {
+        name: ChoiceCodes(model._meta.get_field(name)) if kind == 'choice' else TextCodes()
+        for name, kind in columns if kind != 'date'
+    }
+    chunks = {name: [] for name, _ in columns}
+
+    def flush(rows):
+        for (name, kind), values in zip(columns, zip(*rows)):
+            if kind == 'date':
+                chunks[name].append(np.array(values, dtype='datetime64[D]'))
+            else:
+                chunks[name].append(encoders[name].encode(values))
+
+    rows = []
+    for row in queryset.order_by().values_list(*[name for name, _ in columns]).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            flush(rows)
+            rows = []
+    if rows:
+        flush(rows)
+
+    arrays = {}
+    for name, kind in columns:
+        if chunks[name]:
+            arrays[name] = np.concatenate(chunks[name])
+        else:
+            arrays[name] = np.array([], dtype={'date': 'datetime64[D]', 'choice': np.int8}.get(kind, np.int32))
+    return arrays, encoders
+
+
+def ages(birth_dates, today=None):
+    """Age in whole years for each ``datetime64[D]`` birth date."""
+    today = np.datetime64(today or date.today(), 'D')
+    years = birth_dates.astype('datetime64[Y]')
+    # Day of the year counted as month * 100 + day, so leap years do not shift it
+    month_day = (
+        (birth_dates.astype('datetime64[M]') - years).astype(np.int64) * 100
+        + (birth_dates - birth_dates.astype('datetime64[M]')).astype(np.int64)
+    )
+    today_years = today.astype('datetime64[Y]')
+    today_month_day = (
+        (today.astype('datetime64[M]') - today_years).astype(np.int64) * 100
+        + (today - today.astype('datetime64[M]')).astype(np.int64)
+    )
+    return (today_years - years).astype(np.int64) - (month_day > today_month_day)
+
+
+def age_band_codes(age_values):
+    """Index into AGE_BANDS for each age."""
+    edges = np.array([minimum for _, minimum in AGE_BANDS[1:]])
+    return np.searchsorted(edges, age_values, side='right')
+
+
+def crosstab(row_codes, column_codes, rows, columns):
+    """Counts for every (row, column) pair as a ``rows x columns`` matrix."""
+    keep = (row_codes >= 0) & (column_codes >= 0)
+    flat = row_codes[keep].astype(np.int64) * columns + column_codes[keep]
+    return np.bincount(flat, minlength=rows * columns).reshape(rows, columns)
+
+
+def _table(matrix, row_labels, column_labels):
+    return {
+        row: {column: int(count) for column, count in zip(column_labels, counts) if count}
+        for row, counts in zip(row_labels, matrix)
+    }
+
+
+def patient_cohorts(queryset, today=None):
+    arrays, encoders = load_columns(
+        queryset, [('date_of_birth', 'date'), ('gender', 'choice'), ('state', 'text')]
+    )
+    age_values = ages(arrays['date_of_birth'], today)
+    bands = age_band_codes(age_values)
+    band_labels = [label for label, _ in AGE_BANDS]
+    states = encoders['state'].labels
+    genders = encoders['gender'].labels
+    return {
+        'total': int(age_values.size),
+        'age': {
+            'mean': round(float(age_values.mean()), 1) if age_values.size else None,
+            'median': float(np.median(age_values)) if age_values.size else None,
+        },
+        'age_bands': dict(zip(band_labels, np.bincount(bands, minlength=len(band_labels)).tolist())),
+        'age_band_by_gender': _table(
+            crosstab(bands, arrays['gender'], len(band_labels), len(genders)), band_labels, genders
+        ),
+        'age_band_by_state': _table(
+            crosstab(bands, arrays['state'], len(band_labels), len(states)), band_labels, states
+        ),
+    }
+
+
+def doctor_cohorts(queryset):
+    arrays, encoders = load_columns(queryset, [('specialization', 'choice'), ('state', 'text')])
+    specializations = encoders['specialization'].labels
+    states = encoders['state'].labels
+    return {
+        'total': int(arrays['state'].size),
+        'specialization_by_state': _table(
+            crosstab(arrays['specialization'], arrays['state'], len(specializations), len(states)),
+            specializations, states,
+        ),
+    }
+
+
+def _counts(queryset, *fields):
+    return list(queryset.values(*fields).annotate(count=Count('pk')).order_by())
+
+
+def _nested(rows, row_field, column_field, row_labels):
+    table = {label: {} for label in row_labels}
+    for row in rows:
+        table.setdefault(row[row_field], {})[row[column_field]] = row['count']
+    return table
+
+
+def age_histogram(queryset, today=None):
+    """``Counter`` of whole-year ages, from one query grouped by birth date."""
+    today = today or date.today()
+    histogram = Counter()
+    for row in _counts(queryset, 'date_of_birth'):
+        born = row['date_of_birth']
+        histogram[today.year - born.year - ((today.month, today.day) < (born.month, born.day))] += row['count']
+    return histogram
+
+
+def _median(histogram, total):
+    middle = {(total - 1) // 2, total // 2}
+    values, seen = [], 0
+    for age, count in sorted(histogram.items()):
+        values.extend(age for position in middle if seen <= position < seen + count)
+        seen += count
+    return sum(values) / len(values)
+
+
+def patient_cohort_aggregates(queryset, today=None):
+    """Same result as ``patient_cohorts``, from grouped queries."""
+    today = today or date.today()
+    band_labels = [label for label, _ in AGE_BANDS]
+    banded = queryset.annotate(age_band=age_band_expression(today))
+    by_gender = _counts(banded, 'age_band', 'gender')
+    histogram = age_histogram(queryset, today)
+    total = sum(histogram.values())
+    bands = Counter()
+    for row in by_gender:
+        bands[row['age_band']] += row['count']
+    return {
+        'total': total,
+        'age': {
+            'mean': round(sum(age * count for age, count in histogram.items()) / total, 1) if total else None,
+            'median': float(_median(histogram, total)) if total else None,
+        },
+        'age_bands': {label: bands[label] for label in band_labels},
+        'age_band_by_gender': _nested(by_gender, 'age_band', 'gender', band_labels),
+        'age_band_by_state': _nested(_counts(banded, 'age_band', 'state'), 'age_band', 'state', band_labels),
+    }
+
+
+def doctor_cohort_aggregates(queryset):
+    """Same result as ``doctor_cohorts``, from one grouped query."""
+    rows = _counts(queryset, 'specialization', 'state')
+    specializations = ChoiceCodes(queryset.model._meta.get_field('specialization')).labels
+    return {
+        'total': sum(row['count'] for row in rows),
+        'specialization_by_state': _nested(rows, 'specialization', 'state', specializations),
+    }
+
+
+def cohort_stats(user):
+    return {
+        'patients': patient_cohort_aggregates(Patient.active.filter(created_by=user)),
+        'doctors': doctor_cohort_aggregates(Doctor.active.filter(created_by=user)),
+    }
@@ -0,0 +1,115 @@
+"""
+Content-Encoding negotiation and codecs for response compression.
+
+gzip is always available; brotli (``br``) and zstd are offered when the
+optional ``brotli`` and ``zstandard`` packages are installed. Levels default
+to cheap settings (see COMPRESSION_LEVELS) because API payloads are small
+and the CPU spent per request matters more than the last few percent of size.
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+def available_encodings():
+    """Encodings this process can produce, most preferred first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def negotiate_encoding(header, offered=None):
+    """
+    Pick the encoding to use for an ``Accept-Encoding`` header among
+    ``offered`` (default: every available encoding), or None for identity.
+    Higher q-values win; ties go to the order of ``offered``.
+    """
+    offered = available_encodings() if offered is None else list(offered)
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding] = quality
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in offered:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _level(encoding):
+    return settings.COMPRESSION_LEVELS[encoding]
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=_level('gzip'), mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, quality=_level('br'))
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=_level('zstd')).compress(data)
+    raise ValueError(f'Unsupported encoding {encoding}')
+
+
+class StreamCompressor:
+    """Incremental compressor: ``compress(chunk)`` for each chunk, then ``finish()``."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            # wbits 31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(_level('gzip'), zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=_level('br'))
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=_level('zstd')).compressobj()
+        else:
+            raise ValueError(f'Unsupported encoding {encoding}')
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def finish(self):
+        return self._compressor.finish() if self.encoding == 'br' else self._compressor.flush()
+
+    def stream(self, chunks):
+        for chunk in chunks:
+            data = self.compress(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+    async def astream(self, chunks):
+        async for chunk in chunks:
+            data = self.compress(chunk)
+            if data:
+                yield data
+        yield self.finish()
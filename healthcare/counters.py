@@ -0,0 +1,57 @@
+"""
+Denormalized assignment counters: Doctor.active_patient_count and
+Patient.active_doctor_count.
+
+Single-row changes adjust the counters with F-expressions in the same
+transaction as the mapping write (see healthcare.signals). Bulk paths, which
+bypass model signals, call `recount` for the rows they touched, and
+`manage.py reconcile_counters` rebuilds every counter from the mapping table.
+
+Counter changes deliberately leave the doctor directory cache alone: nearly
+every assignment moves a counter, and bumping the shared ``doctors`` version
+each time would empty every user's cached pages. Cached counts may instead
+lag by up to DOCTOR_CACHE_SECONDS.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Patient, Doctor, PatientDoctorMapping
+
+
+def adjust(patient_id, doctor_id, delta):
+    """Add ``delta`` to both counters of one mapping's patient and doctor."""
+    if not delta:
+        return
+    Patient.objects.filter(pk=patient_id).update(
+        active_doctor_count=Greatest(F('active_doctor_count') + delta, Value(0))
+    )
+    Doctor.objects.filter(pk=doctor_id).update(
+        active_patient_count=Greatest(F('active_patient_count') + delta, Value(0))
+    )
+
+
+def _active_count(field):
+    return Coalesce(
+        Subquery(
+            PatientDoctorMapping.objects
+            .filter(**{field: OuterRef('pk')}, status='ACTIVE')
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def recount(patient_ids=None, doctor_ids=None):
+    """
+    Recompute counters from the mapping table with one UPDATE per model.
+    Pass None to recount every row of that model, or an empty list to skip it.
+    """
+    if patient_ids is None or patient_ids:
+        patients = Patient.objects.all() if patient_ids is None else Patient.objects.filter(pk__in=patient_ids)
+        patients.update(active_doctor_count=_active_count('patient'))
+    if doctor_ids is None or doctor_ids:
+        doctors = Doctor.objects.all() if doctor_ids is None else Doctor.objects.filter(pk__in=doctor_ids)
+        doctors.update(active_patient_count=_active_count('doctor'))
@@ -0,0 +1,176 @@
+"""
+Possible-duplicate detection for patients.
+
+Comparing a new patient against every patient of the same user is O(n) per
+insert and O(n²) for a full scan. Instead each patient gets a few normalized
+blocking keys (Soundex of the last name plus date of birth, and the digits of
+the phone number) stored in the indexed ``PatientBlockingKey`` table. Only
+patients sharing a key are scored against each other, so a check costs one
+index lookup and a handful of comparisons.
+"""
+import re
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Patient, PatientBlockingKey
+
+# Fields that feed the blocking keys or the score
+KEY_FIELDS = {'last_name', 'date_of_birth', 'phone_number'}
+SCORE_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone_number', 'date_of_birth', 'zip_code', 'created_by_id'
+)
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6',
+}
+
+
+def soundex(name):
+    """American Soundex code of ``name`` (e.g. Robert -> R163), '' if no letters."""
+    letters = re.sub(r'[^A-Z]', '', name.upper())
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'HW':
+            # H and W do not separate letters with the same code
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def phone_digits(phone):
+    """Digits of a phone number without a leading North American country code."""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits
+
+
+def _birth_date(patient):
+    # Instances built with Model.objects.create() keep a string until reloaded
+    value = patient.date_of_birth
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def blocking_keys(patient):
+    keys = []
+    surname = soundex(patient.last_name)
+    if surname and patient.date_of_birth:
+        keys.append(('NAME_DOB', f'{surname}:{_birth_date(patient).isoformat()}'))
+    digits = phone_digits(patient.phone_number)
+    if len(digits) >= 7:
+        keys.append(('PHONE', digits))
+    return keys
+
+
+def index_patient(patient, created=False):
+    """Store the blocking keys of ``patient``, replacing any previous ones."""
+    if not created:
+        PatientBlockingKey.objects.filter(patient=patient).delete()
+    PatientBlockingKey.objects.bulk_create([
+        PatientBlockingKey(patient=patient, owner_id=patient.created_by_id, kind=kind, key=key)
+        for kind, key in blocking_keys(patient)
+    ])
+
+
+def _similarity(a, b):
+    a, b = a.strip().lower(), b.strip().lower()
+    if not a or not b:
+        return 0.0
+    return 1.0 if a == b else SequenceMatcher(None, a, b).ratio()
+
+
+def score(a, b):
+    """
+    Likelihood in [0, 1] that patients ``a`` and ``b`` are the same person,
+    as a weighted average over the attributes both of them have.
+    """
+    parts = [
+        (0.25, 1.0 if _birth_date(a) == _birth_date(b) else 0.0),
+        (0.25, max(_similarity(a.last_name, b.last_name),
+                   0.8 if soundex(a.last_name) == soundex(b.last_name) else 0.0)),
+        (0.2, _similarity(a.first_name, b.first_name)),
+        (0.1, _similarity(a.email.split('@')[0], b.email.split('@')[0])),
+    ]
+    phone_a, phone_b = phone_digits(a.phone_number), phone_digits(b.phone_number)
+    if phone_a and phone_b:
+        parts.append((0.15, 1.0 if phone_a == phone_b else 0.0))
+    if a.zip_code and b.zip_code:
+        parts.append((0.05, 1.0 if a.zip_code.strip() == b.zip_code.strip() else 0.0))
+    return sum(weight * value for weight, value in parts) / sum(weight for weight, _ in parts)
+
+
+def find_duplicates(patient, threshold=None):
+    """
+    Return ``[{'id', 'full_name', 'email', 'score', 'matched_on'}]`` for the
+    owner's active patients that share a block with ``patient`` and score at
+    least ``threshold``, best match first.
+    """
+    threshold = settings.DEDUP_MATCH_THRESHOLD if threshold is None else threshold
+    keys = blocking_keys(patient)
+    if not keys:
+        return []
+    lookup = Q()
+    for kind, key in keys:
+        lookup |= Q(kind=kind, key=key)
+    matched_on = {}
+    rows = (
+        PatientBlockingKey.objects.filter(lookup, owner_id=patient.created_by_id)
+        .exclude(patient_id=patient.pk)
+        .values_list('patient_id', 'kind')[:settings.DEDUP_MAX_BLOCK_SIZE]
+    )
+    for patient_id, kind in rows:
+        matched_on.setdefault(patient_id, []).append(kind)
+    if not matched_on:
+        return []
+
+    matches = []
+    for candidate in Patient.active.filter(pk__in=matched_on).only(*SCORE_FIELDS):
+        similarity = score(patient, candidate)
+        if similarity >= threshold:
+            matches.append({
+                'id': candidate.pk,
+                'full_name': candidate.full_name,
+                'email': candidate.email,
+                'score': round(similarity, 3),
+                'matched_on': sorted(matched_on[candidate.pk]),
+            })
+    return sorted(matches, key=lambda match: -match['score'])
+
+
+def scan_duplicates(owner=None, threshold=None):
+    """
+    Yield ``(patient, other, score)`` for every pair of active patients in a
+    shared block scoring at least ``threshold``. Each pair is reported once.
+    """
+    threshold = settings.DEDUP_MATCH_THRESHOLD if threshold is None else threshold
+    blocks = (
+        PatientBlockingKey.objects.values('owner_id', 'kind', 'key')
+        .annotate(size=Count('id')).filter(size__gt=1).order_by()
+    )
+    if owner is not None:
+        blocks = blocks.filter(owner=owner)
+    seen = set()
+    for block in blocks.iterator():
+        ids = PatientBlockingKey.objects.filter(
+            owner_id=block['owner_id'], kind=block['kind'], key=block['key']
+        ).values_list('patient_id', flat=True)[:settings.DEDUP_MAX_BLOCK_SIZE]
+        patients = list(Patient.active.filter(pk__in=list(ids)).only(*SCORE_FIELDS).order_by('pk'))
+        for a, b in combinations(patients, 2):
+            if (a.pk, b.pk) in seen:
+                continue
+            seen.add((a.pk, b.pk))
+            similarity = score(a, b)
+            if similarity >= threshold:
+                yield a, b, similarity
@@ -0,0 +1,42 @@
+"""
+Response cache for the doctor directory (doctor list and detail).
+
+Entries are keyed by the full request URL, since pagination and mapping
+links are absolute, and by version counters: ``doctors`` is bumped by every
+doctor write, ``doctors:<user id>`` by writes to that user's patients and
+mappings, which appear in the detail previews. Assignment counters
+(``active_patient_count``) do not bump ``doctors``, so other users may see
+them up to DOCTOR_CACHE_SECONDS old.
+Fills go through healthcare.singleflight, so an expired entry is recomputed
+by one request while the others get the previous body.
+"""
+import hashlib
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from . import singleflight
+
+NAMESPACE = 'doctors'
+
+
+def cached_response(request, scope, handler, user=None):
+    """
+    Serve the data of ``handler()`` (a view's GET, returning a 200 Response)
+    from the cache. Pass ``user`` when the body depends on who asks.
+    """
+    versions = [singleflight.version(NAMESPACE)]
+    if user is not None:
+        versions.append(f'{user.pk}.{singleflight.version(f"{NAMESPACE}:{user.pk}")}')
+    url = hashlib.blake2b(request.build_absolute_uri().encode(), digest_size=16).hexdigest()
+    data = singleflight.get_or_set(
+        f'{NAMESPACE}:{scope}:v{":".join(map(str, versions))}:{url}',
+        lambda: handler().data,
+        settings.DOCTOR_CACHE_SECONDS,
+    )
+    return Response(data)
+
+
+def invalidate(user_id=None):
+    """Drop cached directory pages, or only those of ``user_id``."""
+    singleflight.bump(NAMESPACE if user_id is None else f'{NAMESPACE}:{user_id}')
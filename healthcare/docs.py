@@ -0,0 +1,99 @@
+"""
+API documentation hooks for the views.
+
+Views take ``swagger_auto_schema`` and ``openapi`` from here rather than from
+drf_yasg, so importing the views never imports drf_yasg. ``openapi`` records
+attribute access and calls, and the decorator records its arguments on the
+side; ``apply_schemas()`` replays them against drf_yasg when a schema is
+first generated (see healthcare.schema.SchemaGenerator). With
+``API_DOCS_ENABLED`` off (API-only workers) nothing is recorded at all.
+
+``api_info`` describes the API for the docs pages and for
+``SWAGGER_SETTINGS['DEFAULT_INFO']``. It is built, importing drf_yasg, on
+first access.
+"""
+import threading
+
+from django.conf import settings
+
+_pending = []
+_lock = threading.Lock()
+
+
+class _Deferred:
+    """A chain of attribute lookups and calls on ``drf_yasg.openapi``, evaluated by ``resolve()``."""
+
+    def __init__(self, steps=()):
+        self._steps = steps
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _Deferred(self._steps + (('attr', name),))
+
+    def __call__(self, *args, **kwargs):
+        return _Deferred(self._steps + (('call', args, kwargs),))
+
+    def _evaluate(self):
+        from drf_yasg import openapi as value
+
+        for step in self._steps:
+            if step[0] == 'attr':
+                value = getattr(value, step[1])
+            else:
+                value = value(*resolve(step[1]), **resolve(step[2]))
+        return value
+
+
+openapi = _Deferred()
+
+
+def resolve(value):
+    """``value`` with every deferred ``openapi`` object in it evaluated."""
+    if isinstance(value, _Deferred):
+        return value._evaluate()
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(item) for item in value)
+    if isinstance(value, dict):
+        return {resolve(key): resolve(item) for key, item in value.items()}
+    return value
+
+
+def swagger_auto_schema(*args, **kwargs):
+    def decorator(view):
+        if settings.API_DOCS_ENABLED:
+            _pending.append((view, args, kwargs))
+        return view
+    return decorator
+
+
+def apply_schemas():
+    """Apply the recorded ``swagger_auto_schema`` overrides, in declaration order, once."""
+    from drf_yasg.utils import swagger_auto_schema as apply
+
+    with _lock:
+        while _pending:
+            view, args, kwargs = _pending.pop(0)
+            # drf_yasg annotates the view in place
+            apply(*resolve(args), **resolve(kwargs))(view)
+
+
+def _build_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Healthcare Backend API",
+        default_version='v1',
+        description="A comprehensive healthcare management system API built with Django REST Framework",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="admin@healthcare.local"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def __getattr__(name):
+    if name == 'api_info':
+        global api_info
+        api_info = _build_info()
+        return api_info
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,286 @@
+"""
+Per-user change events for Server-Sent Events streams.
+
+Model signals publish events to a broker; streams read them back by id. Each
+user has a bounded ring buffer of recent events so that a reconnecting client
+can replay what it missed from its ``Last-Event-ID``. The broker is chosen by
+the ``EVENT_BROKER`` setting:
+
+* ``LocalBroker`` keeps buffers in process memory. It is the default and what
+  the tests use, but streams only see events published by the same worker.
+* ``CacheBroker`` keeps buffers in the configured cache, so with a shared
+  backend (Redis, Memcached) every worker sees every event.
+
+Streams poll the broker, so each open one costs a connection and, under
+WSGI, a worker thread for up to ``EVENT_STREAM_MAX_SECONDS``. The view only
+serves them under ASGI unless ``EVENT_STREAM_ALLOW_WSGI`` is set, and every
+worker caps its open streams at ``EVENT_STREAM_MAX_CONCURRENT``.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    data: dict = field(default_factory=dict)
+
+    def encode(self):
+        payload = json.dumps(self.data, cls=DjangoJSONEncoder)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class BaseBroker:
+    """
+    Interface every broker implements. Event ids are per user and increase
+    monotonically.
+    """
+
+    def __init__(self, buffer_size=None):
+        self.buffer_size = buffer_size or settings.EVENT_BUFFER_SIZE
+
+    def publish(self, user_id, event_type, data):
+        raise NotImplementedError('.publish() must be overridden')
+
+    def events_since(self, user_id, last_id):
+        """
+        Return ``(events, complete)`` where ``events`` are the buffered events
+        newer than ``last_id`` and ``complete`` is False when some events
+        after ``last_id`` have already been evicted from the buffer.
+        """
+        raise NotImplementedError('.events_since() must be overridden')
+
+    def last_event_id(self, user_id):
+        raise NotImplementedError('.last_event_id() must be overridden')
+
+
+class LocalBroker(BaseBroker):
+    """
+    In-process broker with a ring buffer per user.
+    """
+
+    def __init__(self, buffer_size=None):
+        super().__init__(buffer_size)
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._sequences = {}
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            event_id = self._sequences.get(user_id, 0) + 1
+            self._sequences[user_id] = event_id
+            buffer = self._buffers.setdefault(user_id, deque(maxlen=self.buffer_size))
+            buffer.append(Event(event_id, event_type, data))
+        return event_id
+
+    def events_since(self, user_id, last_id):
+        with self._lock:
+            buffer = list(self._buffers.get(user_id, ()))
+        current = self.last_event_id(user_id)
+        if last_id > current:
+            # The client saw ids this process never issued (e.g. a restart)
+            return [], False
+        events = [event for event in buffer if event.id > last_id]
+        oldest = buffer[0].id if buffer else current + 1
+        return events, last_id >= oldest - 1
+
+    def last_event_id(self, user_id):
+        return self._sequences.get(user_id, 0)
+
+
+class CacheBroker(BaseBroker):
+    """
+    Broker backed by the Django cache, shared by every worker using the same
+    cache. Events are stored one per key and expire on their own; the ring
+    buffer is the last ``buffer_size`` sequence numbers.
+    """
+    cache_alias = 'default'
+    key_prefix = 'events'
+    timeout = 3600
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _sequence_key(self, user_id):
+        return f'{self.key_prefix}:{user_id}:seq'
+
+    def _event_key(self, user_id, event_id):
+        return f'{self.key_prefix}:{user_id}:{event_id}'
+
+    def publish(self, user_id, event_type, data):
+        sequence_key = self._sequence_key(user_id)
+        self.cache.add(sequence_key, 0, None)
+        event_id = self.cache.incr(sequence_key)
+        self.cache.set(
+            self._event_key(user_id, event_id),
+            {'type': event_type, 'data': data},
+            self.timeout,
+        )
+        return event_id
+
+    def events_since(self, user_id, last_id):
+        current = self.last_event_id(user_id)
+        if current <= last_id:
+            return [], current == last_id
+        first = max(last_id + 1, current - self.buffer_size + 1)
+        keys = {self._event_key(user_id, event_id): event_id for event_id in range(first, current + 1)}
+        found = self.cache.get_many(list(keys))
+        events = [
+            Event(event_id, found[key]['type'], found[key]['data'])
+            for key, event_id in keys.items() if key in found
+        ]
+        complete = first == last_id + 1 and len(events) == len(keys)
+        return events, complete
+
+    def last_event_id(self, user_id):
+        return self.cache.get(self._sequence_key(user_id), 0)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def reset_broker():
+    """Drop the configured broker instance (used by tests and settings changes)."""
+    global _broker
+    _broker = None
+
+
+def publish(user_id, event_type, data):
+    if user_id is None:
+        return None
+    return get_broker().publish(user_id, event_type, data)
+
+
+class EventStream:
+    """
+    SSE body for one user. Iterates synchronously under WSGI and
+    asynchronously under ASGI, where idle connections cost no thread.
+
+    The stream ends after ``max_seconds`` so connections are recycled; the
+    client's automatic reconnect carries ``Last-Event-ID`` and resumes from
+    the ring buffer.
+    """
+
+    def __init__(self, user_id, last_event_id=None, broker=None):
+        self.user_id = user_id
+        self.broker = broker or get_broker()
+        self.last_id = last_event_id
+        self.poll_seconds = settings.EVENT_STREAM_POLL_SECONDS
+        self.heartbeat_seconds = settings.EVENT_STREAM_HEARTBEAT_SECONDS
+        self.max_seconds = settings.EVENT_STREAM_MAX_SECONDS
+
+    def _start(self):
+        chunks = [f"retry: {int(self.poll_seconds * 1000) + 1000}\n\n"]
+        if self.last_id is None:
+            # Fresh connection: only events from now on
+            self.last_id = self.broker.last_event_id(self.user_id)
+        return chunks
+
+    def _poll(self):
+        events, complete = self.broker.events_since(self.user_id, self.last_id)
+        chunks = []
+        if not complete:
+            # The buffer no longer holds everything the client missed; tell
+            # it to refetch and carry on from what is still buffered.
+            self.last_id = min(self.last_id, self.broker.last_event_id(self.user_id))
+            chunks.append(Event(self.last_id, 'resync').encode())
+        for event in events:
+            chunks.append(event.encode())
+            self.last_id = event.id
+        return chunks
+
+    def __iter__(self):
+        yield from self._start()
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < self.max_seconds:
+            chunks = self._poll()
+            now = time.monotonic()
+            if chunks:
+                last_sent = now
+                yield from chunks
+            elif now - last_sent >= self.heartbeat_seconds:
+                last_sent = now
+                yield ": keepalive\n\n"
+            time.sleep(self.poll_seconds)
+
+    async def __aiter__(self):
+        for chunk in await sync_to_async(self._start, thread_sensitive=False)():
+            yield chunk
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < self.max_seconds:
+            chunks = await sync_to_async(self._poll, thread_sensitive=False)()
+            now = time.monotonic()
+            if chunks:
+                last_sent = now
+                for chunk in chunks:
+                    yield chunk
+            elif now - last_sent >= self.heartbeat_seconds:
+                last_sent = now
+                yield ": keepalive\n\n"
+            await asyncio.sleep(self.poll_seconds)
+
+
+class StreamLimitReached(Exception):
+    """This worker already serves EVENT_STREAM_MAX_CONCURRENT streams."""
+
+
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
+
+def open_streams():
+    """Number of streams this process is serving."""
+    return _open_streams
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """
+    Response for an EventStream that holds one of the worker's stream slots
+    until the server closes it. Raises StreamLimitReached when none is free.
+    """
+
+    def __init__(self, stream, asynchronous=False):
+        global _open_streams
+        with _open_streams_lock:
+            if _open_streams >= settings.EVENT_STREAM_MAX_CONCURRENT:
+                raise StreamLimitReached
+            _open_streams += 1
+        self._holds_slot = True
+        # Async iteration only under ASGI; WSGI servers need a plain iterator
+        content = stream.__aiter__() if asynchronous else iter(stream)
+        super().__init__(content, content_type='text/event-stream')
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'
+
+    def close(self):
+        global _open_streams
+        try:
+            super().close()
+        finally:
+            with _open_streams_lock:
+                if self._holds_slot:
+                    self._holds_slot = False
+                    _open_streams -= 1
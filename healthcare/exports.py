@@ -0,0 +1,189 @@
+"""
+Columnar snapshots of patients, doctors and mappings for analytics.
+
+Rows are streamed from ``values_list().iterator()`` and written in batches of
+``EXPORT_BATCH_SIZE``, so memory stays bounded whatever the table size. The
+Parquet writer needs the optional ``pyarrow`` package, imported on first use;
+choice columns (gender, blood_group, specialization, status) are
+dictionary-encoded against their declared choices. CSV is always available as
+a fallback.
+"""
+import csv
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models
+
+from .lazy import LazyModule, module_available
+from .models import Patient, Doctor, PatientDoctorMapping
+
+# Optional dependency, too heavy to import in every worker
+pa = LazyModule('pyarrow')
+pq = LazyModule('pyarrow.parquet')
+
+FORMATS = ('parquet', 'csv')
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def parquet_available():
+    return module_available('pyarrow')
+
+
+def snapshot_querysets(user=None):
+    """
+    Querysets exported per table. With ``user`` the snapshot holds that
+    user's patients and their mappings; doctors are shared by everyone.
+    """
+    patients = Patient.objects.all()
+    mappings = PatientDoctorMapping.objects.all()
+    if user is not None:
+        patients = patients.filter(created_by=user)
+        mappings = mappings.filter(owner=user)
+    return {
+        'patients': patients,
+        'doctors': Doctor.objects.all(),
+        'mappings': mappings,
+    }
+
+
+def _choice_values(field):
+    values = [str(value) for value, _ in field.flatchoices]
+    if field.blank and '' not in values:
+        values.append('')
+    return values
+
+
+def _arrow_type(field):
+    if field.choices:
+        return pa.dictionary(pa.int16(), pa.string())
+    if isinstance(field, models.ForeignKey):
+        return pa.int64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pa.int64()
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    return pa.string()
+
+
+class _ParquetSink:
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.schema = pa.schema([
+            pa.field(field.attname, _arrow_type(field), nullable=field.null or bool(field.choices))
+            for field in fields
+        ])
+        # Fixed dictionaries keep codes stable across batches and files
+        self.dictionaries = {}
+        for field in fields:
+            if field.choices:
+                values = _choice_values(field)
+                self.dictionaries[field.attname] = (
+                    pa.array(values, type=pa.string()),
+                    {value: index for index, value in enumerate(values)},
+                )
+        self.writer = pq.ParquetWriter(path, self.schema, compression=settings.EXPORT_PARQUET_COMPRESSION)
+
+    def _array(self, field, values):
+        if field.attname in self.dictionaries:
+            dictionary, codes = self.dictionaries[field.attname]
+            indices = pa.array([codes.get(value) for value in values], type=pa.int16())
+            return pa.DictionaryArray.from_arrays(indices, dictionary)
+        return pa.array(values, type=self.schema.field(field.attname).type)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = [self._array(field, column) for field, column in zip(self.fields, columns)]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path, fields):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([field.attname for field in fields])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def export_table(queryset, path, fmt='parquet', batch_size=None):
+    """
+    Stream ``queryset`` to ``path`` in ``fmt`` and return the number of rows
+    written.
+    """
+    if fmt == 'parquet' and not parquet_available():
+        raise ExportUnavailable('Parquet export requires the pyarrow package')
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    fields = list(queryset.model._meta.concrete_fields)
+    sink = (_ParquetSink if fmt == 'parquet' else _CsvSink)(path, fields)
+    rows = queryset.order_by('pk').values_list(*[field.attname for field in fields])
+    written = 0
+    batch = []
+    try:
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                sink.write(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            sink.write(batch)
+            written += len(batch)
+    finally:
+        sink.close()
+    return written
+
+
+def write_snapshot(directory, fmt='parquet', user=None, tables=None, batch_size=None):
+    """
+    Write one file per table into ``directory``. Returns
+    ``{table: {'file', 'rows', 'bytes', 'seconds'}}``.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    summary = {}
+    for table, queryset in snapshot_querysets(user).items():
+        if tables and table not in tables:
+            continue
+        name = f'{table}.{fmt}'
+        started = time.perf_counter()
+        rows = export_table(queryset, directory / name, fmt, batch_size)
+        summary[table] = {
+            'file': name,
+            'rows': rows,
+            'bytes': (directory / name).stat().st_size,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+    return summary
+
+
+def purge_exports(older_than):
+    """Remove export directories last modified before ``older_than`` seconds ago."""
+    root = Path(settings.EXPORT_ROOT)
+    if not root.exists():
+        return 0
+    horizon = time.time() - older_than
+    removed = 0
+    for owner in root.iterdir():
+        for snapshot in owner.iterdir() if owner.is_dir() else ():
+            if snapshot.stat().st_mtime < horizon:
+                shutil.rmtree(snapshot, ignore_errors=True)
+                removed += 1
+    return removed
@@ -0,0 +1,151 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+The first request carrying a given key (per user and endpoint) inserts an
+in-flight IdempotencyKey row, runs the view and stores the response on that
+row. A retry with the same key gets the stored response back without running
+validation or inserts again. A duplicate arriving while the first request is
+still running waits for it, up to IDEMPOTENCY_WAIT_SECONDS, instead of
+executing twice. Failed requests (exceptions, 4xx and 5xx responses) release
+the key so the corrected request can be sent with it.
+"""
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _fingerprint(request):
+    return hashlib.blake2b(request.body, digest_size=16).hexdigest()
+
+
+def _acquire(user, key, route, fingerprint):
+    """
+    Return ``(record, created)``. ``record`` is None when a conflicting row
+    disappeared (or was expired and removed) before it could be read.
+    """
+    now = timezone.now()
+    # Look first so a replay costs one indexed SELECT
+    record = IdempotencyKey.objects.filter(user=user, key=key, route=route).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, key=key, route=route, fingerprint=fingerprint,
+                    expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+                )
+            return record, True
+        except IntegrityError:
+            # Lost the race to a concurrent duplicate
+            record = IdempotencyKey.objects.filter(user=user, key=key, route=route).first()
+            if record is None:
+                return None, False
+    abandoned = (
+        record.status_code is None
+        and record.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    )
+    if record.expires_at <= now or abandoned:
+        # Expired, or its request died without releasing it: free the key
+        IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+        return None, False
+    return record, False
+
+
+def _execute(record, handler):
+    try:
+        response = handler()
+    except Exception:
+        record.delete()
+        raise
+    if response.status_code >= 400:
+        record.delete()
+        return response
+    record.status_code = response.status_code
+    record.response = response.data
+    record.location = response.get('Location', '')
+    record.save(update_fields=['status_code', 'response', 'location'])
+    return response
+
+
+def _replay(record):
+    response = Response(record.response, status=record.status_code)
+    if record.location:
+        response['Location'] = record.location
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(request, handler):
+    """
+    Run ``handler()`` (which returns a DRF Response) at most once per
+    Idempotency-Key; without the header it simply runs.
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return handler()
+    if not 0 < len(key) <= 255:
+        raise ValidationError({HEADER: 'Must be between 1 and 255 characters'})
+    route = request.resolver_match.view_name
+    fingerprint = _fingerprint(request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        record, created = _acquire(request.user, key, route, fingerprint)
+        if created:
+            return _execute(record, handler)
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'detail': f'{HEADER} was already used with a different request body.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is not None:
+                return _replay(record)
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'detail': f'A request with this {HEADER} is still in progress.'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={'Retry-After': '1'},
+                )
+            # Still in flight: wait for it to finish, then replay its response
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+
+class IdempotencyMixin:
+    """Honour Idempotency-Key on ``post()`` of a class-based view."""
+
+    def post(self, request, *args, **kwargs):
+        parent = super().post
+        return idempotent(request, lambda: parent(request, *args, **kwargs))
+
+
+def idempotent_view(view):
+    """Same as IdempotencyMixin for function views; apply below ``@api_view``."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return idempotent(request, lambda: view(request, *args, **kwargs))
+    return wrapper
+
+
+def purge_idempotency_keys(batch_size=None):
+    """Delete expired keys, ``batch_size`` rows per statement."""
+    batch_size = batch_size or settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+    expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).order_by('pk')
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,161 @@
+"""
+Database-backed background job queue.
+
+Functions are registered with ``@job('name')`` and queued with ``enqueue``.
+The job row is written in the caller's transaction, so work requested by a
+request that rolls back never runs. ``manage.py run_jobs`` claims due jobs and
+runs them on a thread or process pool; no external broker is needed, and tests
+can drain the queue synchronously with ``run_pending()``.
+
+Claiming is a conditional UPDATE (``WHERE id = ? AND status = ...``), so
+several workers can poll the same table without running a job twice. The
+claim counts as an attempt, so a job that kills or hangs its worker is failed
+once its lease has expired ``max_attempts`` times instead of being reclaimed
+forever.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def job(name, max_attempts=None):
+    """Register a function as a background job under ``name``."""
+    def decorator(func):
+        func.job_name = name
+        func.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_job_function(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"No job registered as '{name}'")
+
+
+def enqueue(name, *args, user=None, delay=None, **kwargs):
+    """
+    Queue the job ``name`` with JSON-serializable arguments and return the
+    Job row.
+    """
+    func = get_job_function(name)
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=func.max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+        created_by=user,
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit):
+    """
+    Claim up to ``limit`` due jobs for ``worker`` and return their ids. Jobs
+    whose lease expired while RUNNING are claimed again, unless they have
+    used up their attempts, in which case they are marked FAILED.
+    """
+    now = timezone.now()
+    Job.objects.filter(status='RUNNING', locked_until__lt=now, attempts__gte=F('max_attempts')).update(
+        status='FAILED', locked_until=None, finished_at=now,
+        error='Lease expired: the worker died or hung while running the job',
+    )
+    due = (
+        Q(status='QUEUED', run_after__lte=now)
+        | Q(status='RUNNING', locked_until__lt=now)
+    )
+    candidates = list(Job.objects.filter(due).order_by('run_after', 'id').values_list('id', 'status')[:limit])
+    claimed = []
+    for job_id, current_status in candidates:
+        won = Job.objects.filter(id=job_id, status=current_status).filter(due).update(
+            status='RUNNING',
+            attempts=F('attempts') + 1,
+            worker=worker,
+            started_at=now,
+            locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        )
+        if won:
+            claimed.append(job_id)
+    return claimed
+
+
+def execute(job_id):
+    """Run one claimed job and record its outcome. Returns True on success."""
+    job_row = Job.objects.get(pk=job_id)
+    # Already counted by claim()
+    attempts = job_row.attempts
+    try:
+        result = get_job_function(job_row.name)(*job_row.args, **job_row.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Job %s failed (attempt %s)', job_row, attempts)
+        if attempts < job_row.max_attempts:
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+            Job.objects.filter(pk=job_id).update(
+                status='QUEUED', error=error, locked_until=None,
+                run_after=timezone.now() + timedelta(seconds=backoff),
+            )
+        else:
+            Job.objects.filter(pk=job_id).update(
+                status='FAILED', error=error, locked_until=None,
+                finished_at=timezone.now(),
+            )
+        return False
+    Job.objects.filter(pk=job_id).update(
+        status='SUCCEEDED', result=result, error='', locked_until=None,
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_pending(limit=None, worker='inline'):
+    """
+    Claim and run due jobs in the current thread until none are left (or
+    ``limit`` have run). Returns the number of jobs run.
+    """
+    ran = 0
+    while limit is None or ran < limit:
+        batch = claim(worker, 1)
+        if not batch:
+            return ran
+        execute(batch[0])
+        ran += 1
+    return ran
+
+
+def enqueue_periodic(name, interval):
+    """
+    Queue ``name`` unless a run is already pending or one was queued less
+    than ``interval`` ago. Workers call this on a timer, so when several do at
+    once the job may be queued twice, which periodic maintenance tolerates.
+    """
+    recent = Q(status__in=['QUEUED', 'RUNNING']) | Q(created_at__gt=timezone.now() - interval)
+    if Job.objects.filter(recent, name=name).exists():
+        return None
+    return enqueue(name)
+
+
+def purge_finished(older_than=None):
+    """Delete finished jobs (and their results) older than JOB_RESULT_TTL_DAYS."""
+    older_than = older_than or timedelta(days=settings.JOB_RESULT_TTL_DAYS)
+    horizon = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(status__in=['SUCCEEDED', 'FAILED'], finished_at__lt=horizon).delete()
+    return deleted
@@ -0,0 +1,51 @@
+"""
+Deferred imports for heavy optional dependencies and rarely used views.
+
+Workers import every module reachable from the URLconf and the app registry
+before serving their first request. Packages only a few endpoints need
+(pyarrow, NumPy, the documentation generator) are imported on first use
+instead, so they do not slow down every cold start.
+"""
+import importlib
+import importlib.util
+
+from django.views.decorators.csrf import csrf_exempt
+
+
+def module_available(name):
+    """Whether ``name`` can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+class LazyModule:
+    """Stands in for a module and imports it on the first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_view(factory):
+    """
+    A view that calls ``factory()`` on its first request and delegates to the
+    view it returns, so the modules behind it are imported only when the
+    route is actually hit.
+    """
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = factory()
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from healthcare.models import Patient, Doctor
+
+GENDERS = ['M', 'F', 'O']
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-', '']
+STATES = ['CA', 'NY', 'TX', 'FL', 'IL', 'PA', 'OH', 'GA', 'NC', 'MI']
+
+
+def seed_patients(rows, username='bench', batch_size=5000):
+    """
+    Insert ``rows`` synthetic patients owned by a new user and return the
+    user. Callers run this inside a transaction they roll back.
+    """
+    user = User.objects.create_user(username=username, password=username)
+    for start in range(0, rows, batch_size):
+        Patient.objects.bulk_create([
+            Patient(
+                created_by=user,
+                first_name=f'Bench{i}',
+                last_name='Patient',
+                email=f'{username}-{i}@example.com',
+                date_of_birth=date(1930, 1, 1) + timedelta(days=i * 7 % 34000),
+                gender=GENDERS[i % len(GENDERS)],
+                blood_group=BLOOD_GROUPS[i % len(BLOOD_GROUPS)],
+                address=f'{i} Bench St',
+                city='Benchville',
+                state=STATES[i % len(STATES)],
+                zip_code='00000',
+                emergency_contact_name='Bench Contact',
+                emergency_contact_phone='+1234567890',
+            )
+            for i in range(start, min(start + batch_size, rows))
+        ])
+    return user
+
+
+def seed_doctors(user, rows, batch_size=5000):
+    specializations = [value for value, _ in Doctor.SPECIALIZATION_CHOICES]
+    for start in range(0, rows, batch_size):
+        Doctor.objects.bulk_create([
+            Doctor(
+                created_by=user,
+                first_name='Bench',
+                last_name=f'Doctor{i}',
+                email=f'{user.username}-doctor-{i}@example.com',
+                phone_number='+1234567890',
+                specialization=specializations[i % len(specializations)],
+                license_number=f'{user.username}-{i}',
+                years_of_experience=i % 40,
+                qualification='MD',
+                hospital_affiliation='Bench Hospital',
+                office_address='1 Bench St',
+                city='Benchville',
+                state=STATES[i % len(STATES)],
+                zip_code='00000',
+                consultation_fee='100.00',
+            )
+            for i in range(start, min(start + batch_size, rows))
+        ])
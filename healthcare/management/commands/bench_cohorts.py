@@ -0,0 +1,64 @@
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from healthcare.cohorts import numpy_available, patient_cohort_aggregates, patient_cohorts
+from healthcare.models import Patient
+from healthcare.stats import AGE_BANDS
+
+from ._bench import seed_patients
+
+
+class Command(BaseCommand):
+    help = (
+        'Time patient cohorts computed with ORM aggregates (what the endpoint '
+        'uses) and with NumPy, against an age-band by gender count row by row. '
+        'Synthetic patients are added inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000000,
+            help='Synthetic patients to add before measuring'
+        )
+
+    def handle(self, *args, **options):
+        if not numpy_available():
+            raise CommandError('Cohort statistics require NumPy')
+
+        with transaction.atomic():
+            user = seed_patients(options['rows'], username='bench-cohorts')
+            patients = Patient.objects.filter(created_by=user)
+            for label, strategy in (
+                ('row by row', self.row_by_row),
+                ('orm aggregate', self.orm_aggregate),
+                ('numpy', self.vectorized),
+            ):
+                started = time.perf_counter()
+                strategy(patients)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{label:<16} {elapsed:>8.2f}s  {options["rows"] / elapsed:>12.0f} rows/s')
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def row_by_row(patients):
+        today = date.today()
+        counts = Counter()
+        for patient in patients.iterator():
+            born = patient.date_of_birth
+            age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+            band = next(label for label, minimum in reversed(AGE_BANDS) if age >= minimum)
+            counts[band, patient.gender] += 1
+        return counts
+
+    @staticmethod
+    def orm_aggregate(patients):
+        return patient_cohort_aggregates(patients)
+
+    @staticmethod
+    def vectorized(patients):
+        return patient_cohorts(patients)
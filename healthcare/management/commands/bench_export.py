@@ -0,0 +1,43 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from healthcare.exports import parquet_available, write_snapshot
+
+from ._bench import seed_patients
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare Parquet and CSV snapshot size and write time. With --rows, '
+        'synthetic patients are added inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=0,
+            help='Synthetic patients to add before exporting'
+        )
+
+    def handle(self, *args, **options):
+        if not parquet_available():
+            raise CommandError('Parquet export requires the pyarrow package')
+
+        with transaction.atomic():
+            if options['rows']:
+                seed_patients(options['rows'], username='bench-export')
+            with tempfile.TemporaryDirectory() as directory:
+                results = {fmt: write_snapshot(f'{directory}/{fmt}', fmt) for fmt in ('csv', 'parquet')}
+            transaction.set_rollback(True)
+
+        for table in results['csv']:
+            csv, parquet = results['csv'][table], results['parquet'][table]
+            ratio = csv['bytes'] / parquet['bytes'] if parquet['bytes'] else 0
+            self.stdout.write(
+                f"{table:<10} {csv['rows']:>9} rows  "
+                f"csv {csv['bytes']:>11} B {csv['seconds']:>7.2f}s  "
+                f"parquet {parquet['bytes']:>11} B {parquet['seconds']:>7.2f}s  "
+                f"csv/parquet {ratio:.1f}x"
+            )
@@ -0,0 +1,175 @@
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection
+from healthcare.models import Patient, Doctor, PatientDoctorMapping, Tombstone
+from healthcare.serializers import PatientSerializer, constraint_savepoint
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        # Rough size of the values sent, a proxy for the row data written
+        self.bytes += len(sql) + len(str(params or ''))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare write throughput of check-then-insert against constraint-driven '
+        'inserts, and of full-row against changed-column updates. Runs in '
+        'autocommit, like API requests; the rows it writes are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000,
+            help='Number of inserts attempted per strategy'
+        )
+        parser.add_argument(
+            '--duplicates',
+            type=float,
+            default=0.1,
+            help='Fraction of attempts that collide with an existing row'
+        )
+        parser.add_argument(
+            '--text-size',
+            type=int,
+            default=4000,
+            help='Characters of medical history on each patient in the update runs'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        every = round(1 / options['duplicates']) if options['duplicates'] > 0 else 0
+
+        last_tombstone = Tombstone.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        user = User.objects.create_user(username='bench-writes', password='bench-writes')
+        try:
+            doctors = [self.make_doctor(user, i) for i in range(rows)]
+            existing = self.make_patient(user, 'bench-existing@example.com')
+            existing.save()
+
+            for label, strategy in (('check-then-insert', self.precheck), ('constraint', self.constrained)):
+                attempts = []
+                for i in range(rows):
+                    duplicate = every and i % every == 0
+                    email = existing.email if duplicate else f'bench-{label}-{i}@example.com'
+                    attempts.append((self.make_patient(user, email), {'email': email}))
+                self.run(f'patients / {label}', attempts, strategy)
+
+            for label, strategy in (('check-then-insert', self.precheck), ('constraint', self.constrained)):
+                patient = self.make_patient(user, f'bench-{label}@example.com')
+                patient.save()
+                attempts = []
+                for i in range(rows):
+                    # Every n-th attempt re-assigns the previous doctor
+                    doctor = doctors[i - 1] if every and i and i % every == 0 else doctors[i]
+                    mapping = PatientDoctorMapping(patient=patient, doctor=doctor, created_by=user)
+                    attempts.append((mapping, {'patient': patient, 'doctor': doctor}))
+                self.run(f'mappings / {label}', attempts, strategy)
+
+            history = ('Hypertension, controlled with medication. ' * (options['text_size'] // 42 + 1))
+            patients = [self.make_patient(user, f'bench-update-{i}@example.com') for i in range(rows)]
+            for patient in patients:
+                patient.medical_history = history[:options['text_size']]
+            Patient.objects.bulk_create(patients)
+            patients = list(Patient.objects.filter(email__startswith='bench-update-'))
+            for label, strategy, city in (('full row', self.full_row, 'Full Row City'),
+                                          ('changed columns', self.changed_columns, 'Changed City')):
+                self.run(f'updates / {label}', [(patient, {'city': city}) for patient in patients], strategy)
+                self.run(f'updates / {label} / no-op', [(patient, {'city': city}) for patient in patients], strategy)
+        finally:
+            # Deleting the user cascades to its rows; drop the tombstones that leaves
+            user.delete()
+            Tombstone.objects.filter(pk__gt=last_tombstone).delete()
+
+    def run(self, label, attempts, strategy):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for obj, lookup in attempts:
+                strategy(obj, lookup)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label:<34} {len(attempts) / elapsed:>9.0f} writes/s  '
+            f'{counter.count / len(attempts):.2f} statements/write  '
+            f'{counter.bytes / len(attempts):>7.0f} bytes/write'
+        )
+
+    @staticmethod
+    def precheck(obj, lookup):
+        """Previous create path: SELECT for a duplicate, then INSERT."""
+        if type(obj).objects.filter(**lookup).exists():
+            return False
+        obj.save()
+        return True
+
+    @staticmethod
+    def constrained(obj, lookup):
+        """Current create path: INSERT and let the unique constraint reject duplicates."""
+        try:
+            with constraint_savepoint():
+                obj.save()
+        except IntegrityError:
+            return False
+        return True
+
+    @staticmethod
+    def full_row(obj, changes):
+        """Previous update path: assign the fields and rewrite every column."""
+        for name, value in changes.items():
+            setattr(obj, name, value)
+        obj.save()
+
+    @staticmethod
+    def changed_columns(obj, changes):
+        """Current update path: the serializer writes only changed columns, or nothing."""
+        serializer = PatientSerializer(obj, data=changes, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    @staticmethod
+    def make_patient(user, email):
+        return Patient(
+            created_by=user,
+            first_name='Bench',
+            last_name='Patient',
+            email=email,
+            date_of_birth=date(1990, 1, 1),
+            gender='O',
+            address='1 Bench St',
+            city='Benchville',
+            state='BS',
+            zip_code='00000',
+            emergency_contact_name='Bench Contact',
+            emergency_contact_phone='+1234567890',
+        )
+
+    @staticmethod
+    def make_doctor(user, index):
+        return Doctor.objects.create(
+            created_by=user,
+            first_name='Bench',
+            last_name=f'Doctor{index}',
+            email=f'bench-doctor-{index}@example.com',
+            phone_number='+1234567890',
+            specialization='GENERAL',
+            license_number=f'BENCH-{index}',
+            years_of_experience=1,
+            qualification='MD',
+            hospital_affiliation='Bench Hospital',
+            office_address='1 Bench St',
+            city='Benchville',
+            state='BS',
+            zip_code='00000',
+            consultation_fee='100.00',
+        )
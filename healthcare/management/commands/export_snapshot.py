@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from healthcare.exports import FORMATS, ExportUnavailable, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write Parquet (or CSV) snapshots of patients, doctors and mappings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='parquet',
+            help='Output format (parquet needs pyarrow)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Directory to write into (default: ./snapshot-<timestamp>)'
+        )
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=['patients', 'doctors', 'mappings'],
+            help='Only export these tables'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per record batch (default: EXPORT_BATCH_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or f"snapshot-{timezone.now():%Y%m%dT%H%M%S}"
+        try:
+            summary = write_snapshot(
+                output, options['format'], tables=options['tables'], batch_size=options['batch_size']
+            )
+        except ExportUnavailable as exc:
+            raise CommandError(str(exc))
+        for table, info in summary.items():
+            self.stdout.write(f"{table:<10} {info['rows']:>10} rows {info['bytes']:>12} bytes {info['seconds']:>8.2f}s")
+        self.stdout.write(self.style.SUCCESS(f'Snapshot written to {output}'))
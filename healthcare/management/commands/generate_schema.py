@@ -0,0 +1,31 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from healthcare.schema import code_version, generate, purge_stale
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema and its compressed variants for the current code version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-stale',
+            action='store_true',
+            help='Keep schemas generated for other code versions'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        documents = generate()
+        elapsed = time.perf_counter() - started
+        for name, document in documents.items():
+            sizes = ' '.join(f'{encoding} {len(data)}' for encoding, data in document.variants.items())
+            self.stdout.write(f'{name:<14} {len(document.body):>8} bytes ({sizes})')
+        if not options['keep_stale']:
+            removed = purge_stale()
+            if removed:
+                self.stdout.write(f'Removed {removed} stale schema version(s)')
+        directory = Path(settings.API_SCHEMA_ROOT) / code_version()
+        self.stdout.write(self.style.SUCCESS(f'Schema generated in {elapsed:.2f}s into {directory}'))
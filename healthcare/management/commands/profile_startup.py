@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is imported yet
+PROBE = '''
+import json, os, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+setup = time.perf_counter() - started
+
+from django.urls import get_resolver
+started = time.perf_counter()
+get_resolver().url_patterns
+urlconf = time.perf_counter() - started
+
+from django.test import Client
+settings.ALLOWED_HOSTS.append('testserver')
+client = Client()
+requests = []
+for path in sys.argv[1:]:
+    started = time.perf_counter()
+    response = client.get(path)
+    requests.append([path, response.status_code, time.perf_counter() - started])
+print(json.dumps({'setup': setup, 'urlconf': urlconf, 'requests': requests}))
+'''
+
+
+def parse_importtime(stderr):
+    """Yield ``(module, self_us, cumulative_us, depth)`` from ``-X importtime`` output."""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        yield name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the project in a fresh interpreter under -X importtime and report import time '
+        'per package and the latency of the first requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            default=['/api/doctors/', '/'],
+            help='Paths requested once after startup (default: /api/doctors/ /)'
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=1,
+            help='Group modules by this many leading dotted components (default: 1)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of packages to list'
+        )
+        parser.add_argument(
+            '--no-docs',
+            action='store_true',
+            help='Profile with API_DOCS_ENABLED=False'
+        )
+        parser.add_argument(
+            '--no-admin',
+            action='store_true',
+            help='Profile with ADMIN_ENABLED=False'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'healthcare_backend.settings'))
+        if options['no_docs']:
+            env['API_DOCS_ENABLED'] = 'False'
+        if options['no_admin']:
+            env['ADMIN_ENABLED'] = 'False'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, *options['paths']],
+            env=env, capture_output=True, text=True, cwd=os.getcwd(),
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'Probe failed')
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+        packages = {}
+        total = 0
+        for name, self_us, _, _ in parse_importtime(result.stderr):
+            key = '.'.join(name.split('.')[:options['depth']])
+            count, elapsed = packages.get(key, (0, 0))
+            packages[key] = (count + 1, elapsed + self_us)
+            total += self_us
+
+        self.stdout.write(f"{'django.setup()':<40} {timings['setup'] * 1000:>9.1f} ms")
+        self.stdout.write(f"{'URLconf':<40} {timings['urlconf'] * 1000:>9.1f} ms")
+        for path, status, elapsed in timings['requests']:
+            self.stdout.write(f"{f'first GET {path} ({status})':<40} {elapsed * 1000:>9.1f} ms")
+        self.stdout.write(f"{'imports (all modules, self time)':<40} {total / 1000:>9.1f} ms")
+        self.stdout.write('')
+        self.stdout.write(f"{'package':<40} {'modules':>7} {'self ms':>9}")
+        ranked = sorted(packages.items(), key=lambda item: -item[1][1])
+        for key, (count, elapsed) in ranked[:options['top']]:
+            self.stdout.write(f'{key:<40} {count:>7} {elapsed / 1000:>9.1f}')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from healthcare.counters import recount
+from healthcare.models import Patient, Doctor
+
+
+class Command(BaseCommand):
+    help = 'Rebuild active_doctor_count and active_patient_count from the mapping table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows recounted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, label, key in ((Patient, 'patients', 'patient_ids'), (Doctor, 'doctors', 'doctor_ids')):
+            other = 'doctor_ids' if key == 'patient_ids' else 'patient_ids'
+            ids = model.objects.order_by('pk').values_list('pk', flat=True)
+            total = 0
+            last = 0
+            while True:
+                batch = list(ids.filter(pk__gt=last)[:batch_size])
+                if not batch:
+                    break
+                with transaction.atomic():
+                    recount(**{key: batch, other: []})
+                total += len(batch)
+                last = batch[-1]
+            self.stdout.write(f'Recounted {total} {label}')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled'))
@@ -0,0 +1,106 @@
+import time
+from datetime import timedelta
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from healthcare.jobs import claim, enqueue_periodic, execute, worker_name
+
+
+def run_job(job_id):
+    """Pool entry point: run one job on a fresh database connection."""
+    close_old_connections()
+    try:
+        return execute(job_id)
+    finally:
+        connections.close_all()
+
+
+def setup_process():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (exports, cascade cleanups, purges) on a worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help='Number of jobs to run concurrently'
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['thread', 'process'],
+            default='thread',
+            help='Run jobs on threads (I/O bound work) or processes (CPU bound work)'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=settings.JOB_POLL_SECONDS,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling forever'
+        )
+        parser.add_argument(
+            '--no-purge',
+            action='store_true',
+            help='Do not schedule the purge_expired job every JOB_PURGE_INTERVAL_SECONDS'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        name = worker_name()
+        if options['pool'] == 'process':
+            # Children must not inherit the parent's open connections
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=setup_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {name} running {workers} {options["pool"]} workers'))
+        running = {}
+        succeeded = failed = 0
+        purge_interval = settings.JOB_PURGE_INTERVAL_SECONDS
+        next_purge = time.monotonic()
+        try:
+            while True:
+                if not options['no_purge'] and time.monotonic() >= next_purge:
+                    # Tombstones, old jobs and exports, expired idempotency keys
+                    enqueue_periodic('purge_expired', timedelta(seconds=purge_interval))
+                    next_purge = time.monotonic() + purge_interval
+                free = workers - len(running)
+                if free:
+                    for job_id in claim(name, free):
+                        running[pool.submit(run_job, job_id)] = job_id
+                    close_old_connections()
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        ok = future.result()
+                    except Exception as exc:
+                        ok = False
+                        self.stderr.write(f'Job {job_id} crashed the worker: {exc}')
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                    self.stdout.write(f"Job {job_id} {'succeeded' if ok else 'failed'}")
+        except KeyboardInterrupt:
+            self.stdout.write('Shutting down, waiting for running jobs...')
+        finally:
+            pool.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f'{succeeded} jobs succeeded, {failed} failed'))
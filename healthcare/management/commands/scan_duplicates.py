@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from healthcare.dedup import index_patient, scan_duplicates
+from healthcare.models import Patient
+
+
+class Command(BaseCommand):
+    help = 'List pairs of patients that are probably the same person'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only scan patients created by this username'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            help='Minimum score to report (default: DEDUP_MATCH_THRESHOLD)'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every blocking key before scanning'
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['user']:
+            owner = User.objects.filter(username=options['user']).first()
+            if owner is None:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        if options['rebuild']:
+            patients = Patient.objects.all() if owner is None else Patient.objects.filter(created_by=owner)
+            for patient in patients.iterator(chunk_size=2000):
+                index_patient(patient)
+
+        found = 0
+        for patient, other, similarity in scan_duplicates(owner=owner, threshold=options['threshold']):
+            found += 1
+            self.stdout.write(
+                f'{similarity:.2f}  #{patient.pk} {patient.full_name} <{patient.email}>  '
+                f'#{other.pk} {other.full_name} <{other.email}>'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Found {found} possible duplicate pairs'))
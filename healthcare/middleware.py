@@ -0,0 +1,115 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from .compression import StreamCompressor, compress, negotiate_encoding
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'application/yaml', 'application/openapi+json', 'image/svg+xml',
+}
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Expose the tightest token bucket consulted for the request through
+    X-RateLimit-* response headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        state = getattr(request, 'rate_limit', None)
+        if state is not None:
+            response['X-RateLimit-Limit'] = str(state['limit'])
+            response['X-RateLimit-Remaining'] = str(state['remaining'])
+            response['X-RateLimit-Reset'] = str(state['reset'])
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts (zstd,
+    br or gzip, see healthcare.compression) once they are at least
+    COMPRESSION_MIN_SIZE bytes.
+
+    Compressed bodies are cached under a digest of the uncompressed bytes,
+    so a payload that is served repeatedly (a cached list page, the stats
+    dashboard) is compressed once and then only hashed. Streaming responses
+    such as export downloads are compressed chunk by chunk; event streams
+    are left alone so every event is delivered as soon as it is written.
+
+    Secrets are never compressed, so they cannot leak through compressed
+    sizes (BREACH): responses under COMPRESSION_EXEMPT_PATHS (the login and
+    registration endpoints that issue JWTs), responses marked
+    ``Cache-Control: no-transform``, responses that set cookies, and
+    responses to requests carrying the session or CSRF cookie (admin pages
+    embed CSRF tokens). API data is compressed: it is only returned for an
+    Authorization header, which a cross-site page cannot make the browser send.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = StreamCompressor(encoding)
+            if response.is_async:
+                response.streaming_content = compressor.astream(response.streaming_content)
+            else:
+                response.streaming_content = compressor.stream(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = self.compressed_content(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed representation differs byte for byte from the original
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def should_compress(self, request, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.has_header('Content-Encoding'):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        if request.path.startswith(tuple(settings.COMPRESSION_EXEMPT_PATHS)):
+            return False
+        ambient = (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME)
+        if response.cookies or any(name in request.COOKIES for name in ambient):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type == 'text/event-stream':
+            return False
+        return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES or content_type.endswith('+json')
+
+    def compressed_content(self, content, encoding):
+        if len(content) > settings.COMPRESSION_CACHE_MAX_SIZE:
+            return compress(content, encoding)
+        key = f'compressed:{encoding}:{hashlib.blake2b(content, digest_size=16).hexdigest()}'
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(content, encoding)
+            cache.set(key, compressed, settings.COMPRESSION_CACHE_SECONDS)
+        return compressed
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Patient = apps.get_model('healthcare', 'Patient')
+    Doctor = apps.get_model('healthcare', 'Doctor')
+    PatientDoctorMapping = apps.get_model('healthcare', 'PatientDoctorMapping')
+
+    def active_count(field):
+        return Coalesce(
+            Subquery(
+                PatientDoctorMapping.objects
+                .filter(**{field: OuterRef('pk')}, status='ACTIVE')
+                .order_by()
+                .values(field)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            Value(0),
+        )
+
+    Patient.objects.update(active_doctor_count=active_count('patient'))
+    Doctor.objects.update(active_patient_count=active_count('doctor'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0003_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='active_patient_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='active_doctor_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
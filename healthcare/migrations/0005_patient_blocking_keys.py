@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+# Frozen copies of healthcare.dedup.soundex and blocking_keys as of this
+# migration, so later changes to the live code cannot alter the backfill.
+SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6',
+}
+
+
+def soundex(name):
+    letters = re.sub(r'[^A-Z]', '', name.upper())
+    if not letters:
+        return ''
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def blocking_keys(patient):
+    keys = []
+    surname = soundex(patient.last_name)
+    if surname and patient.date_of_birth:
+        keys.append(('NAME_DOB', f'{surname}:{patient.date_of_birth.isoformat()}'))
+    digits = re.sub(r'\D', '', patient.phone_number or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    if len(digits) >= 7:
+        keys.append(('PHONE', digits))
+    return keys
+
+
+def backfill_blocking_keys(apps, schema_editor):
+    Patient = apps.get_model('healthcare', 'Patient')
+    PatientBlockingKey = apps.get_model('healthcare', 'PatientBlockingKey')
+    keys = []
+    patients = Patient.objects.only('created_by_id', 'last_name', 'date_of_birth', 'phone_number')
+    for patient in patients.iterator(chunk_size=2000):
+        keys.extend(
+            PatientBlockingKey(patient_id=patient.pk, owner_id=patient.created_by_id, kind=kind, key=key)
+            for kind, key in blocking_keys(patient)
+        )
+        if len(keys) >= 2000:
+            PatientBlockingKey.objects.bulk_create(keys)
+            keys = []
+    PatientBlockingKey.objects.bulk_create(keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('healthcare', '0004_assignment_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('NAME_DOB', 'Phonetic last name and date of birth'), ('PHONE', 'Phone number digits')], max_length=10)),
+                ('key', models.CharField(max_length=64)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='healthcare.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'kind', 'key'], name='blocking_key_lookup_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_blocking_keys, migrations.RunPython.noop),
+    ]
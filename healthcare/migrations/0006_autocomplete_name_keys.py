@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:48
+
+from django.db import migrations, models
+import re
+import unicodedata
+
+
+def normalize_name(value):
+    # Frozen copy of healthcare.models.normalize_name as of this migration
+    value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value.lower()).split())
+
+
+def backfill_name_keys(apps, schema_editor):
+    for model_name in ('Patient', 'Doctor'):
+        model = apps.get_model('healthcare', model_name)
+        batch = []
+        for row in model.objects.only('first_name', 'last_name').iterator(chunk_size=2000):
+            row.name_key = normalize_name(f'{row.first_name} {row.last_name}')[:201]
+            row.surname_key = normalize_name(f'{row.last_name} {row.first_name}')[:201]
+            batch.append(row)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['name_key', 'surname_key'])
+                batch = []
+        model.objects.bulk_update(batch, ['name_key', 'surname_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0005_patient_blocking_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='surname_key',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='surname_key',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        # Fill the keys before the indexes are built
+        migrations.RunPython(backfill_name_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['name_key'], name='doctor_name_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['surname_key'], name='doctor_surname_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['name_key'], name='patient_name_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['surname_key'], name='patient_surname_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
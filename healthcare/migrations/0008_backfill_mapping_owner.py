@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_owner(apps, schema_editor):
+    Patient = apps.get_model('healthcare', 'Patient')
+    PatientDoctorMapping = apps.get_model('healthcare', 'PatientDoctorMapping')
+    PatientDoctorMapping.objects.filter(owner__isnull=True).update(
+        owner_id=Subquery(Patient.objects.filter(pk=OuterRef('patient_id')).values('created_by_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    # Separate from the schema changes: PostgreSQL refuses to ALTER a table
+    # with pending trigger events from an UPDATE in the same transaction
+
+    dependencies = [
+        ('healthcare', '0007_mapping_owner'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+    ]
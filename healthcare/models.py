@@ -1,9 +1,106 @@
-from django.db import models
+import re
+import unicodedata
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import RegexValidator
 
 
-class Patient(models.Model):
+class ActiveManager(models.Manager):
+    """
+    Manager that hides soft-deleted (is_active=False) rows. API views read
+    through it so deleted records disappear from list and detail endpoints.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
+class SoftDeleteMixin:
+    def soft_delete(self):
+        """Hide the record by flipping is_active; related rows are cleaned up separately."""
+        self.is_active = False
+        self.save(update_fields=['is_active', 'updated_at'])
+
+
+class VersionConflict(IntegrityError):
+    """
+    The row was changed by someone else since this instance was read. An
+    IntegrityError, so save() callers that already handle failed writes
+    (and the admin, see ScalableModelAdmin) treat it as one.
+    """
+
+
+class RowVersionMixin:
+    """
+    Optimistic concurrency control. Each save() of an existing row bumps
+    ``version`` and only matches the row if it still has the version this
+    instance was read at, in the same statement
+    (``UPDATE ... WHERE id = %s AND version = %s``). If another write got there
+    first, VersionConflict is raised instead of overwriting it. No row locks
+    and no extra queries on successful saves; only an UPDATE that matched no
+    row runs a second query, to tell a conflict from a deleted row. Like an
+    IntegrityError, a conflict spoils the current transaction, so callers that
+    carry on afterwards save inside transaction.atomic().
+    """
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self._read_version = self.version
+        self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'version'}
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = self._read_version
+            raise
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        updated = super()._do_update(
+            base_qs.filter(version=self._read_version), using, pk_val, values, update_fields, forced_update
+        )
+        # Conflict path only: a matched UPDATE returns before this lookup
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(f'{self._meta.object_name} {pk_val} is no longer at version {self._read_version}')
+        return updated
+
+
+def normalize_name(value):
+    """Lowercase ASCII words separated by single spaces, for prefix search."""
+    value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value.lower()).split())
+
+
+class NameKeyMixin:
+    """
+    Keeps name_key ("first last") and surname_key ("last first") in sync
+    with the name fields so autocomplete can run indexed prefix queries.
+    """
+    NAME_FIELDS = {'first_name', 'last_name'}
+    
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_name(f'{self.first_name} {self.last_name}')[:201]
+        self.surname_key = normalize_name(f'{self.last_name} {self.first_name}')[:201]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.NAME_FIELDS & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'name_key', 'surname_key'}
+        super().save(*args, **kwargs)
+
+
+def name_key_indexes(prefix):
+    # varchar_pattern_ops lets PostgreSQL use the index for LIKE 'abc%' under
+    # any collation; other backends ignore opclasses.
+    return [
+        models.Index(fields=['name_key'], name=f'{prefix}_name_key_idx', opclasses=['varchar_pattern_ops']),
+        models.Index(fields=['surname_key'], name=f'{prefix}_surname_key_idx', opclasses=['varchar_pattern_ops']),
+    ]
+
+
+class Patient(RowVersionMixin, NameKeyMixin, SoftDeleteMixin, models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
         ('F', 'Female'),
@@ -50,14 +147,30 @@ class Patient(models.Model):
     allergies = models.TextField(blank=True)
     current_medications = models.TextField(blank=True)
     
+    # Denormalized counter, maintained by healthcare.counters
+    active_doctor_count = models.PositiveIntegerField(default=0)
+    
+    # Normalized names for autocomplete, set in NameKeyMixin.save()
+    name_key = models.CharField(max_length=201, blank=True, editable=False)
+    surname_key = models.CharField(max_length=201, blank=True, editable=False)
+    
     # System Fields
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='patients')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Bumped on every save, see RowVersionMixin
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    objects = models.Manager()
+    active = ActiveManager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', 'updated_at'], name='patient_owner_updated_idx'),
+            *name_key_indexes('patient'),
+        ]
         
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -67,7 +180,7 @@ class Patient(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
-class Doctor(models.Model):
+class Doctor(RowVersionMixin, NameKeyMixin, SoftDeleteMixin, models.Model):
     SPECIALIZATION_CHOICES = [
         ('CARDIOLOGY', 'Cardiology'),
         ('NEUROLOGY', 'Neurology'),
@@ -115,14 +228,27 @@ class Doctor(models.Model):
     consultation_fee = models.DecimalField(max_digits=10, decimal_places=2)
     bio = models.TextField(blank=True)
     
+    # Denormalized counter, maintained by healthcare.counters
+    active_patient_count = models.PositiveIntegerField(default=0, db_index=True)
+    
+    # Normalized names for autocomplete, set in NameKeyMixin.save()
+    name_key = models.CharField(max_length=201, blank=True, editable=False)
+    surname_key = models.CharField(max_length=201, blank=True, editable=False)
+    
     # System Fields
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doctors_created')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     is_active = models.BooleanField(default=True)
+    # Bumped on every save, see RowVersionMixin
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    objects = models.Manager()
+    active = ActiveManager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = name_key_indexes('doctor')
         
     def __str__(self):
         return f"Dr. {self.first_name} {self.last_name} - {self.specialization}"
@@ -147,12 +273,156 @@ class PatientDoctorMapping(models.Model):
     
     # System Fields
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mappings_created')
+    # Copy of patient.created_by, so per-user queries use one index
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         unique_together = ['patient', 'doctor']
         ordering = ['-assigned_date']
+        indexes = [
+            models.Index(fields=['owner', '-assigned_date'], name='mapping_owner_assigned_idx'),
+            models.Index(fields=['owner', 'status'], name='mapping_owner_status_idx'),
+            models.Index(fields=['owner', 'updated_at'], name='mapping_owner_updated_idx'),
+        ]
         
     def __str__(self):
         return f"{self.patient.full_name} assigned to {self.doctor.full_name}"
+    
+    def save(self, *args, **kwargs):
+        if self.owner_id is None:
+            self.owner_id = self.patient.created_by_id
+        # Keep the counter updates done by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+
+class PatientBlockingKey(models.Model):
+    """
+    Normalized key used to find possible duplicate patients. Patients that
+    share a key with the same owner form a block; only patients within a
+    block are compared (see healthcare.dedup).
+    """
+    KIND_CHOICES = [
+        ('NAME_DOB', 'Phonetic last name and date of birth'),
+        ('PHONE', 'Phone number digits'),
+    ]
+    
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='blocking_keys')
+    # Copied from patient.created_by so a block is one index lookup
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=64)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'kind', 'key'], name='blocking_key_lookup_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.kind}:{self.key} for patient #{self.patient_id}"
+
+
+class Tombstone(models.Model):
+    """
+    Marker left behind when a synced row is hard-deleted, so that delta sync
+    can report deletions that no longer have a row to carry an updated_at.
+    """
+    MODEL_CHOICES = [
+        ('patient', 'Patient'),
+        ('doctor', 'Doctor'),
+        ('mapping', 'Patient-Doctor Mapping'),
+    ]
+    
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    # Null owner means the row was visible to every user (e.g. doctors). No
+    # database constraint: tombstones outlive their owner until they are purged.
+    owner = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['model', 'owner', 'deleted_at'], name='tombstone_model_owner_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted at {self.deleted_at}"
+
+
+class Job(models.Model):
+    """
+    Unit of background work in the database-backed queue. Workers started
+    with `manage.py run_jobs` claim due jobs, run the registered function and
+    store its JSON result.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    # A RUNNING job whose lease expired is assumed lost and is claimed again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    # System Fields
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response to a POST sent with an Idempotency-Key header, replayed
+    when the client retries the same request (see healthcare.idempotency).
+    A row without a status_code belongs to a request still in flight.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # URL name of the endpoint, so one key can be used on several endpoints
+    route = models.CharField(max_length=100)
+    # Digest of the request body; a retry must send the same body
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    location = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key', 'route'], name='idempotency_key_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.route} {self.key} ({self.status_code or 'in flight'})"
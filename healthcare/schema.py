@@ -0,0 +1,227 @@
+"""
+Precomputed OpenAPI schema.
+
+drf_yasg introspects every view and serializer each time one of its schema
+views is hit, including the Swagger UI served at the site root. The schema
+only changes when the code does, so it is generated once per code version (a
+hash of the project sources, or ``API_SCHEMA_VERSION`` when the deploy sets
+one), written under ``API_SCHEMA_ROOT`` together with gzip (and brotli, if
+installed) variants, and served from memory with an ETag. Run
+``python manage.py generate_schema`` at build time so no request pays for the
+generation; otherwise the first request after a deploy does.
+
+Being generated without a request, the schema has no host or scheme unless
+``API_SCHEMA_URL`` (drf_yasg's ``DEFAULT_API_URL``) is set; Swagger UI then
+sends requests to the host that served the page.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import django
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework.response import Response
+
+from . import docs
+from .compression import brotli, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# Spec renderer format -> file holding that representation
+FILES = {
+    SwaggerJSONRenderer.format: 'swagger.json',
+    OpenAPIRenderer.format: 'swagger.json',
+    SwaggerYAMLRenderer.format: 'swagger.yaml',
+}
+CODECS = {
+    'swagger.json': OpenAPICodecJson,
+    'swagger.yaml': OpenAPICodecYaml,
+}
+# Preferred first when the client accepts several
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+_documents = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """
+    Short hash identifying the code the schema is generated from: the
+    project's Python sources plus the Django, DRF and drf_yasg versions.
+    """
+    digest = hashlib.sha256()
+    if settings.API_SCHEMA_VERSION:
+        digest.update(settings.API_SCHEMA_VERSION.encode())
+        return digest.hexdigest()[:16]
+    for version in (django.get_version(), rest_framework.VERSION, drf_yasg.__version__):
+        digest.update(version.encode())
+    base = Path(settings.BASE_DIR).resolve()
+    roots = {Path(sys.modules[settings.ROOT_URLCONF].__file__).resolve().parent}
+    roots.update(
+        Path(config.path).resolve() for config in apps.get_app_configs()
+        if Path(config.path).resolve().is_relative_to(base)
+    )
+    for root in sorted(roots):
+        for path in sorted(root.rglob('*.py')):
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class SchemaDocument:
+    """One encoded representation of the schema and its compressed variants."""
+
+    def __init__(self, body, variants):
+        self.body = body
+        self.variants = variants
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+    def etag_for(self, encoding=None):
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+
+class SchemaGenerator(OpenAPISchemaGenerator):
+    """Applies the overrides views declared through healthcare.docs before the first schema."""
+
+    def get_schema(self, request=None, public=False):
+        docs.apply_schemas()
+        return super().get_schema(request, public)
+
+
+def _compress(body):
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+def _write(path, data):
+    # Write then rename so a concurrent reader never sees a partial file
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def generate(info=None):
+    """
+    Generate the schema for the current code and return
+    ``{file name: SchemaDocument}``. The files are written under
+    ``API_SCHEMA_ROOT/<code version>/``; a failed write is logged and the
+    documents are still returned.
+    """
+    generator = SchemaGenerator(info or swagger_settings.DEFAULT_INFO, url=swagger_settings.DEFAULT_API_URL)
+    schema = generator.get_schema(request=None, public=True)
+    documents = {}
+    for name, codec in CODECS.items():
+        body = codec(validators=[]).encode(schema)
+        documents[name] = SchemaDocument(body, _compress(body))
+
+    directory = Path(settings.API_SCHEMA_ROOT) / code_version()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, document in documents.items():
+            _write(directory / name, document.body)
+            for encoding, data in document.variants.items():
+                _write(directory / f'{name}.{"gz" if encoding == "gzip" else encoding}', data)
+    except OSError:
+        logger.warning('Could not store the generated schema in %s', directory, exc_info=True)
+    return documents
+
+
+def _load(name):
+    directory = Path(settings.API_SCHEMA_ROOT) / code_version()
+    try:
+        body = (directory / name).read_bytes()
+        variants = {'gzip': (directory / f'{name}.gz').read_bytes()}
+        if brotli is not None:
+            variants['br'] = (directory / f'{name}.br').read_bytes()
+    except FileNotFoundError:
+        return None
+    return SchemaDocument(body, variants)
+
+
+def get_document(name):
+    """Return the SchemaDocument for ``name``, loading or generating it once."""
+    key = (code_version(), name)
+    document = _documents.get(key)
+    if document is None:
+        with _lock:
+            document = _documents.get(key) or _load(name)
+            if document is None:
+                generated = generate()
+                _documents.update({(key[0], other): doc for other, doc in generated.items()})
+                document = generated[name]
+            _documents[key] = document
+    return document
+
+
+def purge_stale():
+    """Remove schema directories generated for other code versions."""
+    root = Path(settings.API_SCHEMA_ROOT)
+    removed = 0
+    for directory in root.iterdir() if root.exists() else ():
+        if directory.is_dir() and directory.name != code_version():
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def document_response(request, document, content_type):
+    """
+    Serve ``document`` in the best encoding the client accepts, answering a
+    matching ``If-None-Match`` with 304.
+    """
+    encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), ENCODINGS)
+    etag = document.etag_for(encoding)
+    known = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if '*' in known or etag in known:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(document.variants[encoding] if encoding else document.body,
+                                content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+    return response
+
+
+def get_cached_schema_view(info, **kwargs):
+    """
+    Same as drf_yasg's ``get_schema_view`` but spec formats are served from
+    the precomputed documents. The UI pages only need the API title and fetch
+    the spec themselves with ``?format=openapi``.
+    """
+    base = get_schema_view(info, **kwargs)
+
+    class CachedSchemaView(base):
+        def get(self, request, version='', format=None):
+            renderer = request.accepted_renderer
+            if renderer.format in FILES:
+                content_type = f'{renderer.media_type}; charset={renderer.charset}'
+                return document_response(request, get_document(FILES[renderer.format]), content_type)
+            response = Response(openapi.Swagger(info=info, _prefix='/', _version=version, paths=openapi.Paths({})))
+            patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+            return response
+
+    return CachedSchemaView
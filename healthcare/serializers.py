@@ -1,7 +1,19 @@
+from contextlib import nullcontext
+from functools import lru_cache
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import Patient, Doctor, PatientDoctorMapping
+from django.db import IntegrityError, connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.utils.field_mapping import get_unique_error_message
+from .models import Patient, Doctor, PatientDoctorMapping, Job
+from .signals import invalidate_previews_on_commit, mapping_event_data, publish_on_commit
+from .counters import recount
+from .exports import FORMATS, parquet_available
+from .dedup import find_duplicates
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -43,7 +55,121 @@ class UserLoginSerializer(serializers.Serializer):
             raise serializers.ValidationError('Must include username and password')
 
 
-class PatientSerializer(serializers.ModelSerializer):
+def constraint_savepoint():
+    """
+    Savepoint around a write whose unique violation is caught, so an outer
+    transaction survives it. Under autocommit the failed statement has
+    nothing to roll back, so no savepoint is taken.
+    """
+    return transaction.atomic() if connection.in_atomic_block else nullcontext()
+
+
+@lru_cache(maxsize=None)
+def _constraint_columns(table, name):
+    with connection.cursor() as cursor:
+        constraint = connection.introspection.get_constraints(cursor, table).get(name)
+    return frozenset(constraint['columns']) if constraint else None
+
+
+def violated_columns(exc):
+    """The columns of the unique constraint an IntegrityError reports, or None."""
+    diag = getattr(exc.__cause__, 'diag', None)
+    if diag is not None and diag.constraint_name:
+        # PostgreSQL names the constraint; look its columns up once
+        return _constraint_columns(diag.table_name, diag.constraint_name)
+    if connection.vendor == 'sqlite':
+        # SQLite only has the message: "UNIQUE constraint failed: table.a, table.b"
+        message = str(exc)
+        prefix = 'UNIQUE constraint failed: '
+        if message.startswith(prefix):
+            return frozenset(column.split('.', 1)[-1] for column in message[len(prefix):].split(', '))
+    return None
+
+
+class UniqueConstraintMixin:
+    """
+    Let the database enforce unique fields instead of checking them with a
+    SELECT before every write. Constraint violations are reported with the
+    same 400 payload DRF's unique validators would have produced; serializers
+    using this mixin drop those validators (see `extra_kwargs`/`validators`).
+    """
+    unique_together_message = None
+    
+    def unique_violation(self, exc):
+        """Return validation errors for a unique violation, or None."""
+        columns = violated_columns(exc)
+        if columns is None:
+            return None
+        model = self.Meta.model
+        for field in model._meta.fields:
+            if field.unique and not field.primary_key and columns == {field.column}:
+                return {field.name: [get_unique_error_message(field)]}
+        for field_names in model._meta.unique_together:
+            if columns == {model._meta.get_field(name).column for name in field_names}:
+                return {api_settings.NON_FIELD_ERRORS_KEY: [self.unique_together_message]}
+        return None
+    
+    def create(self, validated_data):
+        try:
+            with constraint_savepoint():
+                return super().create(validated_data)
+        except IntegrityError as exc:
+            errors = self.unique_violation(exc)
+            if errors is None:
+                raise
+            raise serializers.ValidationError(errors)
+    
+    def update(self, instance, validated_data):
+        try:
+            with constraint_savepoint():
+                return super().update(instance, validated_data)
+        except IntegrityError as exc:
+            errors = self.unique_violation(exc)
+            if errors is None:
+                raise
+            raise serializers.ValidationError(errors)
+
+
+class ChangedFieldsMixin:
+    """
+    Updates write only the columns whose values differ from the instance,
+    with ``save(update_fields=...)`` (plus ``auto_now`` timestamps), instead of
+    rewriting the whole row with its large text fields. When nothing
+    changed, ``save()`` returns the instance without touching the database.
+    """
+    
+    @staticmethod
+    def changed_fields(instance, data):
+        return [name for name, value in data.items() if getattr(instance, name) != value]
+    
+    def save(self, **kwargs):
+        if self.instance is not None and not self.changed_fields(self.instance, {**self.validated_data, **kwargs}):
+            return self.instance
+        return super().save(**kwargs)
+    
+    def update(self, instance, validated_data):
+        changed = self.changed_fields(instance, validated_data)
+        for name in changed:
+            setattr(instance, name, validated_data[name])
+        timestamps = [field.name for field in instance._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        instance.save(update_fields=[*changed, *timestamps])
+        return instance
+
+
+class OmitFieldsMixin:
+    """
+    Leave out the fields listed in the ``omit`` serializer context entry, so a
+    list view can skip columns it did not load (see DeferTextMixin in views).
+    """
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.context.get('omit', ()):
+            fields.pop(name, None)
+        return fields
+
+
+class PatientSerializer(OmitFieldsMixin, UniqueConstraintMixin, ChangedFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     
@@ -53,17 +179,30 @@ class PatientSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'full_name', 'email', 'phone_number',
             'date_of_birth', 'gender', 'blood_group', 'address', 'city', 'state',
             'zip_code', 'country', 'emergency_contact_name', 'emergency_contact_phone',
-            'medical_history', 'allergies', 'current_medications', 'created_by_username',
-            'created_at', 'updated_at', 'is_active'
+            'medical_history', 'allergies', 'current_medications', 'active_doctor_count',
+            'created_by_username', 'created_at', 'updated_at', 'is_active', 'version'
         ]
-        read_only_fields = ('id', 'created_at', 'updated_at', 'full_name', 'created_by_username')
+        read_only_fields = (
+            'id', 'created_at', 'updated_at', 'full_name', 'created_by_username', 'active_doctor_count'
+        )
+        # Uniqueness is enforced by the database, see UniqueConstraintMixin
+        extra_kwargs = {'email': {'validators': []}}
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data)
+        patient = super().create(validated_data)
+        # Reported with the new record, never blocks the insert
+        patient.possible_duplicates = find_duplicates(patient)
+        return patient
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, 'possible_duplicates'):
+            data['possible_duplicates'] = instance.possible_duplicates
+        return data
 
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(OmitFieldsMixin, UniqueConstraintMixin, ChangedFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     
@@ -73,17 +212,21 @@ class DoctorSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'full_name', 'email', 'phone_number',
             'specialization', 'license_number', 'years_of_experience', 'qualification',
             'hospital_affiliation', 'office_address', 'city', 'state', 'zip_code',
-            'country', 'consultation_fee', 'bio', 'created_by_username',
-            'created_at', 'updated_at', 'is_active'
+            'country', 'consultation_fee', 'bio', 'active_patient_count', 'created_by_username',
+            'created_at', 'updated_at', 'is_active', 'version'
         ]
-        read_only_fields = ('id', 'created_at', 'updated_at', 'full_name', 'created_by_username')
+        read_only_fields = (
+            'id', 'created_at', 'updated_at', 'full_name', 'created_by_username', 'active_patient_count'
+        )
+        # Uniqueness is enforced by the database, see UniqueConstraintMixin
+        extra_kwargs = {'email': {'validators': []}, 'license_number': {'validators': []}}
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class PatientDoctorMappingSerializer(serializers.ModelSerializer):
+class PatientDoctorMappingSerializer(UniqueConstraintMixin, serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.full_name', read_only=True)
     doctor_name = serializers.CharField(source='doctor.full_name', read_only=True)
     patient_email = serializers.CharField(source='patient.email', read_only=True)
@@ -100,33 +243,277 @@ class PatientDoctorMappingSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ('id', 'assigned_date', 'created_at', 'updated_at', 'created_by_username')
+        # The unique (patient, doctor) constraint is enforced by the database
+        validators = []
+        extra_kwargs = {
+            'patient': {'queryset': Patient.active.all()},
+            'doctor': {'queryset': Doctor.active.all()},
+        }
+    
+    unique_together_message = "This patient is already assigned to this doctor"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upserted = False
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None and 'patient' in fields:
+            # Only the user's own patients can be assigned
+            fields['patient'].queryset = Patient.active.filter(created_by=request.user)
+        return fields
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except serializers.ValidationError:
+            if not self.context.get('upsert'):
+                raise
+        # Upsert: the pair already exists, so update it in place instead
+        mapping = PatientDoctorMapping.objects.select_related('patient', 'doctor', 'created_by').get(
+            patient=validated_data['patient'], doctor=validated_data['doctor']
+        )
+        mapping.status = validated_data.get('status', mapping.status)
+        mapping.notes = validated_data.get('notes', mapping.notes)
+        mapping.save(update_fields=['status', 'notes', 'updated_at'])
+        self.upserted = True
+        return mapping
+
+
+class MappingListUrlField(serializers.Field):
+    """Absolute URL of the paginated mapping list behind a preview."""
     
-    def validate(self, attrs):
-        patient = attrs.get('patient')
-        doctor = attrs.get('doctor')
-        
-        # Check if mapping already exists
-        if PatientDoctorMapping.objects.filter(patient=patient, doctor=doctor).exists():
-            raise serializers.ValidationError("This patient is already assigned to this doctor")
-        
-        return attrs
+    def __init__(self, url_name, url_kwarg, **kwargs):
+        self.url_name = url_name
+        self.url_kwarg = url_kwarg
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+    
+    def to_representation(self, instance):
+        url = reverse(self.url_name, kwargs={self.url_kwarg: instance.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
 
 
 class PatientDetailSerializer(PatientSerializer):
-    """Detailed patient serializer with doctor mappings"""
-    doctor_mappings = PatientDoctorMappingSerializer(many=True, read_only=True)
+    """
+    Detailed patient serializer with a preview of the doctor mappings. The
+    view supplies ``mapping_preview`` and ``mapping_count``; the full list is
+    paginated at ``doctor_mappings_url``.
+    """
+    doctor_mappings = PatientDoctorMappingSerializer(source='mapping_preview', many=True, read_only=True)
+    doctor_mappings_count = serializers.IntegerField(source='mapping_count', read_only=True)
+    doctor_mappings_url = MappingListUrlField('healthcare:patient-doctors', 'patient_id')
     
     class Meta(PatientSerializer.Meta):
-        fields = PatientSerializer.Meta.fields + ['doctor_mappings']
+        fields = PatientSerializer.Meta.fields + [
+            'doctor_mappings', 'doctor_mappings_count', 'doctor_mappings_url'
+        ]
 
 
 class DoctorDetailSerializer(DoctorSerializer):
-    """Detailed doctor serializer with patient mappings"""
-    patient_mappings = PatientDoctorMappingSerializer(many=True, read_only=True)
+    """
+    Detailed doctor serializer with a preview of the user's patient mappings.
+    The view supplies ``mapping_preview`` and ``mapping_count``; the full list
+    is paginated at ``patient_mappings_url``.
+    """
+    patient_mappings = PatientDoctorMappingSerializer(source='mapping_preview', many=True, read_only=True)
+    patient_mappings_count = serializers.IntegerField(source='mapping_count', read_only=True)
+    patient_mappings_url = MappingListUrlField('healthcare:doctor-mappings', 'doctor_id')
     
     class Meta(DoctorSerializer.Meta):
-        fields = DoctorSerializer.Meta.fields + ['patient_mappings']
+        fields = DoctorSerializer.Meta.fields + [
+            'patient_mappings', 'patient_mappings_count', 'patient_mappings_url'
+        ]
+
+
+class BulkAssignmentSerializer(serializers.Serializer):
+    """
+    Assign several doctors to one patient (`patient` + `doctors`) or one
+    doctor to several patients (`doctor` + `patients`).
+    """
+    patient = serializers.IntegerField(required=False)
+    doctors = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=500)
+    doctor = serializers.IntegerField(required=False)
+    patients = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=500)
+    status = serializers.ChoiceField(choices=PatientDoctorMapping.STATUS_CHOICES, default='ACTIVE')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate(self, attrs):
+        one_patient = attrs.get('patient') is not None and attrs.get('doctors')
+        one_doctor = attrs.get('doctor') is not None and attrs.get('patients')
+        if bool(one_patient) == bool(one_doctor):
+            raise serializers.ValidationError(
+                "Provide either 'patient' with 'doctors' or 'doctor' with 'patients'"
+            )
+        
+        user = self.context['request'].user
+        patient_ids = [attrs['patient']] if one_patient else list(dict.fromkeys(attrs['patients']))
+        doctor_ids = list(dict.fromkeys(attrs['doctors'])) if one_patient else [attrs['doctor']]
+        
+        known_patients = set(
+            Patient.objects.filter(id__in=patient_ids, created_by=user, is_active=True)
+            .values_list('id', flat=True)
+        )
+        known_doctors = set(
+            Doctor.objects.filter(id__in=doctor_ids, is_active=True).values_list('id', flat=True)
+        )
+        errors = {}
+        missing_patients = [pk for pk in patient_ids if pk not in known_patients]
+        missing_doctors = [pk for pk in doctor_ids if pk not in known_doctors]
+        if missing_patients:
+            errors['patients'] = [f"Unknown patient ids: {missing_patients}"]
+        if missing_doctors:
+            errors['doctors'] = [f"Unknown doctor ids: {missing_doctors}"]
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        attrs['pairs'] = [(p, d) for p in patient_ids for d in doctor_ids]
+        return attrs
+    
+    def create(self, validated_data):
+        """
+        Insert every pair in one statement and let the unique (patient, doctor)
+        constraint skip those that already exist, with no pre-check. Returns
+        the created and already existing mappings: a row is ours when its
+        created_at is the exact timestamp this insert assigned to the pair,
+        so a pair inserted by a concurrent request is reported as existing.
+        """
+        user = self.context['request'].user
+        pairs = validated_data['pairs']
+        patient_ids = {p for p, _ in pairs}
+        doctor_ids = {d for _, d in pairs}
+        with transaction.atomic():
+            candidates = [
+                PatientDoctorMapping(
+                    patient_id=patient_id, doctor_id=doctor_id, created_by=user, owner=user,
+                    status=validated_data['status'], notes=validated_data['notes'],
+                )
+                for patient_id, doctor_id in pairs
+            ]
+            PatientDoctorMapping.objects.bulk_create(candidates, ignore_conflicts=True, batch_size=500)
+            # bulk_create stamped created_at on each instance; ignore_conflicts
+            # leaves primary keys unset, so read the pairs back and compare
+            stamped = {(m.patient_id, m.doctor_id): m.created_at for m in candidates}
+            mappings = list(
+                PatientDoctorMapping.objects
+                .filter(patient_id__in=patient_ids, doctor_id__in=doctor_ids)
+                .select_related('patient', 'doctor', 'created_by')
+            )
+            # bulk_create bypasses post_save, so counters are rebuilt for the
+            # touched rows instead of being adjusted one mapping at a time
+            recount(patient_ids=list(patient_ids), doctor_ids=list(doctor_ids))
+            created, existing = [], []
+            for mapping in mappings:
+                ours = stamped.get((mapping.patient_id, mapping.doctor_id)) == mapping.created_at
+                (created if ours else existing).append(mapping)
+            for mapping in created:
+                # bulk_create bypasses post_save, so publish explicitly
+                publish_on_commit(user.pk, 'mapping.created', mapping_event_data(mapping))
+            if created:
+                invalidate_previews_on_commit(user.pk)
+        return {'created': created, 'existing': existing}
+
+
+def _set_status_returning(ids, owner, new_status, now):
+    """
+    UPDATE ... SET status WHERE id IN (...) AND owner AND status <> new_status,
+    returning the ids the statement changed. Needs UPDATE ... RETURNING
+    (PostgreSQL, SQLite 3.35+).
+    """
+    meta = PatientDoctorMapping._meta
+    qn = connection.ops.quote_name
+    column = lambda name: qn(meta.get_field(name).column)
+    sql = (
+        f'UPDATE {qn(meta.db_table)} SET {column("status")} = %s, {column("updated_at")} = %s '
+        f'WHERE {column("id")} IN ({", ".join(["%s"] * len(ids))}) AND {column("owner")} = %s '
+        f'AND {column("status")} <> %s RETURNING {column("id")}'
+    )
+    params = [new_status, meta.get_field('updated_at').get_db_prep_value(now, connection), *ids, owner.pk, new_status]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    """
+    Move many of the user's mappings to a new status.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=1000)
+    status = serializers.ChoiceField(choices=PatientDoctorMapping.STATUS_CHOICES)
+    
+    def create(self, validated_data):
+        """
+        Read the requested rows once (for missing ids and previous statuses),
+        then apply the status with a single conditional UPDATE ... WHERE id IN
+        (...) AND status <> %s, without row locks, and return the ids that
+        changed and the ids that were not found. The changed ids come from the
+        UPDATE's RETURNING clause, so rows a concurrent request moved first are
+        not reported; on backends without UPDATE ... RETURNING the rows that
+        differed at read time are reported.
+        """
+        user = self.context['request'].user
+        ids = list(dict.fromkeys(validated_data['ids']))
+        new_status = validated_data['status']
+        mappings = PatientDoctorMapping.objects.filter(id__in=ids, owner=user)
+        with transaction.atomic():
+            rows = list(mappings.values_list('id', 'patient_id', 'doctor_id', 'status'))
+            changed = [row for row in rows if row[3] != new_status]
+            if changed:
+                candidate_ids = [row[0] for row in changed]
+                if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+                    updated_ids = _set_status_returning(candidate_ids, user, new_status, timezone.now())
+                    changed = [row for row in changed if row[0] in updated_ids]
+                else:
+                    mappings.filter(id__in=candidate_ids).exclude(status=new_status).update(
+                        status=new_status, updated_at=timezone.now()
+                    )
+            if changed:
+                recount(
+                    patient_ids=list({row[1] for row in changed}),
+                    doctor_ids=list({row[2] for row in changed}),
+                )
+                invalidate_previews_on_commit(user.pk)
+            for mapping_id, patient_id, doctor_id, previous in changed:
+                # QuerySet.update() bypasses post_save, so publish explicitly
+                publish_on_commit(user.pk, 'mapping.status_changed', {
+                    'id': mapping_id, 'patient': patient_id, 'doctor': doctor_id,
+                    'status': new_status, 'previous_status': previous,
+                })
+        found = {row[0] for row in rows}
+        return {
+            'updated': [row[0] for row in changed],
+            'not_found': [pk for pk in ids if pk not in found],
+        }
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """
+    Ids for a batch lookup. Duplicates are dropped, keeping the first
+    occurrence, so the response follows the request order.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=200)
+    
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'result', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class ExportRequestSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(choices=FORMATS, default='parquet')
+    
+    def validate_format(self, value):
+        if value == 'parquet' and not parquet_available():
+            raise serializers.ValidationError('Parquet export is not available on this server, use csv')
+        return value
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import counters, dedup, directory, events, stats
+from .models import Patient, Doctor, PatientDoctorMapping, Tombstone
+
+
+def mapping_event_data(mapping, **extra):
+    return {
+        'id': mapping.pk,
+        'patient': mapping.patient_id,
+        'doctor': mapping.doctor_id,
+        'status': mapping.status,
+        **extra,
+    }
+
+
+def publish_on_commit(user_id, event_type, data):
+    transaction.on_commit(lambda: events.publish(user_id, event_type, data))
+
+
+def invalidate_previews_on_commit(user_id):
+    """Drop the user's cached doctor details, for writes that bypass post_save."""
+    transaction.on_commit(lambda: directory.invalidate(user_id))
+
+
+@receiver(post_delete, sender=Patient)
+def record_patient_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model='patient', object_id=instance.pk, owner_id=instance.created_by_id)
+
+
+@receiver(post_delete, sender=Doctor)
+def record_doctor_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model='doctor', object_id=instance.pk, owner=None)
+
+
+@receiver(post_save, sender=Patient)
+def index_patient_keys(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or dedup.KEY_FIELDS & set(update_fields):
+        dedup.index_patient(instance, created=created)
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Patient)
+@receiver(post_delete, sender=Doctor)
+def invalidate_stats(sender, instance, **kwargs):
+    user_id = instance.created_by_id
+    transaction.on_commit(lambda: stats.invalidate(user_id))
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidate_doctor_directory(sender, instance, **kwargs):
+    transaction.on_commit(directory.invalidate)
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=PatientDoctorMapping)
+@receiver(post_delete, sender=PatientDoctorMapping)
+def invalidate_doctor_previews(sender, instance, **kwargs):
+    # Patient names and mappings show up in the user's doctor detail previews
+    invalidate_previews_on_commit(instance.created_by_id if sender is Patient else instance.owner_id)
+
+
+@receiver(post_init, sender=PatientDoctorMapping)
+def remember_mapping_status(sender, instance, **kwargs):
+    # Lets post_save tell a status change apart from any other update.
+    # Read from __dict__ so a deferred status is not fetched.
+    instance._loaded_status = instance.__dict__.get('status') if instance.pk else None
+
+
+@receiver(post_save, sender=PatientDoctorMapping)
+def mapping_saved(sender, instance, created, **kwargs):
+    previous = instance._loaded_status
+    instance._loaded_status = instance.status
+    if created:
+        counters.adjust(instance.patient_id, instance.doctor_id, int(instance.status == 'ACTIVE'))
+        publish_on_commit(instance.owner_id, 'mapping.created', mapping_event_data(instance))
+    elif previous is not None and previous != instance.status:
+        counters.adjust(
+            instance.patient_id, instance.doctor_id,
+            int(instance.status == 'ACTIVE') - int(previous == 'ACTIVE'),
+        )
+        publish_on_commit(
+            instance.owner_id, 'mapping.status_changed',
+            mapping_event_data(instance, previous_status=previous),
+        )
+
+
+@receiver(post_delete, sender=PatientDoctorMapping)
+def mapping_deleted(sender, instance, **kwargs):
+    if instance._loaded_status == 'ACTIVE':
+        counters.adjust(instance.patient_id, instance.doctor_id, -1)
+    Tombstone.objects.create(model='mapping', object_id=instance.pk, owner_id=instance.owner_id)
+    publish_on_commit(instance.owner_id, 'mapping.deleted', mapping_event_data(instance))
@@ -0,0 +1,132 @@
+"""
+Single-flight cache fills with stale-while-revalidate.
+
+When a hot cache entry is missing, only one caller computes it: other
+threads of the same process wait for that computation and share its result,
+and other processes wait on a lock key in the shared cache until the value
+appears. When an entry has merely expired, it is kept for another
+SINGLEFLIGHT_STALE_SECONDS; one caller refreshes it while everyone else is
+served the stale value, so an expiry never sends a burst of identical
+queries to the database.
+
+Invalidation is done with version counters (``bump``) that callers put in
+their keys, so a write makes old entries unreachable instead of stale.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _do(key, compute):
+    """Run ``compute()`` once per ``key`` in this process; concurrent callers share the outcome."""
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+    try:
+        call.value = compute()
+        return call.value
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _store(key, value, timeout):
+    # The entry outlives its freshness so it can be served while refreshed
+    cache.set(key, (value, time.time() + timeout), timeout + settings.SINGLEFLIGHT_STALE_SECONDS)
+
+
+def _refresh(key, compute, timeout):
+    try:
+        value = compute()
+        _store(key, value, timeout)
+        return value
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def _fill(key, compute, timeout):
+    deadline = time.monotonic() + settings.SINGLEFLIGHT_WAIT_SECONDS
+    delay = 0.02
+    while not cache.add(_lock_key(key), 1, settings.SINGLEFLIGHT_LOCK_SECONDS):
+        # Another process is computing it: wait for its value
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if time.monotonic() >= deadline:
+            # The holder is slow or gone; compute without the lock
+            value = compute()
+            _store(key, value, timeout)
+            return value
+    entry = cache.get(key)
+    if entry is not None:
+        # Filled between our miss and taking the lock
+        cache.delete(_lock_key(key))
+        return entry[0]
+    return _refresh(key, compute, timeout)
+
+
+def get_or_set(key, compute, timeout):
+    """
+    Return the cached value of ``key``, computing it with ``compute()`` at most
+    once across concurrent callers. ``timeout`` is how long the value is fresh.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return _do(key, lambda: _fill(key, compute, timeout))
+    value, fresh_until = entry
+    if time.time() < fresh_until:
+        return value
+    # Stale: whoever takes the lock refreshes it, everyone else gets the old value
+    if key not in _calls and cache.add(_lock_key(key), 1, settings.SINGLEFLIGHT_LOCK_SECONDS):
+        return _do(key, lambda: _refresh(key, compute, timeout))
+    return value
+
+
+def _version_key(name):
+    return f'{name}:version'
+
+
+def version(name):
+    """Current version of the ``name`` namespace, to be included in its keys."""
+    return cache.get(_version_key(name), 0)
+
+
+def bump(name):
+    """Make every key built with the current version of ``name`` unreachable."""
+    key = _version_key(name)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.add(key, 1, None)
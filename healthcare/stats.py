@@ -0,0 +1,109 @@
+"""
+Dashboard aggregates computed with grouped queries in the database.
+
+Each section is one ``GROUP BY`` per dimension over the user's active rows, so
+a dashboard no longer pages through every patient and doctor. Results are
+cached per user under a version number that is bumped whenever one of the
+user's patients or doctors is written (see healthcare.signals); old versions
+are never read again and simply expire. Misses and expiries are filled by a
+single request (see healthcare.singleflight).
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Avg, Case, CharField, Count, Value, When
+from django.db.models.functions import Round
+
+from . import singleflight
+from .models import Patient, Doctor
+
+# (label, minimum age in whole years); the last band is open ended
+AGE_BANDS = [
+    ('0-17', 0),
+    ('18-34', 18),
+    ('35-49', 35),
+    ('50-64', 50),
+    ('65+', 65),
+]
+
+
+def _years_before(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29 February in a non-leap year
+        return today.replace(year=today.year - years, day=28)
+
+
+def age_band_expression(today=None):
+    """
+    CASE expression labelling each patient with its age band. The band
+    limits are turned into birth-date cutoffs so the database only compares
+    dates.
+    """
+    today = today or date.today()
+    whens = [
+        When(date_of_birth__lte=_years_before(today, minimum), then=Value(label))
+        for label, minimum in reversed(AGE_BANDS) if minimum
+    ]
+    return Case(*whens, default=Value(AGE_BANDS[0][0]), output_field=CharField())
+
+
+def _grouped(queryset, *fields, **aggregates):
+    aggregates = aggregates or {'count': Count('pk')}
+    return list(queryset.values(*fields).annotate(**aggregates).order_by(*fields))
+
+
+def patient_stats(user):
+    patients = Patient.active.filter(created_by=user)
+    by_age = {row['age_band']: row['count'] for row in _grouped(
+        patients.annotate(age_band=age_band_expression()), 'age_band'
+    )}
+    by_gender = _grouped(patients, 'gender')
+    return {
+        'total': sum(row['count'] for row in by_gender),
+        'by_gender': by_gender,
+        'by_blood_group': _grouped(patients, 'blood_group'),
+        'by_age_band': [
+            {'age_band': label, 'count': by_age.get(label, 0)} for label, _ in AGE_BANDS
+        ],
+        'by_location': list(
+            patients.values('state', 'city').annotate(count=Count('pk')).order_by('-count', 'state', 'city')
+        ),
+    }
+
+
+def doctor_stats(user):
+    by_specialization = _grouped(
+        Doctor.active.filter(created_by=user), 'specialization',
+        count=Count('pk'),
+        average_consultation_fee=Round(Avg('consultation_fee'), 2),
+    )
+    return {
+        'total': sum(row['count'] for row in by_specialization),
+        'by_specialization': by_specialization,
+    }
+
+
+SECTIONS = {
+    'patients': patient_stats,
+    'doctors': doctor_stats,
+}
+
+
+def invalidate(user_id):
+    """Make every cached section of ``user_id`` stale."""
+    singleflight.bump(f'stats:{user_id}')
+
+
+def get_stats(user, section, compute=None):
+    """
+    Return the cached aggregates for ``section``, computing them on a miss
+    with ``compute(user)`` (default: the function registered in SECTIONS).
+    """
+    version = singleflight.version(f'stats:{user.pk}')
+    return singleflight.get_or_set(
+        f'stats:{user.pk}:{section}:v{version}',
+        lambda: (compute or SECTIONS[section])(user),
+        settings.STATS_CACHE_SECONDS,
+    )
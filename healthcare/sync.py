@@ -0,0 +1,167 @@
+"""
+Delta sync: changes to patients, doctors and mappings since a watermark.
+
+A watermark is a signed timestamp. Each sync returns the rows whose
+``updated_at`` falls in ``(since, upper]`` plus tombstones for hard deletes in
+the same range. ``upper`` trails the database clock by ``SYNC_SETTLE_SECONDS``
+so that a transaction which stamped ``updated_at`` but had not committed yet
+when we read is still picked up by the next sync instead of being skipped.
+
+``updated_at`` is stamped by the application server that wrote the row, so the
+window only holds if it exceeds the longest write transaction plus the clock
+skew between application servers and the database.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Patient, Doctor, PatientDoctorMapping, Tombstone
+from .serializers import PatientSerializer, DoctorSerializer, PatientDoctorMappingSerializer
+
+WATERMARK_SALT = 'healthcare.sync.watermark'
+ONE_TICK = timedelta(microseconds=1)
+
+
+class InvalidWatermark(Exception):
+    pass
+
+
+class ExpiredWatermark(Exception):
+    pass
+
+
+def encode_watermark(moment):
+    return signing.dumps({'ts': moment.isoformat()}, salt=WATERMARK_SALT, compress=True)
+
+
+def decode_watermark(token):
+    try:
+        payload = signing.loads(token, salt=WATERMARK_SALT)
+        moment = parse_datetime(payload['ts'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidWatermark('Invalid sync token')
+    if moment is None:
+        raise InvalidWatermark('Invalid sync token')
+    horizon = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if moment < horizon:
+        raise ExpiredWatermark('Sync token is older than the tombstone retention window')
+    return moment
+
+
+def database_now():
+    """
+    Current time on the database server, a clock shared by every worker that
+    computes sync windows.
+    """
+    if connection.vendor == 'sqlite':
+        # Embedded database: its clock is this host's
+        return timezone.now()
+    if connection.vendor == 'postgresql':
+        # now() would be the start of an enclosing transaction
+        sql = 'SELECT statement_timestamp()'
+    elif connection.vendor == 'mysql':
+        sql = 'SELECT UTC_TIMESTAMP(6)'
+    else:
+        sql = 'SELECT CURRENT_TIMESTAMP'
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        moment = cursor.fetchone()[0]
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment, dt_timezone.utc)
+
+
+def _window(queryset, field, since, upper, limit):
+    """
+    Return up to ``limit`` rows with ``since < field <= upper`` ordered by
+    ``field``, and the boundary timestamp of the first row left out (None if
+    the window was exhausted).
+    """
+    queryset = queryset.filter(**{f'{field}__lte': upper})
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gt': since})
+    rows = list(queryset.order_by(field, 'pk')[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    boundary = getattr(rows[limit], field)
+    if since is not None and boundary - ONE_TICK <= since:
+        # More than ``limit`` rows share the first timestamp; return all of
+        # them so the watermark can still move forward.
+        rows = list(queryset.filter(**{field: boundary}).order_by('pk'))
+        return rows, boundary + ONE_TICK
+    return [row for row in rows if getattr(row, field) < boundary], boundary
+
+
+def _sources(user):
+    return [
+        (
+            'patients', 'patient', PatientSerializer,
+            Patient.objects.filter(created_by=user).select_related('created_by'),
+            Tombstone.objects.filter(model='patient', owner=user),
+        ),
+        (
+            'doctors', 'doctor', DoctorSerializer,
+            Doctor.objects.select_related('created_by'),
+            Tombstone.objects.filter(model='doctor', owner__isnull=True),
+        ),
+        (
+            'mappings', 'mapping', PatientDoctorMappingSerializer,
+            PatientDoctorMapping.objects.filter(owner=user)
+            .select_related('patient', 'doctor', 'created_by'),
+            Tombstone.objects.filter(model='mapping', owner=user),
+        ),
+    ]
+
+
+def collect_changes(user, since=None, limit=None):
+    """
+    Build the sync payload for ``user``. ``since`` is a decoded watermark or
+    None for an initial sync.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    upper = database_now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    if since is not None and since >= upper:
+        upper = since
+
+    payload = {}
+    boundaries = []
+    for key, model_name, serializer_class, queryset, tombstones in _sources(user):
+        rows, boundary = _window(queryset, 'updated_at', since, upper, limit)
+        if boundary is not None:
+            boundaries.append(boundary)
+        created, updated, deleted = [], [], []
+        live = [row for row in rows if getattr(row, 'is_active', True)]
+        # Rows hidden from the list endpoints are reported as deletions
+        deleted.extend(row.pk for row in rows if not getattr(row, 'is_active', True))
+        for row, data in zip(live, serializer_class(live, many=True).data):
+            if since is None or row.created_at > since:
+                created.append(data)
+            else:
+                updated.append(data)
+
+        if since is not None:
+            gone, boundary = _window(tombstones, 'deleted_at', since, upper, limit)
+            if boundary is not None:
+                boundaries.append(boundary)
+            deleted.extend(tombstone.object_id for tombstone in gone)
+
+        payload[key] = {'created': created, 'updated': updated, 'deleted': deleted}
+
+    # When a window was cut short, resume just before the earliest cut so no
+    # row is skipped; rows already sent at the boundary may be sent again.
+    watermark = min(boundaries) - ONE_TICK if boundaries else upper
+    payload['has_more'] = bool(boundaries)
+    payload['next'] = encode_watermark(watermark)
+    return payload
+
+
+def purge_tombstones():
+    """
+    Delete tombstones older than the retention window. Clients holding older
+    watermarks get 410 and must do a full resync.
+    """
+    horizon = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=horizon).delete()
+    return deleted
@@ -0,0 +1,75 @@
+"""
+Background jobs. Each function here is registered with the job queue in
+healthcare.jobs and runs on a `manage.py run_jobs` worker.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import recount
+from .events import publish
+from .exports import purge_exports, write_snapshot
+from .idempotency import purge_idempotency_keys
+from .jobs import job, purge_finished
+from .models import PatientDoctorMapping
+from .signals import invalidate_previews_on_commit
+from .sync import purge_tombstones
+
+
+@job('archive_mappings')
+def archive_mappings(field, object_id, batch_size=None):
+    """
+    Mark the ACTIVE mappings of a soft-deleted patient or doctor INACTIVE.
+    Works through them in batches so no single transaction holds locks on
+    thousands of rows. Returns the number of mappings archived.
+    """
+    batch_size = batch_size or settings.SOFT_DELETE_BATCH_SIZE
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                PatientDoctorMapping.objects
+                .select_for_update(of=('self',))
+                .filter(**{field: object_id}, status='ACTIVE')
+                .values_list('id', 'patient_id', 'doctor_id', 'owner_id')[:batch_size]
+            )
+            if not batch:
+                return archived
+            PatientDoctorMapping.objects.filter(id__in=[row[0] for row in batch]).update(
+                status='INACTIVE', updated_at=timezone.now()
+            )
+            recount(patient_ids=list({row[1] for row in batch}), doctor_ids=list({row[2] for row in batch}))
+            for owner_id in {row[3] for row in batch}:
+                invalidate_previews_on_commit(owner_id)
+        # QuerySet.update() bypasses post_save, so publish explicitly
+        for mapping_id, patient_id, doctor_id, owner_id in batch:
+            publish(owner_id, 'mapping.status_changed', {
+                'id': mapping_id, 'patient': patient_id, 'doctor': doctor_id,
+                'status': 'INACTIVE', 'previous_status': 'ACTIVE',
+            })
+        archived += len(batch)
+
+
+@job('purge_expired')
+def purge_expired():
+    """Delete expired sync tombstones, old finished jobs and their exports, and expired idempotency keys."""
+    return {
+        'tombstones': purge_tombstones(),
+        'jobs': purge_finished(),
+        'exports': purge_exports(settings.JOB_RESULT_TTL_DAYS * 86400),
+        'idempotency_keys': purge_idempotency_keys(),
+    }
+
+
+@job('export_snapshot', max_attempts=1)
+def export_snapshot(user_id, fmt, token):
+    """
+    Write a snapshot of the user's records under EXPORT_ROOT. ``token`` names
+    the output directory; files are served by the export download endpoint.
+    """
+    directory = Path(settings.EXPORT_ROOT) / f'user-{user_id}' / token
+    tables = write_snapshot(directory, fmt, user=User.objects.get(pk=user_id))
+    return {'format': fmt, 'path': f'user-{user_id}/{token}', 'tables': tables}
@@ -1,11 +1,41 @@
+import gzip
 import json
-from django.test import TestCase
+from datetime import date, timedelta
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.contrib import admin
+from django.forms.models import model_to_dict
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from healthcare.models import Patient, Doctor, PatientDoctorMapping
+from django.utils import timezone
+from healthcare import schema, serializers as healthcare_serializers, singleflight
+from healthcare.compression import compress, negotiate_encoding
+from healthcare.jobs import claim, enqueue, enqueue_periodic, job, run_pending
+from healthcare.idempotency import purge_idempotency_keys
+from healthcare.models import Patient, Doctor, PatientDoctorMapping, Job, IdempotencyKey, VersionConflict
+from healthcare.admin import EstimatedCountPaginator
+from healthcare.cohorts import (
+    ages, doctor_cohort_aggregates, doctor_cohorts, load_columns, numpy_available,
+    patient_cohort_aggregates, patient_cohorts,
+)
+from healthcare.dedup import find_duplicates, soundex
+from healthcare.exports import export_table, parquet_available
+from healthcare.middleware import CompressionMiddleware
+from healthcare.events import CacheBroker, get_broker, open_streams, reset_broker
+from healthcare.throttling import TokenBucketThrottle, UserTokenBucketThrottle
 
 
 class AuthenticationTestCase(APITestCase):
@@ -86,6 +116,59 @@ class PatientTestCase(APITestCase):
             'emergency_contact_phone': '+1234567891'
         }
     
+    def test_list_defers_text_fields(self):
+        """Test that long text fields are neither loaded nor returned by the list unless expanded"""
+        patient = Patient.objects.create(created_by=self.user, medical_history='Asthma', **self.patient_data)
+        url = reverse('healthcare:patient-list-create')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        row = response.data['results'][0]
+        for name in ('address', 'medical_history', 'allergies', 'current_medications'):
+            self.assertNotIn(name, row)
+            self.assertNotIn(f'"{name}"', queries[-1]['sql'])
+        self.assertEqual(row['first_name'], 'John')
+        
+        row = self.client.get(url, {'expand': 'medical_history'}).data['results'][0]
+        self.assertEqual(row['medical_history'], 'Asthma')
+        self.assertNotIn('allergies', row)
+        row = self.client.get(url, {'expand': 'all'}).data['results'][0]
+        self.assertEqual(row['address'], '123 Main St')
+        response = self.client.get(url, {'expand': 'ssn'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.get(reverse('healthcare:patient-detail', kwargs={'pk': patient.pk}))
+        self.assertEqual(response.data['medical_history'], 'Asthma')
+    
+    def test_batch_get_patients_by_ids(self):
+        """Test fetching several patients by id in request order with not-found markers"""
+        first = Patient.objects.create(created_by=self.user, **self.patient_data)
+        second = Patient.objects.create(
+            created_by=self.user, **dict(self.patient_data, email='second@example.com', phone_number='+1987654321')
+        )
+        other_user = User.objects.create_user(username='otheruser', password='testpassword123')
+        foreign = Patient.objects.create(
+            created_by=other_user, **dict(self.patient_data, email='foreign@example.com', phone_number='+1555000111')
+        )
+        url = reverse('healthcare:patient-list-create')
+        ids = f'{second.id},999999,{first.id},{foreign.id},{second.id}'
+        # One query for the JWT user, one for the patients
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'ids': ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([row['id'] for row in results], [second.id, 999999, first.id, foreign.id])
+        self.assertEqual(results[0]['email'], 'second@example.com')
+        self.assertEqual(results[1], {'id': 999999, 'not_found': True})
+        self.assertEqual(response.data['not_found'], [999999, foreign.id])
+        
+        response = self.client.get(url, {'ids': '1,abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('healthcare:patient-batch'), {'ids': list(range(1, 202))}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # A bare JSON array is rejected, not a server error
+        response = self.client.post(reverse('healthcare:patient-batch'), [first.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
     def test_create_patient(self):
         """Test creating a new patient"""
         url = reverse('healthcare:patient-list-create')
@@ -120,13 +203,63 @@ class PatientTestCase(APITestCase):
         patient.refresh_from_db()
         self.assertEqual(patient.first_name, 'Updated John')
     
+    def test_update_patient_if_match(self):
+        """Test that updates with a stale If-Match get 412 and leave the record alone"""
+        patient = Patient.objects.create(created_by=self.user, **self.patient_data)
+        url = reverse('healthcare:patient-detail', kwargs={'pk': patient.id})
+        response = self.client.get(url)
+        self.assertEqual(response['ETag'], '"1"')
+        
+        response = self.client.patch(url, {'first_name': 'Johnny'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(response['ETag'], '"2"')
+        
+        response = self.client.patch(url, {'first_name': 'Jack'}, format='json', HTTP_IF_MATCH='W/"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        patient.refresh_from_db()
+        self.assertEqual((patient.first_name, patient.version), ('Johnny', 2))
+        
+        # A write landing between the read and the UPDATE is caught by the UPDATE itself
+        Patient.objects.filter(pk=patient.pk).update(version=3)
+        with mock.patch('healthcare.views.PatientDetailView.get_object', return_value=patient):
+            response = self.client.patch(url, {'first_name': 'Jack'}, format='json', HTTP_IF_MATCH='"2"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        
+        # So is a soft delete that loses the race (atomic: the conflict spoils the test's transaction)
+        with mock.patch('healthcare.views.PatientDetailView.get_object', return_value=patient), transaction.atomic():
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Patient.objects.get(pk=patient.pk).is_active)
+    
+    def test_update_writes_changed_columns_only(self):
+        """Test that updates write only changed columns and unchanged data skips the write"""
+        patient = Patient.objects.create(created_by=self.user, medical_history='Asthma ' * 500, **self.patient_data)
+        url = reverse('healthcare:patient-detail', kwargs={'pk': patient.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'city': 'Boston'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "healthcare_patient"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"city"', updates[0])
+        self.assertNotIn('"medical_history"', updates[0])
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, dict(self.patient_data, city='Boston'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.assertEqual(response.data['version'], 2)
+    
     def test_delete_patient(self):
-        """Test deleting a patient"""
+        """Test deleting a patient deactivates it and hides it"""
         patient = Patient.objects.create(created_by=self.user, **self.patient_data)
         url = reverse('healthcare:patient-detail', kwargs={'pk': patient.id})
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(Patient.objects.filter(id=patient.id).exists())
+        self.assertFalse(Patient.active.filter(id=patient.id).exists())
+        patient.refresh_from_db()
+        self.assertFalse(patient.is_active)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
     
     def test_unauthorized_access(self):
         """Test accessing patients without authentication"""
@@ -134,6 +267,34 @@ class PatientTestCase(APITestCase):
         url = reverse('healthcare:patient-list-create')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_duplicate_email_rejected_without_precheck(self):
+        """Test duplicate emails are caught by the constraint, not a SELECT"""
+        url = reverse('healthcare:patient-list-create')
+        self.client.post(url, self.patient_data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, self.patient_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['email'], ['patient with this email already exists.'])
+        self.assertFalse(any(
+            q['sql'].startswith('SELECT') and 'healthcare_patient' in q['sql']
+            for q in queries.captured_queries
+        ))
+    
+    def test_unique_violation_matched_by_constraint_name(self):
+        """Test violations are matched on the named constraint's columns, not error text"""
+        serializer = healthcare_serializers.PatientSerializer()
+        cause = Exception('duplicate key value violates unique constraint')
+        cause.diag = mock.Mock(table_name='healthcare_patient', constraint_name='healthcare_patient_email_key')
+        exc = IntegrityError('duplicate key value violates unique constraint')
+        exc.__cause__ = cause
+        with mock.patch.object(healthcare_serializers, '_constraint_columns', return_value={'email'}) as columns:
+            self.assertEqual(serializer.unique_violation(exc), {'email': ['patient with this email already exists.']})
+        columns.assert_called_once_with('healthcare_patient', 'healthcare_patient_email_key')
+        # A column merely named in the message is not a match
+        self.assertIsNone(serializer.unique_violation(
+            IntegrityError('UNIQUE constraint failed: healthcare_patient.email_verified')
+        ))
 
 
 class DoctorTestCase(APITestCase):
@@ -141,6 +302,7 @@ class DoctorTestCase(APITestCase):
     
     def setUp(self):
         """Set up test data"""
+        cache.clear()
         self.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
@@ -167,6 +329,37 @@ class DoctorTestCase(APITestCase):
             'consultation_fee': '200.00'
         }
     
+    def test_doctor_directory_cached(self):
+        """Test that doctor list and detail are served from the cache until a doctor is written"""
+        doctor = Doctor.objects.create(created_by=self.user, **self.doctor_data)
+        list_url = reverse('healthcare:doctor-list-create')
+        detail_url = reverse('healthcare:doctor-detail', kwargs={'pk': doctor.pk})
+        self.client.get(list_url)
+        self.client.get(detail_url)
+        # Only the JWT user is loaded
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(list_url).data['count'], 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(detail_url).data['id'], doctor.pk)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(detail_url, dict(self.doctor_data, first_name='Dr. Sally'), format='json')
+        self.assertEqual(self.client.get(list_url).data['results'][0]['first_name'], 'Dr. Sally')
+        self.assertEqual(self.client.get(detail_url).data['first_name'], 'Dr. Sally')
+        
+        # Another user's assignment moves the counter but keeps the list cached
+        other = User.objects.create_user(username='other', password='otherpassword123')
+        patient = Patient.objects.create(
+            created_by=other, first_name='Ann', last_name='Lee', email='ann@example.com',
+            date_of_birth='1990-05-15', gender='F', address='1 Main St', city='New York',
+            state='NY', zip_code='10001', emergency_contact_name='Bob Lee',
+            emergency_contact_phone='+1234567899'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            PatientDoctorMapping.objects.create(patient=patient, doctor=doctor, created_by=other)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(list_url).data['results'][0]['active_patient_count'], 0)
+    
     def test_create_doctor(self):
         """Test creating a new doctor"""
         url = reverse('healthcare:doctor-list-create')
@@ -182,6 +375,15 @@ class DoctorTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
     
+    def test_batch_post_doctors_by_ids(self):
+        """Test fetching doctors by id through the POST batch endpoint"""
+        doctor = Doctor.objects.create(created_by=self.user, **self.doctor_data)
+        response = self.client.post(reverse('healthcare:doctor-batch'), {'ids': [999999, doctor.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'id': 999999, 'not_found': True})
+        self.assertEqual(response.data['results'][1]['license_number'], 'MD123456')
+        self.assertEqual(response.data['not_found'], [999999])
+    
     def test_get_doctor_detail(self):
         """Test retrieving specific doctor details"""
         doctor = Doctor.objects.create(created_by=self.user, **self.doctor_data)
@@ -196,18 +398,22 @@ class DoctorTestCase(APITestCase):
         url = reverse('healthcare:doctor-detail', kwargs={'pk': doctor.id})
         updated_data = self.doctor_data.copy()
         updated_data['years_of_experience'] = 15
-        response = self.client.put(url, updated_data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(url, updated_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The mapping preview is only loaded for GET
+        self.assertFalse([q for q in queries if 'patientdoctormapping' in q['sql']])
         doctor.refresh_from_db()
         self.assertEqual(doctor.years_of_experience, 15)
     
     def test_delete_doctor(self):
-        """Test deleting a doctor"""
+        """Test deleting a doctor deactivates it and hides it"""
         doctor = Doctor.objects.create(created_by=self.user, **self.doctor_data)
         url = reverse('healthcare:doctor-detail', kwargs={'pk': doctor.id})
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(Doctor.objects.filter(id=doctor.id).exists())
+        self.assertFalse(Doctor.active.filter(id=doctor.id).exists())
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
 
 
 class PatientDoctorMappingTestCase(APITestCase):
@@ -289,6 +495,61 @@ class PatientDoctorMappingTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
     
+    def create_foreign_mapping(self):
+        other = User.objects.create_user(username='other', password='testpassword123')
+        patient = Patient.objects.create(
+            created_by=other,
+            first_name='Other',
+            last_name='Patient',
+            email='other.patient@example.com',
+            date_of_birth='1990-05-15',
+            gender='F',
+            address='1 Elm St',
+            city='Boston',
+            state='MA',
+            zip_code='02101',
+            emergency_contact_name='Someone',
+            emergency_contact_phone='+1234567891'
+        )
+        return PatientDoctorMapping.objects.create(patient=patient, doctor=self.doctor, created_by=other)
+    
+    def test_mappings_scoped_to_owner(self):
+        """Test mappings of other users' patients are hidden"""
+        own = PatientDoctorMapping.objects.create(patient=self.patient, doctor=self.doctor, created_by=self.user)
+        foreign = self.create_foreign_mapping()
+        self.assertEqual(own.owner, self.user)
+        response = self.client.get(reverse('healthcare:mapping-list-create'))
+        self.assertEqual([m['id'] for m in response.data['results']], [own.id])
+        response = self.client.get(reverse('healthcare:mapping-detail', kwargs={'pk': foreign.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_cannot_assign_foreign_patient(self):
+        """Test a mapping cannot be created for another user's patient"""
+        foreign = self.create_foreign_mapping()
+        foreign.delete()
+        url = reverse('healthcare:mapping-list-create')
+        response = self.client.post(url, {'patient': foreign.patient_id, 'doctor': self.doctor.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('patient', response.data)
+    
+    def test_filter_mappings(self):
+        """Test filtering mappings by status, doctor and assignment date"""
+        mapping = PatientDoctorMapping.objects.create(
+            patient=self.patient, doctor=self.doctor, created_by=self.user, status='COMPLETED'
+        )
+        url = reverse('healthcare:mapping-list-create')
+        today = timezone.localdate(mapping.assigned_date).isoformat()
+        for params, expected in [
+            ({'status': 'COMPLETED', 'doctor': self.doctor.id}, 1),
+            ({'status': 'ACTIVE'}, 0),
+            ({'assigned_after': today, 'assigned_before': today}, 1),
+            ({'assigned_after': (mapping.assigned_date + timezone.timedelta(seconds=1)).isoformat()}, 0),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.data['count'], expected, params)
+        response = self.client.get(url, {'assigned_before': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
     def test_get_patient_doctors(self):
         """Test retrieving doctors for a specific patient"""
         PatientDoctorMapping.objects.create(
@@ -299,7 +560,44 @@ class PatientDoctorMappingTestCase(APITestCase):
         url = reverse('healthcare:patient-doctors', kwargs={'patient_id': self.patient.id})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data['count'], 1)
+    
+    def test_detail_embeds_capped_mapping_preview(self):
+        """Test that detail views embed a capped preview with a count and a list link"""
+        other = User.objects.create_user(username='otheruser', password='testpass123')
+        other_patient = Patient.objects.create(
+            first_name='Other', last_name='Patient', email='other@example.com',
+            phone_number='+1234567899', date_of_birth='1985-01-01', gender='M',
+            address='1 Side St', city='Test City', state='TS', zip_code='12345', created_by=other
+        )
+        PatientDoctorMapping.objects.create(patient=other_patient, doctor=self.doctor, created_by=other)
+        patients = [self.patient] + [
+            Patient.objects.create(
+                first_name=f'Extra{i}', last_name='Patient', email=f'extra{i}@example.com',
+                phone_number=f'+12345670{i:02d}', date_of_birth='1990-01-01', gender='F',
+                address='2 Main St', city='Test City', state='TS', zip_code='12345', created_by=self.user
+            )
+            for i in range(6)
+        ]
+        for patient in patients:
+            PatientDoctorMapping.objects.create(patient=patient, doctor=self.doctor, created_by=self.user)
+        
+        with self.settings(MAPPING_PREVIEW_SIZE=3):
+            response = self.client.get(reverse('healthcare:doctor-detail', kwargs={'pk': self.doctor.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['patient_mappings']), 3)
+        self.assertEqual(response.data['patient_mappings_count'], 7)
+        self.assertEqual(response.data['patient_mappings'][0]['patient'], patients[-1].id)
+        list_url = reverse('healthcare:doctor-mappings', kwargs={'doctor_id': self.doctor.id})
+        self.assertTrue(response.data['patient_mappings_url'].endswith(list_url))
+        
+        response = self.client.get(list_url)
+        self.assertEqual(response.data['count'], 7)
+        self.assertNotIn(other_patient.id, [row['patient'] for row in response.data['results']])
+        
+        response = self.client.get(reverse('healthcare:patient-detail', kwargs={'pk': self.patient.id}))
+        self.assertEqual(response.data['doctor_mappings_count'], 1)
+        self.assertEqual(len(response.data['doctor_mappings']), 1)
     
     def test_delete_mapping(self):
         """Test deleting a patient-doctor mapping"""
@@ -329,6 +627,1366 @@ class PatientDoctorMappingTestCase(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['non_field_errors'], ['This patient is already assigned to this doctor']
+        )
+    
+    def test_upsert_mapping(self):
+        """Test upsert mode updates an existing assignment"""
+        mapping = PatientDoctorMapping.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            created_by=self.user
+        )
+        url = reverse('healthcare:mapping-list-create') + '?upsert=true'
+        data = {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'status': 'COMPLETED',
+            'notes': 'Follow-up done'
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], mapping.id)
+        mapping.refresh_from_db()
+        self.assertEqual(mapping.status, 'COMPLETED')
+        self.assertEqual(mapping.notes, 'Follow-up done')
+    
+    @override_settings(SOFT_DELETE_BATCH_SIZE=1)
+    def test_deleting_doctor_archives_mappings(self):
+        """Test soft-deleting a doctor queues a job archiving its mappings"""
+        second = Patient.objects.create(
+            created_by=self.user,
+            first_name='Mary',
+            last_name='Major',
+            email='mary.major@example.com',
+            date_of_birth='1985-01-01',
+            gender='F',
+            address='1 Elm St',
+            city='New York',
+            state='NY',
+            zip_code='10001',
+            emergency_contact_name='Jane Doe',
+            emergency_contact_phone='+1234567891'
+        )
+        for patient in (self.patient, second):
+            PatientDoctorMapping.objects.create(patient=patient, doctor=self.doctor, created_by=self.user)
+        url = reverse('healthcare:doctor-detail', kwargs={'pk': self.doctor.id})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(PatientDoctorMapping.objects.filter(status='ACTIVE').count(), 2)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(
+            list(PatientDoctorMapping.objects.filter(doctor=self.doctor).values_list('status', flat=True)),
+            ['INACTIVE', 'INACTIVE']
+        )
+    
+    def test_soft_deleted_records_leave_mapping_lists(self):
+        """Test mappings of a deactivated doctor are no longer listed"""
+        PatientDoctorMapping.objects.create(patient=self.patient, doctor=self.doctor, created_by=self.user)
+        url = reverse('healthcare:mapping-list-create')
+        self.assertEqual(self.client.get(url).data['count'], 1)
+        self.doctor.soft_delete()
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        response = self.client.get(reverse('healthcare:patient-doctors', kwargs={'patient_id': self.patient.id}))
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_soft_deleted_records_leave_detail_previews(self):
+        """Test patient detail previews agree with the mapping list after a doctor is deactivated"""
+        PatientDoctorMapping.objects.create(patient=self.patient, doctor=self.doctor, created_by=self.user)
+        self.client.delete(reverse('healthcare:doctor-detail', kwargs={'pk': self.doctor.id}))
+        run_pending()
+        response = self.client.get(reverse('healthcare:patient-detail', kwargs={'pk': self.patient.id}))
+        self.assertEqual(response.data['doctor_mappings_count'], 0)
+        self.assertEqual(response.data['doctor_mappings'], [])
+        response = self.client.get(reverse('healthcare:patient-doctors', kwargs={'patient_id': self.patient.id}))
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_cannot_assign_inactive_doctor(self):
+        """Test soft-deleted doctors cannot receive new assignments"""
+        self.doctor.soft_delete()
+        url = reverse('healthcare:mapping-list-create')
+        data = {'patient': self.patient.id, 'doctor': self.doctor.id}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('doctor', response.data)
+
+
+class ThrottlingTestCase(APITestCase):
+    """Test cases for token bucket rate limiting"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+    
+    def tearDown(self):
+        cache.clear()
+    
+    def test_login_is_rate_limited(self):
+        """Test the stricter login bucket rejects bursts with 429"""
+        url = reverse('healthcare:user-login')
+        data = {'username': 'testuser', 'password': 'testpassword123'}
+        with mock.patch.dict(TokenBucketThrottle.THROTTLE_RATES, {'login': '2/min'}):
+            for _ in range(2):
+                response = self.client.post(url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+        self.assertIn('Retry-After', response)
+    
+    def test_rate_limit_headers(self):
+        """Test authenticated responses expose the tightest bucket"""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        url = reverse('healthcare:doctor-list-create')
+        with mock.patch.dict(TokenBucketThrottle.THROTTLE_RATES, {'user': '5/min'}):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-RateLimit-Limit'], '5')
+        self.assertEqual(response['X-RateLimit-Remaining'], '4')
+    
+    def test_bucket_refills_over_time(self):
+        """Test tokens are replenished in proportion to elapsed time"""
+        throttle = UserTokenBucketThrottle()
+        request = mock.Mock(user=self.user, spec=['user'])
+        now = [1000.0]
+        with mock.patch.dict(TokenBucketThrottle.THROTTLE_RATES, {'user': '2/min'}), \
+                mock.patch.object(UserTokenBucketThrottle, 'timer', lambda self: now[0]):
+            self.assertTrue(throttle.allow_request(request, None))
+            self.assertTrue(throttle.allow_request(request, None))
+            self.assertFalse(throttle.allow_request(request, None))
+            self.assertAlmostEqual(throttle.wait(), 30.0)
+            now[0] += 30
+            self.assertTrue(throttle.allow_request(request, None))
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTestCase(APITestCase):
+    """Test cases for the delta sync endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('healthcare:sync')
+    
+    def create_patient(self, email):
+        return Patient.objects.create(
+            created_by=self.user,
+            first_name='John',
+            last_name='Doe',
+            email=email,
+            date_of_birth='1990-05-15',
+            gender='M',
+            address='123 Main St',
+            city='New York',
+            state='NY',
+            zip_code='10001',
+            emergency_contact_name='Jane Doe',
+            emergency_contact_phone='+1234567891'
+        )
+    
+    def test_initial_sync_returns_everything(self):
+        """Test a sync without a token returns all visible rows as created"""
+        patient = self.create_patient('john.doe@example.com')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data['patients']['created']], [patient.id])
+        self.assertFalse(response.data['has_more'])
+        self.assertIn('next', response.data)
+    
+    def test_sync_returns_only_changes_since_token(self):
+        """Test updates and hard deletes after the token are reported"""
+        kept = self.create_patient('kept@example.com')
+        removed = self.create_patient('removed@example.com')
+        untouched = self.create_patient('untouched@example.com')
+        token = self.client.get(self.url).data['next']
+        
+        kept.first_name = 'Changed'
+        kept.save()
+        removed_id = removed.id
+        removed.delete()
+        added = self.create_patient('added@example.com')
+        
+        response = self.client.get(self.url, {'since': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        patients = response.data['patients']
+        self.assertEqual([p['id'] for p in patients['created']], [added.id])
+        self.assertEqual([p['id'] for p in patients['updated']], [kept.id])
+        self.assertEqual(patients['deleted'], [removed_id])
+        self.assertNotIn(untouched.id, [p['id'] for p in patients['updated']])
+    
+    def test_sync_window_follows_database_clock(self):
+        """Test rows stamped after the database time minus the settle window wait for the next sync"""
+        patient = self.create_patient('john.doe@example.com')
+        with mock.patch('healthcare.sync.database_now', return_value=patient.updated_at - timedelta(seconds=1)):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['patients']['created'], [])
+        response = self.client.get(self.url, {'since': response.data['next']})
+        self.assertEqual([p['id'] for p in response.data['patients']['created']], [patient.id])
+    
+    def test_sync_pages_through_large_change_sets(self):
+        """Test a limited sync resumes from its watermark without losing rows"""
+        ids = {self.create_patient(f'p{i}@example.com').id for i in range(5)}
+        seen, token = set(), None
+        for _ in range(10):
+            params = {'limit': 2}
+            if token:
+                params['since'] = token
+            data = self.client.get(self.url, params).data
+            seen.update(p['id'] for p in data['patients']['created'] + data['patients']['updated'])
+            token = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, ids)
+    
+    def test_tampered_token_rejected(self):
+        """Test a forged sync token is rejected"""
+        response = self.client.get(self.url, {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EVENT_STREAM_POLL_SECONDS=0.01, EVENT_STREAM_MAX_SECONDS=0.05, EVENT_BUFFER_SIZE=3,
+                   EVENT_STREAM_ALLOW_WSGI=True)
+class MappingEventStreamTestCase(APITestCase):
+    """Test cases for the mapping change feed"""
+    
+    def setUp(self):
+        reset_broker()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('healthcare:mapping-events')
+        self.patient = Patient.objects.create(
+            created_by=self.user,
+            first_name='John',
+            last_name='Doe',
+            email='john.doe@example.com',
+            date_of_birth='1990-05-15',
+            gender='M',
+            address='123 Main St',
+            city='New York',
+            state='NY',
+            zip_code='10001',
+            emergency_contact_name='Jane Doe',
+            emergency_contact_phone='+1234567891'
+        )
+        self.doctor = Doctor.objects.create(
+            created_by=self.user,
+            first_name='Sarah',
+            last_name='Johnson',
+            email='dr.sarah@hospital.com',
+            phone_number='+1234567892',
+            specialization='CARDIOLOGY',
+            license_number='MD123456',
+            years_of_experience=10,
+            qualification='MD, MBBS',
+            hospital_affiliation='City General Hospital',
+            office_address='456 Medical Center Dr',
+            city='New York',
+            state='NY',
+            zip_code='10002',
+            consultation_fee='200.00'
+        )
+    
+    def tearDown(self):
+        reset_broker()
+    
+    def read_stream(self, **headers):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return ''.join(chunk.decode() for chunk in response.streaming_content)
+    
+    def test_mapping_lifecycle_publishes_events(self):
+        """Test create, status change and delete are published after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            mapping = PatientDoctorMapping.objects.create(
+                patient=self.patient, doctor=self.doctor, created_by=self.user
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            mapping.status = 'COMPLETED'
+            mapping.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            mapping.delete()
+        events, complete = get_broker().events_since(self.user.id, 0)
+        self.assertTrue(complete)
+        self.assertEqual(
+            [e.type for e in events],
+            ['mapping.created', 'mapping.status_changed', 'mapping.deleted']
+        )
+        self.assertEqual(events[1].data['previous_status'], 'ACTIVE')
+    
+    def test_stream_replays_from_last_event_id(self):
+        """Test reconnecting clients receive events after Last-Event-ID"""
+        broker = get_broker()
+        for i in range(3):
+            broker.publish(self.user.id, 'mapping.created', {'id': i})
+        body = self.read_stream(HTTP_LAST_EVENT_ID='1')
+        self.assertNotIn('id: 1\n', body)
+        self.assertIn('id: 2\nevent: mapping.created', body)
+        self.assertIn('id: 3\nevent: mapping.created', body)
+        self.assertNotIn('resync', body)
+    
+    def test_stream_requests_resync_when_buffer_overflowed(self):
+        """Test a client behind the ring buffer is told to resync"""
+        broker = get_broker()
+        for i in range(6):
+            broker.publish(self.user.id, 'mapping.created', {'id': i})
+        body = self.read_stream(HTTP_LAST_EVENT_ID='1')
+        self.assertIn('event: resync', body)
+        self.assertIn('id: 6\n', body)
+        self.assertNotIn('id: 3\nevent: mapping.created', body)
+    
+    def test_cache_broker_round_trip(self):
+        """Test the shared-cache broker replays from its ring buffer"""
+        cache.clear()
+        broker = CacheBroker(buffer_size=2)
+        for i in range(3):
+            broker.publish(self.user.id, 'mapping.created', {'id': i})
+        events, complete = broker.events_since(self.user.id, 1)
+        self.assertTrue(complete)
+        self.assertEqual([e.id for e in events], [2, 3])
+        events, complete = broker.events_since(self.user.id, 0)
+        self.assertFalse(complete)
+    
+    @override_settings(EVENT_STREAM_ALLOW_WSGI=False)
+    def test_stream_refused_under_wsgi(self):
+        """Test WSGI requests are refused instead of holding a worker thread"""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertEqual(open_streams(), 0)
+    
+    @override_settings(EVENT_STREAM_MAX_CONCURRENT=1)
+    def test_concurrent_streams_are_capped(self):
+        """Test a worker refuses streams beyond its cap until one closes"""
+        first = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(open_streams(), 1)
+        second = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(second.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', second)
+        b''.join(first.streaming_content)
+        self.assertEqual(open_streams(), 0)
+        self.read_stream()
+
+
+class BulkMappingTestCase(APITestCase):
+    """Test cases for bulk assignment and bulk status endpoints"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.patients = [
+            Patient.objects.create(
+                created_by=self.user,
+                first_name=f'Patient{i}',
+                last_name='Doe',
+                email=f'patient{i}@example.com',
+                date_of_birth='1990-05-15',
+                gender='M',
+                address='123 Main St',
+                city='New York',
+                state='NY',
+                zip_code='10001',
+                emergency_contact_name='Jane Doe',
+                emergency_contact_phone='+1234567891'
+            )
+            for i in range(3)
+        ]
+        self.doctors = [
+            Doctor.objects.create(
+                created_by=self.user,
+                first_name=f'Doctor{i}',
+                last_name='Johnson',
+                email=f'doctor{i}@hospital.com',
+                phone_number='+1234567892',
+                specialization='CARDIOLOGY',
+                license_number=f'MD{i}',
+                years_of_experience=10,
+                qualification='MD, MBBS',
+                hospital_affiliation='City General Hospital',
+                office_address='456 Medical Center Dr',
+                city='New York',
+                state='NY',
+                zip_code='10002',
+                consultation_fee='200.00'
+            )
+            for i in range(3)
+        ]
+    
+    def test_assign_many_doctors_to_patient(self):
+        """Test existing assignments are skipped by the unique constraint"""
+        existing = PatientDoctorMapping.objects.create(
+            patient=self.patients[0], doctor=self.doctors[0], created_by=self.user
+        )
+        # Another host's clock running ahead must not make it look new
+        PatientDoctorMapping.objects.filter(pk=existing.pk).update(
+            created_at=timezone.now() + timedelta(minutes=5)
+        )
+        url = reverse('healthcare:mapping-bulk-assign')
+        data = {'patient': self.patients[0].id, 'doctors': [d.id for d in self.doctors]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # No pre-check: the insert is the first statement touching mappings
+        mapping_queries = [q['sql'] for q in queries if 'healthcare_patientdoctormapping' in q['sql']]
+        self.assertTrue(mapping_queries[0].startswith('INSERT'))
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(len(response.data['already_assigned']), 1)
+        self.assertEqual(PatientDoctorMapping.objects.filter(patient=self.patients[0]).count(), 3)
+    
+    def test_assign_doctor_to_many_patients(self):
+        """Test one doctor can be assigned to several patients at once"""
+        url = reverse('healthcare:mapping-bulk-assign')
+        data = {'doctor': self.doctors[1].id, 'patients': [p.id for p in self.patients]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PatientDoctorMapping.objects.filter(doctor=self.doctors[1]).count(), 3)
+    
+    def test_assign_rejects_foreign_patients(self):
+        """Test patients of other users cannot be bulk assigned"""
+        other = User.objects.create_user(username='other', password='testpassword123')
+        foreign = Patient.objects.create(
+            created_by=other,
+            first_name='Other',
+            last_name='Patient',
+            email='other.patient@example.com',
+            date_of_birth='1990-05-15',
+            gender='F',
+            address='1 Elm St',
+            city='Boston',
+            state='MA',
+            zip_code='02101',
+            emergency_contact_name='Someone',
+            emergency_contact_phone='+1234567891'
+        )
+        url = reverse('healthcare:mapping-bulk-assign')
+        data = {'doctor': self.doctors[0].id, 'patients': [foreign.id]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('patients', response.data)
+        self.assertFalse(PatientDoctorMapping.objects.exists())
+    
+    def test_bulk_status_update(self):
+        """Test many mappings move to a new status in one request"""
+        mappings = [
+            PatientDoctorMapping.objects.create(
+                patient=self.patients[0], doctor=doctor, created_by=self.user
+            )
+            for doctor in self.doctors
+        ]
+        PatientDoctorMapping.objects.filter(pk=mappings[2].pk).update(status='COMPLETED')
+        url = reverse('healthcare:mapping-bulk-status')
+        data = {'ids': [m.id for m in mappings] + [999999], 'status': 'COMPLETED'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'FOR UPDATE' in query['sql']])
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "healthcare_patientdoctormapping"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(sorted(response.data['updated']), sorted(m.id for m in mappings[:2]))
+        self.assertEqual(response.data['not_found'], [999999])
+        self.assertEqual(
+            PatientDoctorMapping.objects.filter(status='COMPLETED').count(), 3
+        )
+    
+    def test_bulk_status_skips_rows_changed_concurrently(self):
+        """Test a row another request moved between the read and the UPDATE is not reported"""
+        mappings = [
+            PatientDoctorMapping.objects.create(
+                patient=self.patients[0], doctor=doctor, created_by=self.user
+            )
+            for doctor in self.doctors[:2]
+        ]
+        original = healthcare_serializers._set_status_returning
+        
+        def racing(ids, *args):
+            PatientDoctorMapping.objects.filter(pk=mappings[0].pk).update(status='COMPLETED')
+            return original(ids, *args)
+        
+        with mock.patch('healthcare.serializers._set_status_returning', side_effect=racing):
+            response = self.client.post(reverse('healthcare:mapping-bulk-status'), {
+                'ids': [m.id for m in mappings], 'status': 'COMPLETED'
+            }, format='json')
+        self.assertEqual(response.data['updated'], [mappings[1].id])
+    
+    def test_bulk_writes_refresh_cached_doctor_previews(self):
+        """Test bulk assignment and bulk status drop the cached doctor detail"""
+        cache.clear()
+        doctor = self.doctors[0]
+        detail_url = reverse('healthcare:doctor-detail', kwargs={'pk': doctor.pk})
+        self.assertEqual(self.client.get(detail_url).data['patient_mappings'], [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('healthcare:mapping-bulk-assign'), {
+                'doctor': doctor.id, 'patients': [p.id for p in self.patients]
+            }, format='json')
+        preview = self.client.get(detail_url).data['patient_mappings']
+        self.assertEqual(len(preview), 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('healthcare:mapping-bulk-status'), {
+                'ids': [row['id'] for row in preview], 'status': 'COMPLETED'
+            }, format='json')
+        preview = self.client.get(detail_url).data['patient_mappings']
+        self.assertEqual({row['status'] for row in preview}, {'COMPLETED'})
+    
+    def test_counters_follow_single_writes(self):
+        """Test assignment counters track create, status change and delete"""
+        patient, doctor = self.patients[0], self.doctors[0]
+        mapping = PatientDoctorMapping.objects.create(patient=patient, doctor=doctor, created_by=self.user)
+        patient.refresh_from_db()
+        doctor.refresh_from_db()
+        self.assertEqual((patient.active_doctor_count, doctor.active_patient_count), (1, 1))
+        
+        mapping.status = 'COMPLETED'
+        mapping.save()
+        doctor.refresh_from_db()
+        self.assertEqual(doctor.active_patient_count, 0)
+        
+        mapping.status = 'ACTIVE'
+        mapping.save()
+        url = reverse('healthcare:mapping-detail', kwargs={'pk': mapping.id})
+        self.client.delete(url)
+        patient.refresh_from_db()
+        doctor.refresh_from_db()
+        self.assertEqual((patient.active_doctor_count, doctor.active_patient_count), (0, 0))
+    
+    def test_counters_follow_bulk_writes(self):
+        """Test bulk endpoints recount the rows they touch"""
+        url = reverse('healthcare:mapping-bulk-assign')
+        data = {'doctor': self.doctors[0].id, 'patients': [p.id for p in self.patients]}
+        self.client.post(url, data, format='json')
+        self.doctors[0].refresh_from_db()
+        self.assertEqual(self.doctors[0].active_patient_count, 3)
+        
+        ids = list(PatientDoctorMapping.objects.values_list('id', flat=True)[:2])
+        url = reverse('healthcare:mapping-bulk-status')
+        self.client.post(url, {'ids': ids, 'status': 'INACTIVE'}, format='json')
+        self.doctors[0].refresh_from_db()
+        self.assertEqual(self.doctors[0].active_patient_count, 1)
+        
+        response = self.client.get(
+            reverse('healthcare:doctor-list-create'), {'ordering': '-active_patient_count'}
+        )
+        self.assertEqual(response.data['results'][0]['id'], self.doctors[0].id)
+        self.assertEqual(response.data['results'][0]['active_patient_count'], 1)
+    
+    def test_reconcile_counters_command(self):
+        """Test reconcile_counters repairs drifted counters"""
+        PatientDoctorMapping.objects.create(
+            patient=self.patients[0], doctor=self.doctors[0], created_by=self.user
+        )
+        Doctor.objects.update(active_patient_count=7)
+        call_command('reconcile_counters', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(
+            list(Doctor.objects.order_by('id').values_list('active_patient_count', flat=True)),
+            [1, 0, 0],
+        )
+
+
+class JobQueueTestCase(APITestCase):
+    """Test cases for the database-backed job queue"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.calls = []
+        
+        @job('test_echo', max_attempts=2)
+        def echo(value, fail=False):
+            self.calls.append(value)
+            if fail:
+                raise RuntimeError('boom')
+            return {'echo': value}
+    
+    def test_job_result_is_stored(self):
+        """Test a queued job runs once and stores its result"""
+        queued = enqueue('test_echo', 'hello', user=self.user)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(run_pending(), 0)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'SUCCEEDED')
+        self.assertEqual(queued.result, {'echo': 'hello'})
+        self.assertEqual(self.calls, ['hello'])
+    
+    def test_failed_job_is_retried_then_failed(self):
+        """Test failures are retried with backoff up to max_attempts"""
+        queued = enqueue('test_echo', 'bad', fail=True)
+        with self.assertLogs('healthcare.jobs', level='ERROR'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'QUEUED')
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.run_after, timezone.now())
+        
+        Job.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        with self.assertLogs('healthcare.jobs', level='ERROR'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'FAILED')
+        self.assertIn('RuntimeError: boom', queued.error)
+    
+    def test_job_is_claimed_only_once(self):
+        """Test two workers cannot claim the same job"""
+        queued = enqueue('test_echo', 'once')
+        self.assertEqual(claim('worker-a', 5), [queued.pk])
+        self.assertEqual(claim('worker-b', 5), [])
+    
+    def test_job_killing_its_worker_fails_after_max_attempts(self):
+        """Test an expired lease counts as an attempt and is not reclaimed forever"""
+        queued = enqueue('test_echo', 'crash')
+        for expected_attempts in (1, 2):
+            self.assertEqual(claim('worker-a', 5), [queued.pk])
+            queued.refresh_from_db()
+            self.assertEqual(queued.attempts, expected_attempts)
+            # The worker dies without recording an outcome
+            Job.objects.filter(pk=queued.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim('worker-b', 5), [])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'FAILED')
+        self.assertIn('Lease expired', queued.error)
+        self.assertEqual(self.calls, [])
+    
+    def test_purge_is_scheduled_periodically(self):
+        """Test periodic jobs are queued once per interval"""
+        first = enqueue_periodic('purge_expired', timedelta(hours=1))
+        self.assertIsNotNone(first)
+        self.assertIsNone(enqueue_periodic('purge_expired', timedelta(hours=1)))
+        run_pending()
+        self.assertIsNone(enqueue_periodic('purge_expired', timedelta(hours=1)))
+        Job.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNotNone(enqueue_periodic('purge_expired', timedelta(hours=1)))
+    
+    def test_job_status_endpoint(self):
+        """Test users can read their own jobs only"""
+        mine = enqueue('test_echo', 'mine', user=self.user)
+        other = User.objects.create_user(username='other', password='testpassword123')
+        theirs = enqueue('test_echo', 'theirs', user=other)
+        response = self.client.get(reverse('healthcare:job-detail', kwargs={'pk': mine.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'QUEUED')
+        response = self.client.get(reverse('healthcare:job-detail', kwargs={'pk': theirs.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DuplicateDetectionTestCase(APITestCase):
+    """Test cases for possible-duplicate patient detection"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.patient_data = {
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john.doe@example.com',
+            'phone_number': '+1234567890',
+            'date_of_birth': '1990-05-15',
+            'gender': 'M',
+            'address': '123 Main St',
+            'city': 'New York',
+            'state': 'NY',
+            'zip_code': '10001',
+            'emergency_contact_name': 'Jane Doe',
+            'emergency_contact_phone': '+1234567891'
+        }
+        self.original = Patient.objects.create(created_by=self.user, **self.patient_data)
+    
+    def test_soundex(self):
+        """Test Soundex codes used for name blocking"""
+        self.assertEqual(soundex('Robert'), 'R163')
+        self.assertEqual(soundex('Rupert'), 'R163')
+        self.assertEqual(soundex('Ashcraft'), 'A261')
+        self.assertEqual(soundex('Tymczak'), 'T522')
+    
+    def test_create_reports_possible_duplicates(self):
+        """Test a near-identical patient is flagged but still created"""
+        data = dict(self.patient_data, email='jon.doe@example.com', phone_number='1234567890', last_name='Do')
+        response = self.client.post(reverse('healthcare:patient-list-create'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        match = response.data['possible_duplicates'][0]
+        self.assertEqual(match['id'], self.original.id)
+        self.assertEqual(match['matched_on'], ['NAME_DOB', 'PHONE'])
+    
+    def test_distinct_patient_not_flagged(self):
+        """Test unrelated patients are not reported"""
+        data = dict(
+            self.patient_data, first_name='Alice', last_name='Smith', email='alice@example.com',
+            phone_number='+1987654321', date_of_birth='1985-01-01'
+        )
+        response = self.client.post(reverse('healthcare:patient-list-create'), data, format='json')
+        self.assertEqual(response.data['possible_duplicates'], [])
+    
+    def test_check_is_a_bounded_lookup(self):
+        """Test the insert-time check is one key lookup and one candidate fetch"""
+        candidate = Patient(created_by=self.user, **dict(self.patient_data, email='x@example.com'))
+        candidate.date_of_birth = self.original.date_of_birth
+        with self.assertNumQueries(2):
+            matches = find_duplicates(candidate)
+        self.assertEqual([match['id'] for match in matches], [self.original.id])
+    
+    def test_scan_duplicates_command(self):
+        """Test the batch scan reports each pair once"""
+        Patient.objects.create(
+            created_by=self.user, **dict(self.patient_data, email='john.doe2@example.com', phone_number='')
+        )
+        out = StringIO()
+        call_command('scan_duplicates', '--user', 'testuser', stdout=out)
+        self.assertIn('Found 1 possible duplicate pairs', out.getvalue())
+
+
+class AutocompleteTestCase(APITestCase):
+    """Test cases for name autocomplete"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        other = User.objects.create_user(username='other', password='testpassword123')
+        self.patients = [
+            self.create_patient(owner, first_name, last_name)
+            for owner, first_name, last_name in [
+                (self.user, 'José', 'Álvarez'), (self.user, 'John', 'Doe'), (other, 'John', 'Other'),
+            ]
+        ]
+        self.doctor = Doctor.objects.create(
+            created_by=other,
+            first_name='Johnny',
+            last_name='Smith',
+            email='doctor@hospital.com',
+            phone_number='+1234567892',
+            specialization='CARDIOLOGY',
+            license_number='MD1',
+            years_of_experience=10,
+            qualification='MD, MBBS',
+            hospital_affiliation='City General Hospital',
+            office_address='456 Medical Center Dr',
+            city='New York',
+            state='NY',
+            zip_code='10002',
+            consultation_fee='200.00'
+        )
+    
+    def create_patient(self, owner, first_name, last_name):
+        return Patient.objects.create(
+            created_by=owner,
+            first_name=first_name,
+            last_name=last_name,
+            email=f'{last_name.lower()}@example.com',
+            date_of_birth='1990-05-15',
+            gender='M',
+            address='123 Main St',
+            city='New York',
+            state='NY',
+            zip_code='10001',
+            emergency_contact_name='Jane Doe',
+            emergency_contact_phone='+1234567891'
+        )
+    
+    def test_prefix_matches_first_and_last_name(self):
+        """Test accents and case are ignored and surnames match too"""
+        url = reverse('healthcare:autocomplete')
+        response = self.client.get(url, {'q': 'JO'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['type'], item['full_name']) for item in response.data],
+            [('patient', 'John Doe'), ('doctor', 'Dr. Johnny Smith'), ('patient', 'José Álvarez')]
+        )
+        response = self.client.get(url, {'q': 'alv'})
+        self.assertEqual([item['id'] for item in response.data], [self.patients[0].id])
+        self.assertEqual(set(response.data[0]), {'id', 'full_name', 'type'})
+    
+    def test_typed_endpoints(self):
+        """Test the patient and doctor pickers only return their type"""
+        response = self.client.get(reverse('healthcare:autocomplete-doctors'), {'q': 'jo', 'limit': 5})
+        self.assertEqual([item['id'] for item in response.data], [self.doctor.id])
+        response = self.client.get(reverse('healthcare:autocomplete-patients'), {'q': 'smi'})
+        self.assertEqual(response.data, [])
+        response = self.client.get(reverse('healthcare:autocomplete-patients'), {'q': ''})
+        self.assertEqual(response.data, [])
+    
+    def test_keys_follow_renames(self):
+        """Test partial saves of name fields refresh the keys"""
+        patient = self.patients[1]
+        patient.last_name = 'Zimmer'
+        patient.save(update_fields=['last_name'])
+        patient.refresh_from_db()
+        self.assertEqual((patient.name_key, patient.surname_key), ('john zimmer', 'zimmer john'))
+
+
+class CompressionTestCase(APITestCase):
+    """Test cases for negotiated response compression"""
+    
+    def setUp(self):
+        """Set up a patient with a long medical history"""
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        Patient.objects.create(
+            first_name='John', last_name='Doe', email='john@example.com', phone_number='+1234567890',
+            date_of_birth='1990-05-15', gender='M', address='123 Main St', city='Test City',
+            state='TS', zip_code='12345', created_by=self.user,
+            medical_history='Hypertension, controlled with medication. ' * 100,
+        )
+    
+    def test_negotiate_encoding(self):
+        """Test that q-values and the server preference decide the encoding"""
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0, identity'), None)
+        self.assertEqual(negotiate_encoding('br;q=0.5, gzip', ['br', 'gzip']), 'gzip')
+        self.assertEqual(negotiate_encoding('*', ['br', 'gzip']), 'br')
+        self.assertEqual(negotiate_encoding(''), None)
+    
+    def test_large_response_compressed_once(self):
+        """Test that a large JSON response is gzipped and repeated bodies reuse the cached bytes"""
+        url = reverse('healthcare:patient-list-create') + '?expand=medical_history'
+        with mock.patch('healthcare.middleware.compress', wraps=compress) as compressor:
+            first = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressor.call_count, 1)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', first['Vary'])
+        self.assertEqual(first.content, second.content)
+        body = json.loads(gzip.decompress(first.content))
+        self.assertEqual(body['count'], 1)
+        self.assertLess(len(first.content) * 5, len(gzip.decompress(first.content)))
+        
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(reverse('healthcare:stats-section', kwargs={'section': 'doctors'}),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_streaming_response_compressed(self):
+        """Test that streamed CSV is compressed chunk by chunk and event streams are untouched"""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        rows = [f'{i},patient {i}\n'.encode() for i in range(1000)]
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(rows), content_type='text/csv'))
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(rows))
+        
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(rows), content_type='text/event-stream')
+        )
+        self.assertFalse(middleware(request).has_header('Content-Encoding'))
+    
+    def test_secrets_not_compressed(self):
+        """Test token endpoints and cookie-authenticated responses are sent uncompressed"""
+        body = json.dumps({'access': 'x' * 2000})
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type='application/json'))
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get('/api/patients/', HTTP_ACCEPT_ENCODING='gzip'))['Content-Encoding'], 'gzip')
+        self.assertFalse(middleware(factory.post('/api/auth/login/', HTTP_ACCEPT_ENCODING='gzip'))
+                         .has_header('Content-Encoding'))
+        request = factory.get('/admin/', HTTP_ACCEPT_ENCODING='gzip')
+        request.COOKIES['sessionid'] = 'abc'
+        self.assertFalse(middleware(request).has_header('Content-Encoding'))
+
+
+class IdempotencyTestCase(APITestCase):
+    """Test cases for Idempotency-Key on POST endpoints"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('healthcare:patient-list-create')
+        self.patient_data = {
+            'first_name': 'John', 'last_name': 'Doe', 'email': 'john.doe@example.com',
+            'phone_number': '+1234567890', 'date_of_birth': '1990-05-15', 'gender': 'M',
+            'address': '123 Main St', 'city': 'New York', 'state': 'NY', 'zip_code': '10001',
+            'emergency_contact_name': 'Jane Doe', 'emergency_contact_phone': '+1234567891',
+        }
+    
+    def test_retry_replays_first_response(self):
+        """Test that a retried create returns the stored response without inserting again"""
+        first = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        # One query for the JWT user, one for the stored key
+        with self.assertNumQueries(2):
+            second = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Patient.objects.count(), 1)
+        
+        # Without a key the duplicate is validated as usual
+        response = self.client.post(self.url, self.patient_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_key_reused_with_different_body(self):
+        """Test that reusing a key for a different request body is rejected"""
+        self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        data = dict(self.patient_data, email='other@example.com')
+        response = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Patient.objects.count(), 1)
+    
+    def test_failed_request_releases_key(self):
+        """Test that rejected requests and server errors free the key for a corrected retry"""
+        data = dict(self.patient_data, email='not-an-email')
+        response = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='bad')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='bad')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        
+        with mock.patch('rest_framework.generics.ListCreateAPIView.post', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertFalse(IdempotencyKey.objects.filter(key='abc').exists())
+    
+    def test_concurrent_duplicate_waits(self):
+        """Test that a duplicate of an in-flight request waits for its response"""
+        first = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        record = IdempotencyKey.objects.get(key='abc')
+        IdempotencyKey.objects.filter(pk=record.pk).update(status_code=None)
+        
+        def finish(delay):
+            IdempotencyKey.objects.filter(pk=record.pk).update(status_code=201)
+        
+        with mock.patch('healthcare.idempotency.time.sleep', side_effect=finish) as sleep:
+            response = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['id'], first.data['id'])
+        
+        IdempotencyKey.objects.filter(pk=record.pk).update(status_code=None)
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0):
+            response = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Patient.objects.count(), 1)
+    
+    def test_bulk_assign_and_purge(self):
+        """Test function views honour the key and expired keys are purged in batches"""
+        patient = self.client.post(self.url, self.patient_data, format='json', HTTP_IDEMPOTENCY_KEY='k1').data
+        doctor = Doctor.objects.create(
+            created_by=self.user, first_name='Sarah', last_name='Johnson', email='sarah@hospital.com',
+            phone_number='+1234567892', specialization='CARDIOLOGY', license_number='MD123456',
+            years_of_experience=10, qualification='MD', office_address='456 Medical Center Dr',
+            city='New York', state='NY', zip_code='10002', consultation_fee=150,
+        )
+        url = reverse('healthcare:mapping-bulk-assign')
+        data = {'patient': patient['id'], 'doctors': [doctor.id]}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='k2')
+        second = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='k2')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(PatientDoctorMapping.objects.count(), 1)
+        self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='k3')
+        self.assertEqual(IdempotencyKey.objects.count(), 3)
+        IdempotencyKey.objects.exclude(key='k3').update(expires_at=timezone.now())
+        self.assertEqual(purge_idempotency_keys(batch_size=1), 2)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['k3'])
+
+
+class SingleFlightTestCase(TestCase):
+    """Test cases for single-flight cache fills"""
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_concurrent_misses_compute_once(self):
+        """Test that concurrent callers of a missing key share one computation"""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+        
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(singleflight.get_or_set('key', compute, 60)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+    
+    def test_stale_value_served_while_refreshing(self):
+        """Test that an expired entry is refreshed by the lock holder and served stale to the rest"""
+        singleflight.get_or_set('key', lambda: 'old', 0)
+        cache.add('key:lock', 1)
+        self.assertEqual(singleflight.get_or_set('key', mock.Mock(side_effect=AssertionError), 60), 'old')
+        cache.delete('key:lock')
+        self.assertEqual(singleflight.get_or_set('key', lambda: 'new', 60), 'new')
+        self.assertEqual(singleflight.get_or_set('key', mock.Mock(side_effect=AssertionError), 60), 'new')
+        self.assertIsNone(cache.get('key:lock'))
+    
+    def test_miss_waits_for_other_process(self):
+        """Test that a miss while another process holds the lock waits for its value"""
+        cache.add('key:lock', 1)
+        
+        def other_process_fills(delay):
+            singleflight._store('key', 'theirs', 60)
+        
+        with mock.patch('healthcare.singleflight.time.sleep', side_effect=other_process_fills):
+            value = singleflight.get_or_set('key', mock.Mock(side_effect=AssertionError), 60)
+        self.assertEqual(value, 'theirs')
+        
+        cache.clear()
+        cache.add('key:lock', 1)
+        with override_settings(SINGLEFLIGHT_WAIT_SECONDS=0), mock.patch('healthcare.singleflight.time.sleep'):
+            self.assertEqual(singleflight.get_or_set('key', lambda: 'ours', 60), 'ours')
+
+
+class StatsTestCase(APITestCase):
+    """Test cases for the dashboard statistics endpoints"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        today = timezone.now().date()
+        for i, (gender, blood_group, age) in enumerate([('M', 'A+', 10), ('F', 'A+', 40), ('F', 'O-', 70)]):
+            Patient.objects.create(
+                created_by=self.user,
+                first_name=f'Patient{i}',
+                last_name='Doe',
+                email=f'patient{i}@example.com',
+                date_of_birth=today.replace(year=today.year - age - 1, day=1),
+                gender=gender,
+                blood_group=blood_group,
+                address='123 Main St',
+                city='Boston' if i else 'New York',
+                state='MA' if i else 'NY',
+                zip_code='10001',
+                emergency_contact_name='Jane Doe',
+                emergency_contact_phone='+1234567891'
+            )
+        for i, fee in enumerate(['100.00', '200.00']):
+            Doctor.objects.create(
+                created_by=self.user,
+                first_name=f'Doctor{i}',
+                last_name='Johnson',
+                email=f'doctor{i}@hospital.com',
+                phone_number='+1234567892',
+                specialization='CARDIOLOGY',
+                license_number=f'MD{i}',
+                years_of_experience=10,
+                qualification='MD, MBBS',
+                hospital_affiliation='City General Hospital',
+                office_address='456 Medical Center Dr',
+                city='New York',
+                state='NY',
+                zip_code='10002',
+                consultation_fee=fee
+            )
+    
+    def test_patient_aggregates(self):
+        """Test patient counts are grouped in the database"""
+        # One query authenticates the user, one per grouping
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('healthcare:stats-section', kwargs={'section': 'patients'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertIn({'gender': 'F', 'count': 2}, response.data['by_gender'])
+        self.assertIn({'blood_group': 'A+', 'count': 2}, response.data['by_blood_group'])
+        bands = {row['age_band']: row['count'] for row in response.data['by_age_band']}
+        self.assertEqual(bands, {'0-17': 1, '18-34': 0, '35-49': 1, '50-64': 0, '65+': 1})
+        self.assertEqual(response.data['by_location'][0], {'state': 'MA', 'city': 'Boston', 'count': 2})
+    
+    def test_doctor_aggregates(self):
+        """Test doctor counts and average fee by specialization"""
+        response = self.client.get(reverse('healthcare:stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = response.data['doctors']['by_specialization'][0]
+        self.assertEqual((row['specialization'], row['count']), ('CARDIOLOGY', 2))
+        self.assertEqual(float(row['average_consultation_fee']), 150.0)
+    
+    def test_cached_until_write(self):
+        """Test cached aggregates are served until a record is written"""
+        url = reverse('healthcare:stats-section', kwargs={'section': 'patients'})
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['total'], 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Patient.objects.filter(first_name='Patient0').get().soft_delete()
+        response = self.client.get(url)
+        self.assertEqual(response.data['total'], 2)
+    
+    def test_unknown_section(self):
+        """Test unknown sections return 404"""
+        response = self.client.get(reverse('healthcare:stats-section', kwargs={'section': 'nurses'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CohortTestCase(APITestCase):
+    """Test cases for cohort statistics"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        today = timezone.now().date()
+        for i, (gender, state, age) in enumerate([('M', 'NY', 10), ('F', 'MA', 40), ('F', 'MA', 45)]):
+            Patient.objects.create(
+                created_by=self.user,
+                first_name=f'Patient{i}',
+                last_name='Doe',
+                email=f'patient{i}@example.com',
+                date_of_birth=today.replace(year=today.year - age - 1, day=1),
+                gender=gender,
+                address='123 Main St',
+                city='Boston',
+                state=state,
+                zip_code='10001',
+                emergency_contact_name='Jane Doe',
+                emergency_contact_phone='+1234567891'
+            )
+        Doctor.objects.create(
+            created_by=self.user,
+            first_name='Michael',
+            last_name='Johnson',
+            email='doctor@hospital.com',
+            phone_number='+1234567892',
+            specialization='CARDIOLOGY',
+            license_number='MD1',
+            years_of_experience=10,
+            qualification='MD, MBBS',
+            hospital_affiliation='City General Hospital',
+            office_address='456 Medical Center Dr',
+            city='New York',
+            state='NY',
+            zip_code='10002',
+            consultation_fee='200.00'
+        )
+    
+    @skipUnless(numpy_available(), 'NumPy is not installed')
+    def test_ages_around_birthdays(self):
+        """Test vectorized ages match calendar arithmetic"""
+        import numpy as np
+        births = np.array(['2000-02-29', '2000-03-01', '2000-03-02'], dtype='datetime64[D]')
+        self.assertEqual(ages(births, today=date(2024, 3, 1)).tolist(), [24, 24, 23])
+    
+    def test_cohort_endpoint(self):
+        """Test cohort counts and cross-tabs"""
+        response = self.client.get(reverse('healthcare:stats-cohorts'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        patients = response.data['patients']
+        self.assertEqual(patients['total'], 3)
+        self.assertEqual(patients['age_bands']['35-49'], 2)
+        self.assertEqual(patients['age_band_by_gender']['35-49'], {'F': 2})
+        self.assertEqual(patients['age_band_by_state']['0-17'], {'NY': 1})
+        self.assertEqual(response.data['doctors']['specialization_by_state']['CARDIOLOGY'], {'NY': 1})
+    
+    @skipUnless(numpy_available(), 'NumPy is not installed')
+    def test_vectorized_path_matches_aggregates(self):
+        """Test the NumPy cohorts and the grouped queries agree"""
+        patients = Patient.objects.filter(created_by=self.user)
+        doctors = Doctor.objects.filter(created_by=self.user)
+        self.assertEqual(patient_cohorts(patients), patient_cohort_aggregates(patients))
+        self.assertEqual(doctor_cohorts(doctors), doctor_cohort_aggregates(doctors))
+    
+    @skipUnless(numpy_available(), 'NumPy is not installed')
+    def test_chunked_loading(self):
+        """Test columns are assembled from several chunks, with text codes shared across chunks"""
+        arrays, encoders = load_columns(
+            Patient.objects.all(), [('gender', 'choice'), ('state', 'text')], chunk_size=2
+        )
+        genders = [encoders['gender'].labels[code] for code in arrays['gender']]
+        states = [encoders['state'].labels[code] for code in arrays['state']]
+        self.assertEqual(arrays['state'].dtype.kind, 'i')
+        self.assertEqual(sorted(encoders['state'].labels), ['MA', 'NY'])
+        self.assertEqual(sorted(zip(genders, states)), [('F', 'MA'), ('F', 'MA'), ('M', 'NY')])
+
+
+class ExportTestCase(APITestCase):
+    """Test cases for columnar snapshot exports"""
+    
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword123'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        for i, gender in enumerate(['M', 'F', 'F']):
+            Patient.objects.create(
+                created_by=self.user,
+                first_name=f'Patient{i}',
+                last_name='Doe',
+                email=f'patient{i}@example.com',
+                date_of_birth='1990-05-15',
+                gender=gender,
+                address='123 Main St',
+                city='New York',
+                state='NY',
+                zip_code='10001',
+                emergency_contact_name='Jane Doe',
+                emergency_contact_phone='+1234567891'
+            )
+    
+    def test_csv_export_job(self):
+        """Test the export endpoint queues a job and serves its files"""
+        with self.settings(EXPORT_ROOT=self.export_root):
+            response = self.client.post(reverse('healthcare:export-create'), {'format': 'csv'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertTrue(response['Location'].endswith(
+                reverse('healthcare:job-detail', kwargs={'pk': response.data['id']})
+            ))
+            run_pending()
+            job_row = Job.objects.get(pk=response.data['id'])
+            self.assertEqual(job_row.status, 'SUCCEEDED')
+            self.assertEqual(job_row.result['tables']['patients']['rows'], 3)
+            
+            url = reverse('healthcare:export-download', kwargs={'pk': job_row.pk, 'table': 'patients'})
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            response.close()
+            self.assertTrue(lines[0].startswith('id,first_name,last_name'))
+            self.assertEqual(len(lines), 4)
+    
+    def test_download_requires_owner(self):
+        """Test other users cannot download an export"""
+        job_row = Job.objects.create(
+            name='export_snapshot', status='SUCCEEDED', created_by=self.user,
+            result={'path': 'x', 'tables': {'patients': {'file': 'patients.csv'}}}
+        )
+        other = User.objects.create_user(username='other', password='testpassword123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        url = reverse('healthcare:export-download', kwargs={'pk': job_row.pk, 'table': 'patients'})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    @skipUnless(parquet_available(), 'pyarrow is not installed')
+    def test_parquet_dictionary_columns(self):
+        """Test choice columns are dictionary-encoded across record batches"""
+        import pyarrow.parquet as pq
+        path = f'{self.export_root}/patients.parquet'
+        rows = export_table(Patient.objects.all(), path, 'parquet', batch_size=2)
+        self.assertEqual(rows, 3)
+        table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 3)
+        self.assertTrue(str(table.schema.field('gender').type).startswith('dictionary'))
+        self.assertEqual(table.column('gender').to_pylist(), ['M', 'F', 'F'])
+        self.assertEqual(table.column('blood_group').to_pylist(), ['', '', ''])
+
+
+class SchemaTestCase(TestCase):
+    """Test cases for the precomputed OpenAPI schema"""
+    
+    def setUp(self):
+        """Point the schema cache at a temporary directory"""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(API_SCHEMA_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        schema._documents.clear()
+        self.addCleanup(schema._documents.clear)
+    
+    def test_schema_generated_once_and_revalidated(self):
+        """Test that the spec is generated once, stored on disk and answered with 304 when unchanged"""
+        with mock.patch.object(schema, 'generate', wraps=schema.generate) as generate:
+            response = self.client.get('/swagger.json/')
+            self.client.get('/swagger/', {'format': 'openapi'})
+            self.client.get('/swagger.yaml/')
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        paths = json.loads(response.content)['paths']
+        self.assertIn('/patients/', paths)
+        # Overrides recorded by healthcare.docs are applied to the generated schema
+        login = paths['/auth/login/']['post']['responses']['200']['schema']
+        self.assertIn('tokens', login['properties'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertTrue((Path(self.root) / schema.code_version() / 'swagger.json.gz').exists())
+        
+        response = self.client.get('/swagger.json/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        
+        # A fresh process loads the stored files instead of regenerating
+        schema._documents.clear()
+        with mock.patch.object(schema, 'generate') as generate:
+            response = self.client.get('/swagger.json/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        generate.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('/doctors/', json.loads(gzip.decompress(response.content))['paths'])
+    
+    def test_ui_page_does_not_generate_schema(self):
+        """Test that the Swagger UI at the site root is served without introspecting the API"""
+        with mock.patch.object(schema, 'generate') as generate:
+            response = self.client.get('/')
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Healthcare Backend API')
+
+
+class StartupTestCase(TestCase):
+    """Test cases for cold start behaviour"""
+    
+    def test_profile_startup_skips_optional_heavy_imports(self):
+        """Test that a fresh worker serves its first request without importing NumPy or pyarrow"""
+        out = StringIO()
+        call_command('profile_startup', '/api/doctors/', '--top', '1000', stdout=out)
+        output = out.getvalue()
+        self.assertIn('first GET /api/doctors/ (401)', output)
+        packages = [line.split()[0] for line in output.split('package')[-1].splitlines()[1:] if line]
+        self.assertIn('django', packages)
+        self.assertNotIn('numpy', packages)
+        self.assertNotIn('pyarrow', packages)
 
 
 class ModelTestCase(TestCase):
@@ -381,6 +2039,130 @@ class ModelTestCase(TestCase):
         )
         self.assertEqual(doctor.full_name, 'Dr. Sarah Johnson')
         self.assertEqual(str(doctor), 'Dr. Sarah Johnson - CARDIOLOGY')
+    
+    def test_row_version_conditional_update(self):
+        """Test that saves bump the version in one conditional UPDATE and stale copies conflict"""
+        doctor = Doctor.objects.create(
+            created_by=self.user, first_name='Sarah', last_name='Johnson', email='dr.sarah@hospital.com',
+            phone_number='+1234567892', specialization='CARDIOLOGY', license_number='MD123456',
+            years_of_experience=10, qualification='MD', hospital_affiliation='City General Hospital',
+            office_address='456 Medical Center Dr', city='New York', state='NY', zip_code='10002',
+            consultation_fee='200.00'
+        )
+        stale = Doctor.objects.get(pk=doctor.pk)
+        with CaptureQueriesContext(connection) as queries:
+            doctor.save(update_fields=['bio'])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"version" = 1', queries[0]['sql'])
+        self.assertEqual(doctor.version, 2)
+        
+        stale.bio = 'Overwrites the first save'
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            stale.save()
+        self.assertEqual(stale.version, 1)
+        self.assertEqual(Doctor.objects.get(pk=doctor.pk).version, 2)
+
+
+class AdminTestCase(TestCase):
+    """Test cases for admin changelist scalability"""
+    
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='testpassword123'
+        )
+        self.client.force_login(self.user)
+        self.doctor = Doctor.objects.create(
+            created_by=self.user,
+            first_name='Sarah',
+            last_name='Johnson',
+            email='dr.sarah@hospital.com',
+            phone_number='+1234567892',
+            specialization='CARDIOLOGY',
+            license_number='MD123456',
+            years_of_experience=10,
+            qualification='MD, MBBS',
+            hospital_affiliation='City General Hospital',
+            office_address='456 Medical Center Dr',
+            city='New York',
+            state='NY',
+            zip_code='10002',
+            consultation_fee='200.00'
+        )
+        self.url = reverse('admin:healthcare_patientdoctormapping_changelist')
+    
+    def add_mappings(self, count):
+        start = Patient.objects.count()
+        for i in range(start, start + count):
+            patient = Patient.objects.create(
+                created_by=self.user,
+                first_name=f'Patient{i}',
+                last_name='Doe',
+                email=f'patient{i}@example.com',
+                date_of_birth='1990-05-15',
+                gender='M',
+                address='123 Main St',
+                city='New York',
+                state='NY',
+                zip_code='10001',
+                emergency_contact_name='Jane Doe',
+                emergency_contact_phone='+1234567891'
+            )
+            PatientDoctorMapping.objects.create(patient=patient, doctor=self.doctor, created_by=self.user)
+    
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test related objects are joined rather than fetched per row"""
+        self.add_mappings(1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        self.add_mappings(5)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few), len(many))
+    
+    def test_mapping_form_uses_autocomplete(self):
+        """Test the mapping form does not list every patient and doctor"""
+        response = self.client.get(reverse('admin:healthcare_patientdoctormapping_add'))
+        self.assertContains(response, 'data-ajax--url', count=3)
+        self.assertNotContains(response, self.doctor.full_name)
+    
+    def test_cursor_navigation(self):
+        """Test the Older link pages by primary key"""
+        self.add_mappings(3)
+        newest_first = list(PatientDoctorMapping.objects.order_by('-pk').values_list('pk', flat=True))
+        with mock.patch.object(admin.site._registry[PatientDoctorMapping], 'list_per_page', 2):
+            response = self.client.get(self.url)
+            self.assertEqual([m.pk for m in response.context['cl'].result_list], newest_first[:2])
+            response = self.client.get(self.url + response.context['cursor_next_url'])
+        self.assertEqual([m.pk for m in response.context['cl'].result_list], newest_first[2:])
+        self.assertNotIn('cursor_next_url', response.context)
+    
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1000)
+    def test_estimated_count(self):
+        """Test planner estimates replace COUNT(*) above the threshold"""
+        queryset = PatientDoctorMapping.objects.all()
+        with mock.patch.object(EstimatedCountPaginator, 'estimate', return_value=5000):
+            self.assertEqual(EstimatedCountPaginator(queryset, 50).count, 5000)
+        with mock.patch.object(EstimatedCountPaginator, 'estimate', return_value=10):
+            self.assertEqual(EstimatedCountPaginator(queryset, 50).count, 0)
+    
+    def test_change_form_version_conflict(self):
+        """Test a save that loses a version race is rolled back with a message, not a 500"""
+        url = reverse('admin:healthcare_doctor_change', args=[self.doctor.pk])
+        data = {
+            field: value for field, value in model_to_dict(self.doctor).items()
+            if value is not None and field not in ('id', 'version')
+        }
+        data['first_name'] = 'Sally'
+        Doctor.objects.filter(pk=self.doctor.pk).update(version=2)
+        with mock.patch.object(admin.site._registry[Doctor], 'get_object', return_value=self.doctor):
+            response = self.client.post(url, data, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('changed by someone else', str(list(response.context['messages'])[0]))
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.first_name, self.doctor.version), ('Sarah', 2))
 
 
 if __name__ == '__main__':
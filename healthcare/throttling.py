@@ -0,0 +1,157 @@
+import math
+import time
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle whose state lives in the configured cache.
+
+    Each bucket is a single cache entry holding ``(tokens, timestamp)``.
+    Refilling and spending a token is one cache read and one cache write, so
+    checking a limit never touches the database and never takes a lock. Under
+    heavy concurrency two requests may spend from the same snapshot; the
+    bucket then over-admits by at most the number of racing requests, which
+    is an acceptable trade for lock-free checks.
+
+    Rates use the usual DRF format (``'100/min'``): the number is the bucket
+    capacity and the bucket refills completely over the period.
+    """
+    cache_alias = 'default'
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+    scope = None
+    timer = time.time
+    THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+
+    def __init__(self):
+        self.capacity = None
+        self.period = None
+        self.tokens = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_rate(self, scope):
+        try:
+            return self.THROTTLE_RATES[scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{scope}' scope")
+
+    def parse_rate(self, rate):
+        """
+        Given the request rate string, return a two tuple of:
+        <allowed number of requests>, <period of time in seconds>
+        """
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), duration
+
+    def get_ident_key(self, request, view):
+        """
+        Return the part of the cache key identifying the caller, or None if
+        this throttle does not apply to the request.
+        """
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        if scope is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        self.capacity, self.period = self.parse_rate(self.get_rate(scope))
+        key = self.cache_format % {'scope': scope, 'ident': ident}
+        now = self.timer()
+
+        tokens, stamp = self.cache.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - stamp) * self.capacity / self.period)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.tokens = tokens
+        self.cache.set(key, (tokens, now), self.period)
+
+        self.record(request)
+        return allowed
+
+    def record(self, request):
+        """
+        Publish the bucket state on the underlying Django request so that
+        RateLimitHeadersMiddleware can expose the tightest limit.
+        """
+        state = {
+            'limit': self.capacity,
+            'remaining': int(self.tokens),
+            'reset': math.ceil((self.capacity - self.tokens) * self.period / self.capacity),
+        }
+        django_request = getattr(request, '_request', request)
+        current = getattr(django_request, 'rate_limit', None)
+        if current is None or state['remaining'] < current['remaining']:
+            django_request.rate_limit = state
+
+    def wait(self):
+        if self.tokens is None or self.tokens >= 1:
+            return None
+        return (1 - self.tokens) * self.period / self.capacity
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limits unauthenticated requests per client IP.
+    """
+    scope = 'anon'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limits authenticated requests per user across all endpoints.
+    """
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limits requests to views that declare a ``throttle_scope``, keyed per user
+    (or per IP for anonymous callers), in addition to the global limits.
+    """
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None)
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+
+class LoginRateThrottle(ScopedTokenBucketThrottle):
+    """
+    Stricter per-IP limit for the login endpoint.
+    """
+    scope = 'login'
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
@@ -10,14 +10,43 @@ urlpatterns = [
     
     # Patient URLs
     path('patients/', views.PatientListCreateView.as_view(), name='patient-list-create'),
+    path('patients/batch/', views.PatientBatchView.as_view(), name='patient-batch'),
     path('patients/<int:pk>/', views.PatientDetailView.as_view(), name='patient-detail'),
     
     # Doctor URLs
     path('doctors/', views.DoctorListCreateView.as_view(), name='doctor-list-create'),
+    path('doctors/batch/', views.DoctorBatchView.as_view(), name='doctor-batch'),
     path('doctors/<int:pk>/', views.DoctorDetailView.as_view(), name='doctor-detail'),
+    path('doctors/<int:doctor_id>/mappings/', views.DoctorMappingListView.as_view(), name='doctor-mappings'),
     
     # Patient-Doctor Mapping URLs
     path('mappings/', views.PatientDoctorMappingListCreateView.as_view(), name='mapping-list-create'),
-    path('mappings/<int:patient_id>/', views.patient_doctors_view, name='patient-doctors'),
+    path('mappings/bulk/assign/', views.bulk_assign_view, name='mapping-bulk-assign'),
+    path('mappings/bulk/status/', views.bulk_status_view, name='mapping-bulk-status'),
+    path('mappings/<int:patient_id>/', views.PatientMappingListView.as_view(), name='patient-doctors'),
     path('mappings/detail/<int:pk>/', views.PatientDoctorMappingDetailView.as_view(), name='mapping-detail'),
+    
+    # Background Job URLs
+    path('jobs/', views.JobListView.as_view(), name='job-list'),
+    path('jobs/<int:pk>/', views.JobDetailView.as_view(), name='job-detail'),
+    
+    # Delta Sync URLs
+    path('sync/', views.sync_view, name='sync'),
+    
+    # Change Feed URLs
+    path('events/mappings/', views.MappingEventStreamView.as_view(), name='mapping-events'),
+    
+    # Statistics URLs
+    path('stats/', views.stats_view, name='stats'),
+    path('stats/cohorts/', views.stats_cohorts_view, name='stats-cohorts'),
+    path('stats/<slug:section>/', views.stats_section_view, name='stats-section'),
+    
+    # Autocomplete URLs
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('autocomplete/patients/', views.autocomplete_view, {'kind': 'patient'}, name='autocomplete-patients'),
+    path('autocomplete/doctors/', views.autocomplete_view, {'kind': 'doctor'}, name='autocomplete-doctors'),
+    
+    # Analytics Export URLs
+    path('exports/', views.export_create_view, name='export-create'),
+    path('exports/<int:pk>/<slug:table>/', views.export_download_view, name='export-download'),
 ]
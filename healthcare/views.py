@@ -1,19 +1,43 @@
-from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import generics, status, permissions, filters
+from rest_framework.views import APIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Prefetch, Q
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.shortcuts import get_object_or_404
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
 
-from .models import Patient, Doctor, PatientDoctorMapping
+from . import directory
+from .docs import swagger_auto_schema, openapi
+from .models import Patient, Doctor, PatientDoctorMapping, Job, VersionConflict
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, PatientSerializer,
     DoctorSerializer, PatientDoctorMappingSerializer, PatientDetailSerializer,
-    DoctorDetailSerializer
+    DoctorDetailSerializer, BulkAssignmentSerializer, BulkStatusSerializer, JobSerializer,
+    ExportRequestSerializer, BatchIdsSerializer
 )
+from .throttling import LoginRateThrottle
+from .renderers import EventStreamRenderer
+from .events import EventStream, EventStreamResponse, StreamLimitReached
+from .jobs import enqueue
+from .idempotency import IdempotencyMixin, idempotent_view
+from .sync import collect_changes, decode_watermark, InvalidWatermark, ExpiredWatermark
+from .stats import SECTIONS, get_stats
+from .cohorts import cohort_stats
+from .autocomplete import TYPES as AUTOCOMPLETE_TYPES, suggest
 
 
 # Authentication Views
@@ -24,6 +48,7 @@ class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
     
     @swagger_auto_schema(
         operation_description="Register a new user",
@@ -73,6 +98,7 @@ class UserRegistrationView(generics.CreateAPIView):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginRateThrottle])
 def user_login_view(request):
     """
     Log in a user and return a JWT token.
@@ -98,23 +124,198 @@ def user_login_view(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-# Patient Management Views
-class PatientListCreateView(generics.ListCreateAPIView):
+def with_mapping_preview(queryset, relation, user):
     """
-    GET: Retrieve all patients created by the authenticated user.
-    POST: Add a new patient (Authenticated users only).
+    Annotate ``mapping_count`` and prefetch at most MAPPING_PREVIEW_SIZE of the
+    user's most recent mappings per row into ``mapping_preview``. The slice is
+    applied per parent by the database, so a doctor with thousands of
+    assignments still loads only the preview. Like ``filter_mappings``, it
+    leaves out mappings of soft-deleted patients and doctors.
+    """
+    mappings = (
+        PatientDoctorMapping.objects.filter(owner=user, patient__is_active=True, doctor__is_active=True)
+        .select_related('patient', 'doctor', 'created_by')
+        .order_by('-assigned_date', '-pk')
+    )
+    visible = Q(**{
+        f'{relation}__owner': user,
+        f'{relation}__patient__is_active': True,
+        f'{relation}__doctor__is_active': True,
+    })
+    return queryset.annotate(
+        mapping_count=Count(relation, filter=visible)
+    ).prefetch_related(
+        Prefetch(relation, queryset=mappings[:settings.MAPPING_PREVIEW_SIZE], to_attr='mapping_preview')
+    )
+
+
+class BatchRetrieveMixin:
+    """
+    Look up many rows of ``get_queryset()`` by id in one ``id__in`` query,
+    for ``GET ?ids=1,2,3`` on a list view or ``POST {"ids": [...]}`` on its
+    batch view. Results follow the request order; ids that do not exist or
+    are not visible to the user come back as ``{"id": ..., "not_found": true}``.
+    """
+    
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            ids = [value.strip() for value in request.query_params['ids'].split(',') if value.strip()]
+            return self.batch_response({'ids': ids})
+        return super().list(request, *args, **kwargs)
+    
+    def batch_response(self, data):
+        # Any body shape is validated here, so a JSON array gets a 400
+        serializer = BatchIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        rows = list(self.filter_queryset(self.get_queryset()).filter(pk__in=ids))
+        data = dict(zip((row.pk for row in rows), self.get_serializer(rows, many=True).data))
+        return Response({
+            'results': [data.get(pk, {'id': pk, 'not_found': True}) for pk in ids],
+            'not_found': [pk for pk in ids if pk not in data],
+        })
+
+
+BATCH_IDS_PARAMETER = openapi.Parameter(
+    'ids', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+    description="Comma separated ids (at most 200) to fetch in one call, in this order"
+)
+
+
+class DeferTextMixin:
+    """
+    List and batch responses leave out the unbounded text columns named in
+    ``deferred_fields`` and ``defer()`` them, so they are neither read nor
+    sent. ``?expand=medical_history,allergies`` (or ``?expand=all``) brings
+    them back; detail views and create responses always have every field.
+    """
+    deferred_fields = ()
+    omitted_fields = ()
+    
+    def parse_expand(self):
+        expand = {name.strip() for name in self.request.query_params.get('expand', '').split(',') if name.strip()}
+        if 'all' in expand:
+            return ()
+        unknown = expand - set(self.deferred_fields)
+        if unknown:
+            raise ValidationError({'expand': [
+                f"Unknown field(s) {', '.join(sorted(unknown))}; expected 'all' or any of "
+                f"{', '.join(self.deferred_fields)}"
+            ]})
+        return tuple(name for name in self.deferred_fields if name not in expand)
+    
+    def list(self, request, *args, **kwargs):
+        self.omitted_fields = self.parse_expand()
+        return super().list(request, *args, **kwargs)
+    
+    def batch_response(self, data):
+        self.omitted_fields = self.parse_expand()
+        return super().batch_response(data)
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return queryset.defer(*self.omitted_fields) if self.omitted_fields else queryset
+    
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'omit': self.omitted_fields}
+
+
+PATIENT_TEXT_FIELDS = ('address', 'medical_history', 'allergies', 'current_medications')
+DOCTOR_TEXT_FIELDS = ('office_address', 'bio')
+
+
+def expand_parameter(fields):
+    return openapi.Parameter(
+        'expand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+        description=f"Comma separated text fields to include ({', '.join(fields)}), or 'all'"
+    )
+
+
+def parse_if_match(header):
+    """
+    Versions listed in an If-Match header, or None for a missing header or
+    ``*``. Weak tags are accepted too, since compressed responses carry the
+    ETag as W/"...".
     """
+    if not header or header.strip() == '*':
+        return None
+    versions = set()
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        try:
+            versions.add(int(tag.strip('"')))
+        except ValueError:
+            pass
+    return versions
+
+
+class VersionedUpdateMixin:
+    """
+    Optimistic concurrency for detail views of RowVersionMixin models.
+    Responses carry the row version as ETag; PUT and PATCH with a matching
+    If-Match are written with a conditional UPDATE (see RowVersionMixin), and
+    get 412 if the row has changed since, instead of overwriting it. Soft
+    deletes that lose a race get the same 412.
+    """
+    conflict_message = 'The record was changed since it was read; fetch it again and retry.'
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and 'version' in (response.data or {}):
+            response['ETag'] = f'"{response.data["version"]}"'
+        return response
+    
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except VersionConflict:
+            return Response({'error': self.conflict_message}, status=status.HTTP_412_PRECONDITION_FAILED)
+    
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except VersionConflict:
+            return Response({'error': self.conflict_message}, status=status.HTTP_412_PRECONDITION_FAILED)
+    
+    def perform_update(self, serializer):
+        versions = parse_if_match(self.request.headers.get('If-Match'))
+        if versions is not None and serializer.instance.version not in versions:
+            raise VersionConflict(f'{serializer.instance} is at version {serializer.instance.version}')
+        serializer.save()
+
+
+IF_MATCH_PARAMETER = openapi.Parameter(
+    'If-Match', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+    description='ETag (version) from a previous read; the update fails with 412 if the record changed since'
+)
+
+
+# Patient Management Views
+class PatientCollectionMixin(DeferTextMixin, BatchRetrieveMixin):
+    """Patients visible in the list and batch views: the user's active ones."""
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
+    deferred_fields = PATIENT_TEXT_FIELDS
     
     def get_queryset(self):
         # Handle swagger schema generation
         if getattr(self, 'swagger_fake_view', False):
             return Patient.objects.none()
-        return Patient.objects.filter(created_by=self.request.user, is_active=True)
+        return Patient.active.filter(created_by=self.request.user).select_related('created_by')
+
+
+class PatientListCreateView(PatientCollectionMixin, IdempotencyMixin, generics.ListCreateAPIView):
+    """
+    GET: Retrieve all patients created by the authenticated user, or only
+    those listed in ?ids=. Long text fields are included with ?expand=.
+    POST: Add a new patient (Authenticated users only).
+    """
     
     @swagger_auto_schema(
         operation_description="Get all patients for authenticated user",
+        manual_parameters=[BATCH_IDS_PARAMETER, expand_parameter(PATIENT_TEXT_FIELDS)],
         responses={200: PatientSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
@@ -129,11 +330,12 @@ class PatientListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class PatientDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PatientDetailView(VersionedUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Get details of a specific patient.
-    PUT: Update patient details.
-    DELETE: Delete a patient record.
+    PUT/PATCH: Update patient details; send the ETag back as If-Match.
+    DELETE: Deactivate a patient record; its doctor assignments are archived
+    in the background.
     """
     serializer_class = PatientDetailSerializer
     permission_classes = [IsAuthenticated]
@@ -142,7 +344,15 @@ class PatientDetailView(generics.RetrieveUpdateDestroyAPIView):
         # Handle swagger schema generation
         if getattr(self, 'swagger_fake_view', False):
             return Patient.objects.none()
-        return Patient.objects.filter(created_by=self.request.user)
+        queryset = Patient.active.filter(created_by=self.request.user)
+        if self.request.method != 'GET':
+            # Writes only need the row; their response leaves the preview out
+            return queryset
+        return with_mapping_preview(queryset, 'doctor_mappings', self.request.user)
+    
+    def perform_destroy(self, instance):
+        instance.soft_delete()
+        enqueue('archive_mappings', 'patient_id', instance.pk, user=self.request.user)
     
     @swagger_auto_schema(
         operation_description="Get patient details",
@@ -153,38 +363,68 @@ class PatientDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     @swagger_auto_schema(
         operation_description="Update patient details",
+        manual_parameters=[IF_MATCH_PARAMETER],
         request_body=PatientSerializer,
-        responses={200: PatientSerializer}
+        responses={200: PatientSerializer, 412: 'Changed since the If-Match version'}
     )
     def put(self, request, *args, **kwargs):
         return super().put(request, *args, **kwargs)
     
     @swagger_auto_schema(
-        operation_description="Delete patient record",
+        operation_description="Deactivate patient record and archive its doctor assignments",
         responses={204: 'Patient deleted successfully'}
     )
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
 
-# Doctor Management Views
-class DoctorListCreateView(generics.ListCreateAPIView):
+class PatientBatchView(PatientCollectionMixin, generics.GenericAPIView):
     """
-    GET: Retrieve all doctors.
-    POST: Add a new doctor (Authenticated users only).
+    POST: Fetch the user's patients listed in {"ids": [...]}, for id lists
+    too long for a query string.
     """
+    
+    @swagger_auto_schema(
+        operation_description="Fetch up to 200 patients by id, in request order",
+        manual_parameters=[expand_parameter(PATIENT_TEXT_FIELDS)],
+        request_body=BatchIdsSerializer,
+        responses={200: 'results (with {id, not_found} markers) and not_found ids', 400: 'Bad Request'}
+    )
+    def post(self, request, *args, **kwargs):
+        return self.batch_response(request.data)
+
+
+# Doctor Management Views
+class DoctorCollectionMixin(DeferTextMixin, BatchRetrieveMixin):
+    """Doctors visible in the list and batch views: every active one."""
     serializer_class = DoctorSerializer
     permission_classes = [IsAuthenticated]
+    deferred_fields = DOCTOR_TEXT_FIELDS
     
     def get_queryset(self):
-        return Doctor.objects.filter(is_active=True)
+        return Doctor.active.select_related('created_by')
+
+
+class DoctorListCreateView(DoctorCollectionMixin, IdempotencyMixin, generics.ListCreateAPIView):
+    """
+    GET: Retrieve all doctors, or only those listed in ?ids=. Sort with
+    ?ordering=-active_patient_count; long text fields are included with
+    ?expand=.
+    POST: Add a new doctor (Authenticated users only).
+    """
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['active_patient_count', 'created_at', 'last_name']
     
     @swagger_auto_schema(
         operation_description="Get all active doctors",
+        manual_parameters=[BATCH_IDS_PARAMETER, expand_parameter(DOCTOR_TEXT_FIELDS)],
         responses={200: DoctorSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        if 'ids' in request.query_params:
+            return super().get(request, *args, **kwargs)
+        parent = super().get
+        return directory.cached_response(request, 'list', lambda: parent(request, *args, **kwargs))
     
     @swagger_auto_schema(
         operation_description="Create a new doctor",
@@ -195,35 +435,68 @@ class DoctorListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class DoctorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DoctorBatchView(DoctorCollectionMixin, generics.GenericAPIView):
+    """
+    POST: Fetch the doctors listed in {"ids": [...]}, for id lists too long
+    for a query string.
+    """
+    
+    @swagger_auto_schema(
+        operation_description="Fetch up to 200 doctors by id, in request order",
+        manual_parameters=[expand_parameter(DOCTOR_TEXT_FIELDS)],
+        request_body=BatchIdsSerializer,
+        responses={200: 'results (with {id, not_found} markers) and not_found ids', 400: 'Bad Request'}
+    )
+    def post(self, request, *args, **kwargs):
+        return self.batch_response(request.data)
+
+
+class DoctorDetailView(VersionedUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Get details of a specific doctor.
-    PUT: Update doctor details.
-    DELETE: Delete a doctor record.
+    PUT/PATCH: Update doctor details; send the ETag back as If-Match.
+    DELETE: Deactivate a doctor record; its patient assignments are archived
+    in the background.
     """
     serializer_class = DoctorDetailSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Doctor.objects.all()
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return Doctor.objects.none()
+        queryset = Doctor.active.all()
+        if self.request.method != 'GET':
+            # Writes only need the row; their response leaves the preview out
+            return queryset
+        return with_mapping_preview(queryset, 'patient_mappings', self.request.user)
+    
+    def perform_destroy(self, instance):
+        instance.soft_delete()
+        enqueue('archive_mappings', 'doctor_id', instance.pk, user=self.request.user)
     
     @swagger_auto_schema(
         operation_description="Get doctor details",
         responses={200: DoctorDetailSerializer}
     )
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        # The mapping preview is the user's own
+        parent = super().get
+        return directory.cached_response(
+            request, 'detail', lambda: parent(request, *args, **kwargs), user=request.user
+        )
     
     @swagger_auto_schema(
         operation_description="Update doctor details",
+        manual_parameters=[IF_MATCH_PARAMETER],
         request_body=DoctorSerializer,
-        responses={200: DoctorSerializer}
+        responses={200: DoctorSerializer, 412: 'Changed since the If-Match version'}
     )
     def put(self, request, *args, **kwargs):
         return super().put(request, *args, **kwargs)
     
     @swagger_auto_schema(
-        operation_description="Delete doctor record",
+        operation_description="Deactivate doctor record and archive its patient assignments",
         responses={204: 'Doctor deleted successfully'}
     )
     def delete(self, request, *args, **kwargs):
@@ -231,48 +504,209 @@ class DoctorDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Patient-Doctor Mapping Views
-class PatientDoctorMappingListCreateView(generics.ListCreateAPIView):
+def _parse_moment(value, name):
     """
-    GET: Retrieve all patient-doctor mappings.
+    Parse a date or ISO 8601 datetime query parameter into an aware datetime.
+    Returns ``(moment, is_date)``; a bare date means midnight of that day.
+    """
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, datetime.min.time()) if day else parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({name: 'Use YYYY-MM-DD or an ISO 8601 datetime'})
+    is_date = day is not None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, is_date
+
+
+def filter_mappings(queryset, params):
+    """
+    Apply the status, doctor and assigned date range filters of the mapping
+    list. Mappings of soft-deleted patients or doctors are always left out.
+    """
+    queryset = queryset.filter(patient__is_active=True, doctor__is_active=True)
+    if params.get('status'):
+        queryset = queryset.filter(status=params['status'])
+    if params.get('doctor'):
+        try:
+            queryset = queryset.filter(doctor_id=int(params['doctor']))
+        except ValueError:
+            raise ValidationError({'doctor': 'Must be a doctor id'})
+    if params.get('assigned_after'):
+        moment, _ = _parse_moment(params['assigned_after'], 'assigned_after')
+        queryset = queryset.filter(assigned_date__gte=moment)
+    if params.get('assigned_before'):
+        moment, is_date = _parse_moment(params['assigned_before'], 'assigned_before')
+        if is_date:
+            # A bare end date includes the whole day
+            queryset = queryset.filter(assigned_date__lt=moment + timedelta(days=1))
+        else:
+            queryset = queryset.filter(assigned_date__lte=moment)
+    return queryset
+
+
+class PatientDoctorMappingListCreateView(IdempotencyMixin, generics.ListCreateAPIView):
+    """
+    GET: Retrieve the mappings of the authenticated user's patients.
     POST: Assign a doctor to a patient.
     """
     serializer_class = PatientDoctorMappingSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return PatientDoctorMapping.objects.all()
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return PatientDoctorMapping.objects.none()
+        queryset = (
+            PatientDoctorMapping.objects.filter(owner=self.request.user)
+            .select_related('patient', 'doctor', 'created_by')
+        )
+        return filter_mappings(queryset, self.request.query_params)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['upsert'] = self.request.query_params.get('upsert', '').lower() in ('1', 'true', 'yes')
+        return context
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        code = status.HTTP_200_OK if serializer.upserted else status.HTTP_201_CREATED
+        return Response(serializer.data, status=code, headers=headers)
     
     @swagger_auto_schema(
-        operation_description="Get all patient-doctor mappings",
+        operation_description="Get the mappings of your patients",
+        manual_parameters=[
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="ACTIVE, INACTIVE or COMPLETED"),
+            openapi.Parameter('doctor', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Doctor id"),
+            openapi.Parameter('assigned_after', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Assigned on or after this date/datetime"),
+            openapi.Parameter('assigned_before', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Assigned on or before this date/datetime"),
+        ],
         responses={200: PatientDoctorMappingSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
     
     @swagger_auto_schema(
-        operation_description="Assign a doctor to a patient",
+        operation_description="Assign a doctor to a patient. With ?upsert=true an existing "
+                              "assignment is updated instead of rejected.",
         request_body=PatientDoctorMappingSerializer,
-        responses={201: PatientDoctorMappingSerializer}
+        manual_parameters=[
+            openapi.Parameter('upsert', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Update status and notes if the pair is already assigned"),
+        ],
+        responses={201: PatientDoctorMappingSerializer, 200: PatientDoctorMappingSerializer}
     )
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
 
+class PatientMappingListView(generics.ListAPIView):
+    """
+    GET: Page through the doctors assigned to one of the user's patients.
+    """
+    serializer_class = PatientDoctorMappingSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return PatientDoctorMapping.objects.none()
+        patient = get_object_or_404(Patient.active, id=self.kwargs['patient_id'], created_by=self.request.user)
+        queryset = (
+            PatientDoctorMapping.objects.filter(patient=patient)
+            .select_related('patient', 'doctor', 'created_by')
+            .order_by('-assigned_date', '-pk')
+        )
+        return filter_mappings(queryset, self.request.query_params)
+    
+    @swagger_auto_schema(
+        operation_description="Get the doctors assigned to a specific patient, newest first",
+        responses={200: PatientDoctorMappingSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class DoctorMappingListView(generics.ListAPIView):
+    """
+    GET: Page through the user's patients assigned to a doctor.
+    """
+    serializer_class = PatientDoctorMappingSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return PatientDoctorMapping.objects.none()
+        doctor = get_object_or_404(Doctor.active, id=self.kwargs['doctor_id'])
+        queryset = (
+            PatientDoctorMapping.objects.filter(doctor=doctor, owner=self.request.user)
+            .select_related('patient', 'doctor', 'created_by')
+            .order_by('-assigned_date', '-pk')
+        )
+        return filter_mappings(queryset, self.request.query_params)
+    
+    @swagger_auto_schema(
+        operation_description="Get your patients assigned to a specific doctor, newest first",
+        responses={200: PatientDoctorMappingSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
 @swagger_auto_schema(
-    method='get',
-    operation_description="Get all doctors assigned to a specific patient",
-    responses={200: PatientDoctorMappingSerializer(many=True)}
+    method='post',
+    operation_description="Assign several doctors to one patient, or one doctor to several patients",
+    request_body=BulkAssignmentSerializer,
+    responses={
+        201: 'Mappings created',
+        200: 'All pairs were already assigned',
+        400: 'Bad Request'
+    }
 )
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def patient_doctors_view(request, patient_id):
+@idempotent_view
+def bulk_assign_view(request):
     """
-    Get all doctors assigned to a specific patient.
+    Create many patient-doctor mappings at once, skipping existing ones.
     """
-    patient = get_object_or_404(Patient, id=patient_id, created_by=request.user)
-    mappings = PatientDoctorMapping.objects.filter(patient=patient)
-    serializer = PatientDoctorMappingSerializer(mappings, many=True)
-    return Response(serializer.data)
+    serializer = BulkAssignmentSerializer(data=request.data, context={'request': request})
+    if serializer.is_valid():
+        result = serializer.save()
+        return Response({
+            'created': PatientDoctorMappingSerializer(result['created'], many=True).data,
+            'already_assigned': PatientDoctorMappingSerializer(result['existing'], many=True).data,
+        }, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="Change the status of many patient-doctor mappings",
+    request_body=BulkStatusSerializer,
+    responses={200: 'Ids updated and ids not found', 400: 'Bad Request'}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_status_view(request):
+    """
+    Move many mappings to a new status with a single UPDATE.
+    """
+    serializer = BulkStatusSerializer(data=request.data, context={'request': request})
+    if serializer.is_valid():
+        return Response(serializer.save(), status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class PatientDoctorMappingDetailView(generics.RetrieveDestroyAPIView):
@@ -284,7 +718,12 @@ class PatientDoctorMappingDetailView(generics.RetrieveDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return PatientDoctorMapping.objects.all()
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return PatientDoctorMapping.objects.none()
+        return PatientDoctorMapping.objects.filter(owner=self.request.user).select_related(
+            'patient', 'doctor', 'created_by'
+        )
     
     @swagger_auto_schema(
         operation_description="Get mapping details",
@@ -299,3 +738,263 @@ class PatientDoctorMappingDetailView(generics.RetrieveDestroyAPIView):
     )
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
+
+
+# Background Job Views
+class JobListView(generics.ListAPIView):
+    """
+    GET: Retrieve background jobs started by the authenticated user.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+        return Job.objects.filter(created_by=self.request.user)
+    
+    @swagger_auto_schema(
+        operation_description="Get background jobs for authenticated user",
+        responses={200: JobSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """
+    GET: Get the status and result of a background job.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        # Handle swagger schema generation
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+        return Job.objects.filter(created_by=self.request.user)
+    
+    @swagger_auto_schema(
+        operation_description="Get background job status and result",
+        responses={200: JobSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+# Delta Sync Views
+@swagger_auto_schema(
+    method='get',
+    operation_description="Get patients, doctors and mappings created, updated or deleted since a sync token",
+    manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Token returned as 'next' by the previous sync; omit for a full sync"),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Maximum rows per collection"),
+    ],
+    responses={
+        200: 'Changes since the token',
+        400: 'Invalid sync token',
+        410: 'Sync token expired, perform a full sync'
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_view(request):
+    """
+    Get changes since the watermark in `since`, plus the watermark for the next call.
+    """
+    since = None
+    token = request.query_params.get('since')
+    if token:
+        try:
+            since = decode_watermark(token)
+        except InvalidWatermark as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredWatermark as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_410_GONE)
+    
+    try:
+        limit = int(request.query_params.get('limit', 0)) or None
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit is not None:
+        limit = max(1, min(limit, 1000))
+    
+    return Response(collect_changes(request.user, since=since, limit=limit))
+
+
+# Change Feed Views
+class MappingEventStreamView(APIView):
+    """
+    GET: Server-Sent Events stream of doctor assignment changes for the
+    authenticated user's patients (mapping.created, mapping.status_changed,
+    mapping.deleted). Send Last-Event-ID to replay missed events.
+    
+    Only served under ASGI (501 otherwise, unless EVENT_STREAM_ALLOW_WSGI),
+    and 503 once this worker holds EVENT_STREAM_MAX_CONCURRENT streams.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+    
+    @swagger_auto_schema(
+        operation_description="Stream patient-doctor mapping changes as Server-Sent Events",
+        manual_parameters=[
+            openapi.Parameter('Last-Event-ID', openapi.IN_HEADER, type=openapi.TYPE_INTEGER,
+                              description="Id of the last event received, to replay missed events"),
+        ],
+        responses={
+            200: 'text/event-stream',
+            501: 'Streams are not served by this (WSGI) deployment',
+            503: 'Too many open streams; retry later',
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        last_event_id = request.headers.get('Last-Event-ID')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return Response({'error': 'Last-Event-ID must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        asynchronous = isinstance(request._request, ASGIRequest)
+        if not asynchronous and not settings.EVENT_STREAM_ALLOW_WSGI:
+            # Each stream would hold a worker thread for its whole lifetime
+            return Response(
+                {'error': 'Event streams are only served under ASGI'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        
+        stream = EventStream(request.user.pk, last_event_id=last_event_id)
+        try:
+            return EventStreamResponse(stream, asynchronous=asynchronous)
+        except StreamLimitReached:
+            return Response(
+                {'error': 'Too many open event streams, retry later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(settings.EVENT_STREAM_HEARTBEAT_SECONDS)}
+            )
+
+
+# Statistics Views
+@swagger_auto_schema(
+    method='get',
+    operation_description="Get patient and doctor aggregates for dashboards",
+    responses={200: 'Aggregates for every section'}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stats_view(request):
+    """
+    Get all dashboard aggregates for the authenticated user's records.
+    """
+    return Response({section: get_stats(request.user, section) for section in SECTIONS})
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Get aggregates for one section: patients or doctors",
+    responses={200: 'Aggregates for the section', 404: 'Unknown section'}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stats_section_view(request, section):
+    """
+    Get one section of the dashboard aggregates.
+    """
+    if section not in SECTIONS:
+        return Response({'error': 'Unknown statistics section'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(get_stats(request.user, section))
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Get age bands, age-by-gender and specialization-by-state cross-tabs",
+    responses={200: 'Cohort counts'}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stats_cohorts_view(request):
+    """
+    Get cohort counts and cross-tabs for capacity planning.
+    """
+    return Response(get_stats(request.user, 'cohorts', cohort_stats))
+
+
+# Autocomplete Views
+@swagger_auto_schema(
+    method='get',
+    operation_description="Suggest patients and doctors whose first or last name starts with q",
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                          description="Name prefix"),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Maximum suggestions"),
+    ],
+    responses={200: 'List of {id, full_name, type}', 400: 'Invalid limit'}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def autocomplete_view(request, kind=None):
+    """
+    Type-ahead suggestions for the assignment pickers. `kind` restricts the
+    results to patients or doctors.
+    """
+    try:
+        limit = int(request.query_params.get('limit', 0)) or None
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit is not None:
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+    
+    types = (kind,) if kind else AUTOCOMPLETE_TYPES
+    return Response(suggest(request.user, request.query_params.get('q', ''), types=types, limit=limit))
+
+
+def job_accepted_response(request, job):
+    """202 response pointing the client at the job to poll."""
+    location = request.build_absolute_uri(reverse('healthcare:job-detail', kwargs={'pk': job.pk}))
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+
+# Analytics Export Views
+@swagger_auto_schema(
+    method='post',
+    operation_description="Start a columnar snapshot of your patients, doctors and mappings",
+    request_body=ExportRequestSerializer,
+    responses={202: JobSerializer, 400: 'Bad Request'}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def export_create_view(request):
+    """
+    Queue a snapshot export. Poll the job in the Location header; when it
+    succeeds, its result lists the files to download.
+    """
+    serializer = ExportRequestSerializer(data=request.data)
+    if serializer.is_valid():
+        job = enqueue(
+            'export_snapshot', request.user.pk, serializer.validated_data['format'], uuid.uuid4().hex,
+            user=request.user,
+        )
+        return job_accepted_response(request, job)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Download one table of a finished snapshot export",
+    responses={200: 'Parquet or CSV file', 404: 'Not Found'}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_download_view(request, pk, table):
+    """
+    Download the file written for `table` by a successful export job.
+    """
+    job = get_object_or_404(Job, pk=pk, name='export_snapshot', status='SUCCEEDED', created_by=request.user)
+    entry = job.result['tables'].get(table)
+    path = Path(settings.EXPORT_ROOT) / job.result['path'] / entry['file'] if entry else None
+    if path is None or not path.exists():
+        raise Http404('Export file not found')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=entry['file'])
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from corsheaders.defaults import default_headers
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,8 +33,12 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='').split(',')
 
 # Application definition
 
+# API-only workers can switch these off so drf_yasg and the admin are never
+# imported; see `python manage.py profile_startup`
+API_DOCS_ENABLED = config('API_DOCS_ENABLED', default=True, cast=bool)
+ADMIN_ENABLED = config('ADMIN_ENABLED', default=True, cast=bool)
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -44,21 +49,27 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
-    'drf_yasg',
     
     # Local apps
     'healthcare',
 ]
 
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index('healthcare'), 'drf_yasg')
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'healthcare.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'healthcare.middleware.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'healthcare_backend.urls'
@@ -106,6 +117,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Throttle buckets live here; point this at a shared backend (Redis, Memcached)
+# so limits hold across workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='healthcare-default'),
+    }
+}
+
+# Single-flight cache fills (healthcare.singleflight): expired entries are
+# served for SINGLEFLIGHT_STALE_SECONDS while one request recomputes them; on a
+# miss, other processes wait up to SINGLEFLIGHT_WAIT_SECONDS for the lock holder.
+SINGLEFLIGHT_STALE_SECONDS = config('SINGLEFLIGHT_STALE_SECONDS', default=60, cast=int)
+SINGLEFLIGHT_LOCK_SECONDS = config('SINGLEFLIGHT_LOCK_SECONDS', default=30, cast=int)
+SINGLEFLIGHT_WAIT_SECONDS = config('SINGLEFLIGHT_WAIT_SECONDS', default=5, cast=float)
+# Doctor directory cache; active_patient_count in it may lag by this much
+DOCTOR_CACHE_SECONDS = config('DOCTOR_CACHE_SECONDS', default=60, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -157,7 +190,110 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'healthcare.throttling.AnonTokenBucketThrottle',
+        'healthcare.throttling.UserTokenBucketThrottle',
+        'healthcare.throttling.ScopedTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': config('THROTTLE_RATE_ANON', default='100/min'),
+        'user': config('THROTTLE_RATE_USER', default='600/min'),
+        'login': config('THROTTLE_RATE_LOGIN', default='10/min'),
+        'register': config('THROTTLE_RATE_REGISTER', default='10/min'),
+    },
+}
+
+# Background jobs (run with `python manage.py run_jobs`)
+# Deleting a patient or doctor only flips is_active; related mappings are
+# archived afterwards by a job, in batches of SOFT_DELETE_BATCH_SIZE.
+JOB_WORKERS = config('JOB_WORKERS', default=4, cast=int)
+JOB_POLL_SECONDS = config('JOB_POLL_SECONDS', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_RETRY_BACKOFF_SECONDS = config('JOB_RETRY_BACKOFF_SECONDS', default=30, cast=int)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=600, cast=int)
+JOB_RESULT_TTL_DAYS = config('JOB_RESULT_TTL_DAYS', default=7, cast=int)
+# run_jobs queues purge_expired this often (disable with --no-purge)
+JOB_PURGE_INTERVAL_SECONDS = config('JOB_PURGE_INTERVAL_SECONDS', default=3600, cast=int)
+SOFT_DELETE_BATCH_SIZE = config('SOFT_DELETE_BATCH_SIZE', default=500, cast=int)
+
+# Delta sync
+# Changes newer than SYNC_SETTLE_SECONDS (measured on the database clock) are
+# held back until the next sync so that rows from transactions still in flight
+# are never skipped. updated_at is stamped by the application servers, so keep
+# it above the longest write transaction (bulk assignment, archive batches)
+# plus their clock skew; a row committed later than that may be missed.
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=30, cast=int)
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_TOMBSTONE_RETENTION_DAYS = config('SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# Change feed (Server-Sent Events)
+# LocalBroker only reaches streams in the same process; use
+# healthcare.events.CacheBroker with a shared cache when running several workers.
+# Streams poll the broker for up to EVENT_STREAM_MAX_SECONDS, so they are only
+# served under ASGI; EVENT_STREAM_ALLOW_WSGI serves them from a WSGI thread
+# each (development only). EVENT_STREAM_MAX_CONCURRENT caps the open streams
+# of one worker process; further requests get 503 with Retry-After.
+EVENT_BROKER = config('EVENT_BROKER', default='healthcare.events.LocalBroker')
+EVENT_BUFFER_SIZE = config('EVENT_BUFFER_SIZE', default=200, cast=int)
+EVENT_STREAM_POLL_SECONDS = config('EVENT_STREAM_POLL_SECONDS', default=1.0, cast=float)
+EVENT_STREAM_HEARTBEAT_SECONDS = config('EVENT_STREAM_HEARTBEAT_SECONDS', default=15, cast=int)
+EVENT_STREAM_MAX_SECONDS = config('EVENT_STREAM_MAX_SECONDS', default=300, cast=int)
+EVENT_STREAM_MAX_CONCURRENT = config('EVENT_STREAM_MAX_CONCURRENT', default=200, cast=int)
+EVENT_STREAM_ALLOW_WSGI = config('EVENT_STREAM_ALLOW_WSGI', default=False, cast=bool)
+
+# Dashboard statistics
+# Cached results are also invalidated on every patient or doctor write.
+STATS_CACHE_SECONDS = config('STATS_CACHE_SECONDS', default=300, cast=int)
+COHORT_CHUNK_SIZE = config('COHORT_CHUNK_SIZE', default=50000, cast=int)
+
+# Analytics snapshots (Parquet needs the optional pyarrow package)
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))
+EXPORT_BATCH_SIZE = config('EXPORT_BATCH_SIZE', default=10000, cast=int)
+EXPORT_PARQUET_COMPRESSION = config('EXPORT_PARQUET_COMPRESSION', default='zstd')
+
+# Duplicate patient detection
+DEDUP_MATCH_THRESHOLD = config('DEDUP_MATCH_THRESHOLD', default=0.75, cast=float)
+DEDUP_MAX_BLOCK_SIZE = config('DEDUP_MAX_BLOCK_SIZE', default=200, cast=int)
+
+# Name autocomplete
+AUTOCOMPLETE_LIMIT = config('AUTOCOMPLETE_LIMIT', default=10, cast=int)
+AUTOCOMPLETE_MAX_LIMIT = config('AUTOCOMPLETE_MAX_LIMIT', default=25, cast=int)
+
+# Mappings embedded in patient/doctor details; the rest are paginated
+MAPPING_PREVIEW_SIZE = config('MAPPING_PREVIEW_SIZE', default=5, cast=int)
+
+# Precomputed OpenAPI schema (manage.py generate_schema). API_SCHEMA_VERSION
+# pins the cache key, e.g. to the deployed commit; by default the sources are hashed.
+API_SCHEMA_ROOT = config('API_SCHEMA_ROOT', default=str(BASE_DIR / 'openapi'))
+API_SCHEMA_VERSION = config('API_SCHEMA_VERSION', default='')
+API_SCHEMA_MAX_AGE = config('API_SCHEMA_MAX_AGE', default=3600, cast=int)
+
+# Idempotency-Key for POST endpoints: stored responses are replayed for
+# IDEMPOTENCY_TTL_HOURS; a duplicate waits up to IDEMPOTENCY_WAIT_SECONDS for
+# the request in flight, which is presumed dead after IDEMPOTENCY_LOCK_SECONDS.
+IDEMPOTENCY_TTL_HOURS = config('IDEMPOTENCY_TTL_HOURS', default=24, cast=int)
+IDEMPOTENCY_WAIT_SECONDS = config('IDEMPOTENCY_WAIT_SECONDS', default=10, cast=float)
+IDEMPOTENCY_LOCK_SECONDS = config('IDEMPOTENCY_LOCK_SECONDS', default=60, cast=int)
+IDEMPOTENCY_PURGE_BATCH_SIZE = config('IDEMPOTENCY_PURGE_BATCH_SIZE', default=1000, cast=int)
+
+# Response compression (zstd and br need the zstandard / brotli packages).
+# Low levels: most of the size reduction for a fraction of the CPU.
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_LEVELS = {
+    'gzip': config('COMPRESSION_GZIP_LEVEL', default=4, cast=int),
+    'br': config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int),
+    'zstd': config('COMPRESSION_ZSTD_LEVEL', default=3, cast=int),
 }
+# Compressed bodies up to this size are cached by content digest
+COMPRESSION_CACHE_MAX_SIZE = config('COMPRESSION_CACHE_MAX_SIZE', default=262144, cast=int)
+COMPRESSION_CACHE_SECONDS = config('COMPRESSION_CACHE_SECONDS', default=300, cast=int)
+# Never compressed, so issued tokens cannot be recovered from response sizes (BREACH)
+COMPRESSION_EXEMPT_PATHS = [
+    path for path in config('COMPRESSION_EXEMPT_PATHS', default='/api/auth/').split(',') if path
+]
+
+# Admin changelists report planner estimates instead of COUNT(*) above this size
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
 
 # JWT Configuration
 SIMPLE_JWT = {
@@ -197,8 +333,24 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_ALL_ORIGINS = config('DEBUG', default=True, cast=bool)
 
+CORS_ALLOW_HEADERS = [
+    *default_headers,
+    'idempotency-key',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'X-RateLimit-Limit',
+    'X-RateLimit-Remaining',
+    'X-RateLimit-Reset',
+    'Idempotent-Replayed',
+]
+
 # Swagger Settings
+# The precomputed schema is generated without a request, so it only names a
+# host and scheme when API_SCHEMA_URL (e.g. https://api.example.com) is set.
 SWAGGER_SETTINGS = {
+    'DEFAULT_INFO': 'healthcare.docs.api_info',
+    'DEFAULT_GENERATOR_CLASS': 'healthcare.schema.SchemaGenerator',
     'SECURITY_DEFINITIONS': {
         'Bearer': {
             'type': 'apiKey',
@@ -206,6 +358,7 @@ SWAGGER_SETTINGS = {
             'in': 'header'
         }
     },
+    'DEFAULT_API_URL': config('API_SCHEMA_URL', default=None),
     'USE_SESSION_AUTH': False,
     'JSON_EDITOR': True,
     'SUPPORTED_SUBMIT_METHODS': [
@@ -14,32 +14,40 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from functools import lru_cache
+
+from django.conf import settings
 from django.urls import path, include
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Healthcare Backend API",
-        default_version='v1',
-        description="A comprehensive healthcare management system API built with Django REST Framework",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="admin@healthcare.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from healthcare.lazy import lazy_view
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('healthcare.urls')),
-    
-    # Swagger UI
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+    
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
+if settings.API_DOCS_ENABLED:
+    @lru_cache(maxsize=None)
+    def schema_view():
+        # drf_yasg's generator and renderers are imported on the first docs request
+        from healthcare.docs import api_info
+        from healthcare.schema import get_cached_schema_view
+        
+        # Serves the schema precomputed by healthcare.schema instead of regenerating it per request
+        return get_cached_schema_view(
+            api_info,
+            public=True,
+            permission_classes=(permissions.AllowAny,),
+        )
+    
+    urlpatterns += [
+        # Swagger UI
+        path('swagger<format>/', lazy_view(lambda: schema_view().without_ui(cache_timeout=0)), name='schema-json'),
+        path('swagger/', lazy_view(lambda: schema_view().with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+        path('redoc/', lazy_view(lambda: schema_view().with_ui('redoc', cache_timeout=0)), name='schema-redoc'),
+        path('', lazy_view(lambda: schema_view().with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+    ]